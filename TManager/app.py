@@ -9,6 +9,17 @@ import requests
 from datetime import datetime, timedelta
 import io
 
+from utils.database import DatabaseManager, PRODUTOS_POR_COMBUSTIVEL, CATEGORIAS_CUSTO
+from utils.anp_import import ImportadorANP, descrever_dialeto, detectar_dialeto_csv, ler_csv, converter_precos_br
+from utils.roteirizacao import roteirizar, matriz_distancias
+from utils.distancias import CalculadoraDistancias
+from utils.custos import ler_manifesto, calcular_custos_viagens
+from utils.abastecimento import plano_abastecimento_rota
+from modules.driver_manager import DriverManager, CATEGORIAS_CNH, categoria_minima
+from modules.performance_analysis import AnalisadorDesempenho
+from utils.previsao import PrevisorPrecos, custo_previsto
+from modules.relatorios import gerar_resumo_semanal, nome_resumo_semanal, semanas_anteriores
+
 # Configuração
 st.set_page_config(
     page_title="T-Manager", 
@@ -77,183 +88,52 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# ========== SISTEMA DE ARMAZENAMENTO ==========
-class DatabaseManager:
-    def __init__(self):
-        self.data_dir = "data"
-        self._criar_diretorio()
-    
-    def _criar_diretorio(self):
-        if not os.path.exists(self.data_dir):
-            os.makedirs(self.data_dir)
-    
-    def salvar_veiculo(self, dados_veiculo):
-        arquivo = f"{self.data_dir}/veiculos.csv"
-        novo_veiculo = pd.DataFrame([dados_veiculo])
-        
-        if os.path.exists(arquivo):
-            df_existente = pd.read_csv(arquivo)
-            if dados_veiculo['placa'] in df_existente['placa'].values:
-                return False, "Placa já cadastrada"
-            df_final = pd.concat([df_existente, novo_veiculo], ignore_index=True)
-        else:
-            df_final = novo_veiculo
-        
-        df_final.to_csv(arquivo, index=False)
-        return True, "Veículo salvo com sucesso"
-    
-    def carregar_veiculos(self):
-        arquivo = f"{self.data_dir}/veiculos.csv"
-        if os.path.exists(arquivo):
-            return pd.read_csv(arquivo)
-        else:
-            return pd.DataFrame()
-    
-    def salvar_precos_anp(self, df_precos):
-        arquivo = f"{self.data_dir}/precos_anp.csv"
-        df_precos['data_importacao'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        if os.path.exists(arquivo):
-            df_existente = pd.read_csv(arquivo)
-            df_final = pd.concat([df_existente, df_precos], ignore_index=True)
-        else:
-            df_final = df_precos
-        
-        df_final.to_csv(arquivo, index=False)
-        return True
-    
-    def carregar_precos_anp(self):
-        arquivo = f"{self.data_dir}/precos_anp.csv"
-        if os.path.exists(arquivo):
-            return pd.read_csv(arquivo)
-        else:
-            return pd.DataFrame()
-
 # ========== MÓDULO ANP MANAGER ==========
 class ANPManager:
+    """Camada Streamlit sobre o ImportadorANP (utils/anp_import.py)"""
+    
     def __init__(self, db_manager):
         self.db_manager = db_manager
+        self.importador = ImportadorANP(db_manager)
     
-    def processar_planilha_anp(self, uploaded_file):
-        try:
-            if uploaded_file.name.endswith('.csv'):
-                df = self._ler_csv(uploaded_file)
-            elif uploaded_file.name.endswith('.xlsx'):
-                df = pd.read_excel(uploaded_file)
-            else:
-                return False, "Formato não suportado. Use CSV ou XLSX."
+    def processar_planilha_anp(self, uploaded_file, streaming=False):
+        if streaming:
+            barra = st.progress(0.0)
+            status = st.empty()
             
-            if df.empty:
-                return False, "Arquivo vazio ou não pôde ser lido."
-            
-            st.write("🔍 **Pré-visualização dos dados brutos:**")
-            st.write(f"Colunas encontradas: {list(df.columns)}")
-            st.dataframe(df.head(3))
-            
-            df_limpo = self._limpar_dados_anp(df)
-            
-            if df_limpo.empty:
-                return False, "Nenhum dado válido encontrado. Verifique o formato."
-            
-            self.db_manager.salvar_precos_anp(df_limpo)
-            return True, f"✅ {len(df_limpo)} registros importados com sucesso!"
-            
-        except Exception as e:
-            return False, f"❌ Erro ao processar arquivo: {str(e)}"
-    
-    def _ler_csv(self, uploaded_file):
-        tentativas = [
-            {'encoding': 'utf-8', 'sep': ';'},
-            {'encoding': 'latin-1', 'sep': ';'},
-            {'encoding': 'utf-8', 'sep': ','},
-            {'encoding': 'latin-1', 'sep': ','},
-        ]
-        
-        for tentativa in tentativas:
-            try:
-                uploaded_file.seek(0)
-                df = pd.read_csv(uploaded_file, **tentativa)
-                if not df.empty:
-                    return df
-            except:
-                continue
-        
-        try:
-            uploaded_file.seek(0)
-            df = pd.read_csv(uploaded_file, engine='python')
-            return df
-        except:
-            return pd.DataFrame()
-    
-    def _detectar_colunas_anp(self, df):
-        """Detecta automaticamente as colunas relevantes da ANP"""
-        colunas_detectadas = {}
-        
-        # Mapeamento expandido incluindo seus nomes de colunas
-        mapeamento_colunas = {
-            'produto': [
-                'Produto', 'produto', 'COMBUSTÍVEL', 'combustivel', 'PRODUTO', 
-                'PRODUTO', 'Combustível', 'Tipo', 'tipo', 'PRODUTO'
-            ],
-            'estado': [
-                'Estado', 'estado', 'UF', 'uf', 'Estado - Sigla', 'SIGLA', 
-                'sigla', 'ESTADO', 'Estado'
-            ],
-            'municipio': [
-                'Município', 'municipio', 'MUNICÍPIO', 'Cidade', 'cidade', 
-                'CIDADE', 'Localidade', 'MUNICÍPIO'
-            ],
-            'preco': [
-                'Valor de Venda', 'preco', 'Preço', 'PREÇO', 'Valor', 'valor', 
-                'Preco', 'Preço de Venda', 'PRECO', 'Venda', 'venda', 
-                'Preço Revenda', 'PREÇO MÁXIMO REVENDA', 'Preço Máximo Revenda',
-                'PREÇO MÁXIMO', 'Preço Máximo'
-            ],
-            'bairro': ['Bairro', 'bairro', 'BAIRRO', 'Bairro Revendedor'],
-            'endereco': [
-                'Endereço', 'endereco', 'ENDEREÇO', 'Nome da Rua', 'Rua', 'rua', 
-                'Logradouro', 'logradouro', 'Local', 'local'
-            ]
-        }
+            def ao_progredir(resultado):
+                barra.progress(resultado['fracao_lida'])
+                status.write(
+                    f"📥 {resultado['linhas_lidas']:,} linhas lidas • {resultado['registros']:,} válidas • "
+                    f"{resultado['linhas_lidas'] / max(resultado['segundos'], 1e-6):,.0f} linhas/s"
+                )
+        else:
+            ao_progredir = None
         
-        # Mostrar colunas disponíveis para debug
-        st.write("🔍 **Colunas disponíveis no arquivo:**", list(df.columns))
+        resultado = self.importador.importar(
+            uploaded_file,
+            streaming=streaming,
+            ao_detectar=lambda df, colunas, dialeto: self._mostrar_deteccao(df, colunas, dialeto, streaming),
+            ao_progredir=ao_progredir,
+        )
         
-        # Detectar colunas (case insensitive e com correspondência parcial)
-        df_colunas = [str(col).strip().upper() for col in df.columns]
+        if not streaming and resultado['linhas_lidas']:
+            st.write(f"✅ Preços convertidos: {resultado['precos_convertidos']} de {resultado['linhas_lidas']}")
+            st.write(f"✅ Combustíveis filtrados: {resultado['combustiveis_filtrados']}")
+        return resultado['sucesso'], resultado['mensagem']
+    
+    def _mostrar_deteccao(self, df, colunas_detectadas, dialeto, streaming):
+        if dialeto is not None:
+            st.caption(f"🧾 Dialeto detectado: {descrever_dialeto(dialeto)}")
         
-        for coluna_padrao, possiveis_nomes in mapeamento_colunas.items():
-            for nome in possiveis_nomes:
-                nome_limpo = str(nome).strip().upper()
-                
-                # Busca exata
-                for i, coluna_df in enumerate(df_colunas):
-                    if nome_limpo == coluna_df:
-                        colunas_detectadas[coluna_padrao] = df.columns[i]  # Usar nome original
-                        break
-                
-                # Se não encontrou exato, busca parcial
-                if coluna_padrao not in colunas_detectadas:
-                    for i, coluna_df in enumerate(df_colunas):
-                        if nome_limpo in coluna_df or coluna_df in nome_limpo:
-                            colunas_detectadas[coluna_padrao] = df.columns[i]
-                            break
-                
-                if coluna_padrao in colunas_detectadas:
-                    break
+        if not streaming:
+            st.write("🔍 **Pré-visualização dos dados brutos:**")
+            st.write(f"Colunas encontradas: {list(df.columns)}")
+            st.dataframe(df.head(3))
         
         # Debug: mostrar o que foi detectado
         st.write("🎯 **Mapeamento detectado:**", colunas_detectadas)
         
-        return colunas_detectadas
-    
-    def _limpar_dados_anp(self, df):
-        """Limpa e padroniza os dados da ANP"""
-        # Detectar colunas automaticamente
-        colunas_detectadas = self._detectar_colunas_anp(df)
-        
-        st.write("🎯 **Colunas detectadas:**", colunas_detectadas)
-        
         if not colunas_detectadas:
             st.error("""
             ❌ **Não foi possível detectar colunas válidas!**
@@ -264,92 +144,236 @@ class ANPManager:
             1. Verifique se as colunas têm os nomes corretos
             2. Ou renomeie para: Produto, Estado, Município, Valor de Venda
             """.format(list(df.columns)))
-            return pd.DataFrame()
-        
-        # Renomear colunas
-        df_renomeado = df.rename(columns=colunas_detectadas)
-        
-        # Garantir colunas essenciais
-        for coluna in ['produto', 'estado', 'municipio', 'preco']:
-            if coluna not in df_renomeado.columns:
-                df_renomeado[coluna] = None
-        
-        # Mostrar prévia dos dados renomeados
-        st.write("📋 **Dados após renomeação:**")
-        st.dataframe(df_renomeado.head(3))
-        
-        # Converter preços para numérico
-        if 'preco' in df_renomeado.columns:
-            st.write("💰 **Convertendo preços...**")
-            df_renomeado['preco'] = (
-                df_renomeado['preco']
-                .astype(str)
-                .str.replace('R$', '', regex=False)
-                .str.replace('$', '', regex=False)
-                .str.replace(',', '.')
-                .str.strip()
-            )
-            df_renomeado['preco'] = pd.to_numeric(df_renomeado['preco'], errors='coerce')
-            
-            # Mostrar estatísticas de conversão
-            st.write(f"✅ Preços convertidos: {df_renomeado['preco'].notna().sum()} de {len(df_renomeado)}")
-            df_renomeado = df_renomeado.dropna(subset=['preco'])
-        
-        # Filtrar combustíveis - expandindo a lista
-        combustiveis_principais = [
-            'GASOLINA', 'GASOLINA COMUM', 'ETANOL', 'ÓLEO DIESEL', 'DIESEL', 
-            'GASOLINA ADITIVADA', 'DIESEL S10', 'DIESEL S500', 'GNV',
-            'ETANOL HIDRATADO', 'GASOLINA C', 'GASOLINA A'
-        ]
-        
-        if 'produto' in df_renomeado.columns:
-            st.write("🔍 **Filtrando combustíveis...**")
-            mask = df_renomeado['produto'].astype(str).str.upper().isin(combustiveis_principais)
-            df_filtrado = df_renomeado[mask]
-            st.write(f"✅ Combustíveis filtrados: {len(df_filtrado)} de {len(df_renomeado)}")
-        else:
-            df_filtrado = df_renomeado
-        
-        # Limpar textos
-        if 'estado' in df_filtrado.columns:
-            df_filtrado['estado'] = df_filtrado['estado'].astype(str).str.upper().str.strip()
-        
-        if 'municipio' in df_filtrado.columns:
-            df_filtrado['municipio'] = df_filtrado['municipio'].astype(str).str.title().str.strip()
-        
-        # Timestamp
-        df_filtrado['data_importacao'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        st.success(f"📊 **Processamento concluído:** {len(df_filtrado)} registros válidos")
-        
-        # Mostrar amostra dos dados finais
-        st.write("🎉 **Dados finais processados:**")
-        st.dataframe(df_filtrado.head())
-        
-        return df_filtrado
     
     def obter_estatisticas_precos(self):
-        df_precos = self.db_manager.carregar_precos_anp()
+        """Estatísticas do Dashboard, lidas do resumo materializado"""
+        por_produto = self.db_manager.carregar_resumo_precos(agrupar_por=['produto'])
         
-        if df_precos.empty:
+        if por_produto.empty:
             return None
         
+        por_estado = self.db_manager.carregar_resumo_precos(agrupar_por=['estado'])
         estatisticas = {
-            'total_registros': len(df_precos),
-            'ultima_importacao': df_precos['data_importacao'].max() if 'data_importacao' in df_precos.columns else 'N/A',
-            'combustiveis': df_precos['produto'].value_counts().to_dict(),
-            'preco_medio_por_combustivel': df_precos.groupby('produto')['preco'].mean().round(2).to_dict(),
-            'estados_cobertos': df_precos['estado'].nunique() if 'estado' in df_precos.columns else 0,
+            'total_registros': int(por_produto['n'].sum()),
+            'ultima_importacao': self.db_manager.ultima_importacao_precos() or 'N/A',
+            'combustiveis': dict(zip(por_produto['produto'], por_produto['n'].astype(int))),
+            'preco_medio_por_combustivel': dict(zip(por_produto['produto'], por_produto['preco_medio'].round(2))),
+            'estados_cobertos': int((por_estado['estado'] != '').sum()),
         }
         
         return estatisticas
 
+# ========== CACHE DE DADOS ==========
+# Compartilhado entre sessões e reruns; as chaves incluem a versão dos dados,
+# então qualquer gravação (ou edição externa do CSV) invalida o cache
+@st.cache_resource
+def obter_database_manager():
+    return DatabaseManager()
+
+
+@st.cache_resource
+def obter_anp_manager():
+    return ANPManager(obter_database_manager())
+
+
+@st.cache_resource
+def obter_calculadora_distancias():
+    return CalculadoraDistancias(obter_database_manager())
+
+
+@st.cache_data(show_spinner=False)
+def _veiculos_em_cache(data_dir, assinatura):
+    return obter_database_manager().carregar_veiculos()
+
+
+@st.cache_data(show_spinner=False)
+def _custos_mensais_em_cache(data_dir, assinatura, placas, inicio):
+    return obter_database_manager().carregar_custos_mensais(placas=list(placas), inicio=inicio)
+
+
+@st.cache_data(show_spinner=False)
+def _precos_em_cache(data_dir, versao, colunas, filtros):
+    return obter_database_manager().carregar_precos_anp(colunas=colunas, filtros=filtros)
+
+
+@st.cache_data(show_spinner=False)
+def _pagina_precos_em_cache(data_dir, versao, filtros, data_inicio, data_fim,
+                            ordenar_por, decrescente, pagina, tamanho_pagina):
+    return obter_database_manager().consultar_precos(
+        filtros, data_inicio, data_fim, ordenar_por, decrescente, pagina, tamanho_pagina
+    )
+
+
+@st.cache_data(show_spinner=False)
+def _resumo_precos_em_cache(data_dir, versao, agrupar_por, filtros):
+    return obter_database_manager().carregar_resumo_precos(agrupar_por=agrupar_por, filtros=filtros)
+
+
+@st.cache_data(show_spinner=False)
+def _serie_precos_em_cache(data_dir, versao, produtos, estados, por_estado):
+    return obter_database_manager().serie_precos(list(produtos), list(estados), por_estado)
+
+
+@st.cache_data(show_spinner=False)
+def _preco_referencia_em_cache(data_dir, versao, produtos, estado, municipio):
+    return obter_database_manager().consultar_preco(list(produtos), estado, municipio)
+
+
+@st.cache_data(show_spinner=False)
+def _indice_precos_em_cache(data_dir, versao):
+    return obter_database_manager().carregar_indice_precos()
+
+
+@st.cache_data(show_spinner=False)
+def _desempenho_em_cache(data_dir, versao):
+    return obter_database_manager().carregar_desempenho()
+
+
+@st.cache_data(show_spinner=False)
+def _alertas_abastecimento_em_cache(data_dir, versao, inicio):
+    db_manager = obter_database_manager()
+    return AnalisadorDesempenho(db_manager).detectar_anomalias(
+        db_manager.carregar_indice_precos(), db_manager.carregar_veiculos(), inicio=inicio
+    )
+
+
+@st.cache_data(show_spinner=False)
+def _litros_semanais_em_cache(data_dir, versao, placas):
+    return AnalisadorDesempenho(obter_database_manager()).litros_semanais(list(placas))
+
+
+@st.cache_data(show_spinner=False)
+def _previsoes_em_cache(data_dir, assinatura, nivel):
+    # As previsões ficam gravadas no banco; aqui só se evita relê-las a cada rerun
+    return PrevisorPrecos(obter_database_manager()).previsoes(nivel)
+
+
+@st.cache_data(show_spinner=False)
+def _estatisticas_precos_em_cache(data_dir, versao):
+    return obter_anp_manager().obter_estatisticas_precos()
+
 # ========== DATA LOADER ==========
 class DataLoader:
     def __init__(self):
-        self.db_manager = DatabaseManager()
-        self.veiculos_df = self.db_manager.carregar_veiculos()
-        self.anp_manager = ANPManager(self.db_manager)
+        self.db_manager = obter_database_manager()
+        self.anp_manager = obter_anp_manager()
+        self.distancias = obter_calculadora_distancias()
+    
+    @property
+    def veiculos_df(self):
+        arquivo = f"{self.db_manager.data_dir}/veiculos.csv"
+        return _veiculos_em_cache(self.db_manager.data_dir, DatabaseManager.assinatura_arquivo(arquivo))
+    
+    def custos_mensais(self, placas=(), inicio=None):
+        return _custos_mensais_em_cache(
+            self.db_manager.data_dir, DatabaseManager.assinatura_arquivo(self.db_manager.arquivo_custos),
+            tuple(placas), inicio,
+        )
+    
+    def carregar_precos_anp(self, colunas=None, filtros=None):
+        return _precos_em_cache(
+            self.db_manager.data_dir, self.db_manager.versao_dados(),
+            tuple(colunas) if colunas else None, filtros,
+        )
+    
+    def consultar_precos(self, filtros=None, data_inicio=None, data_fim=None,
+                         ordenar_por=None, decrescente=False, pagina=1, tamanho_pagina=50):
+        return _pagina_precos_em_cache(
+            self.db_manager.data_dir, self.db_manager.versao_dados(), filtros, data_inicio, data_fim,
+            ordenar_por, decrescente, pagina, tamanho_pagina,
+        )
+    
+    def carregar_resumo_precos(self, agrupar_por=('produto',), filtros=None):
+        return _resumo_precos_em_cache(
+            self.db_manager.data_dir, self.db_manager.versao_dados(), tuple(agrupar_por), filtros
+        )
+    
+    def serie_precos(self, produtos, estados=None, por_estado=False):
+        return _serie_precos_em_cache(
+            self.db_manager.data_dir, self.db_manager.versao_dados(),
+            tuple(produtos), tuple(estados or ()), por_estado,
+        )
+    
+    def estatisticas_precos(self):
+        return _estatisticas_precos_em_cache(self.db_manager.data_dir, self.db_manager.versao_dados())
+    
+    def indice_precos(self):
+        return _indice_precos_em_cache(self.db_manager.data_dir, self.db_manager.versao_dados())
+    
+    def desempenho_veiculos(self):
+        """Consumo real por veículo, pré-calculado na ingestão da telemetria"""
+        return _desempenho_em_cache(self.db_manager.data_dir, self.db_manager.versao_dados())
+    
+    def alertas_abastecimento(self, inicio=None):
+        return _alertas_abastecimento_em_cache(self.db_manager.data_dir, self.db_manager.versao_dados(), inicio)
+    
+    def litros_semanais(self, placas):
+        return _litros_semanais_em_cache(self.db_manager.data_dir, self.db_manager.versao_dados(), tuple(placas))
+    
+    def previsoes_precos(self, nivel='estado'):
+        """Previsões semanais ANP; recalculadas só após importações com registros novos"""
+        return _previsoes_em_cache(self.db_manager.data_dir, self.db_manager.assinatura_precos(), nivel)
+    
+    def preco_referencia(self, combustivel, estado=None, municipio=None):
+        produtos = PRODUTOS_POR_COMBUSTIVEL.get(combustivel, [combustivel])
+        return _preco_referencia_em_cache(
+            self.db_manager.data_dir, self.db_manager.versao_dados(), tuple(produtos), estado, municipio
+        )
+
+def formatar_reais(valor):
+    """R$ no formato brasileiro: 1234.5 -> 'R$ 1.234,50'"""
+    return "R$ " + f"{valor:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+# ========== PREÇO DE REFERÊNCIA ==========
+UFS = [
+    'AC', 'AL', 'AM', 'AP', 'BA', 'CE', 'DF', 'ES', 'GO', 'MA', 'MG', 'MS', 'MT', 'PA',
+    'PB', 'PE', 'PI', 'PR', 'RJ', 'RN', 'RO', 'RR', 'RS', 'SC', 'SE', 'SP', 'TO',
+]
+
+
+def selecionar_veiculo(data_loader, chave):
+    """Seletor de veículo cadastrado; retorna (combustível, consumo, veículo) para
+    pré-preencher os formulários (veículo é a linha do cadastro ou None)"""
+    veiculos = data_loader.veiculos_df
+    combustivel, consumo, veiculo = "Diesel", 8.0, None
+    if not veiculos.empty and 'placa' in veiculos.columns:
+        rotulos = ["Nenhum"] + [f"{v.placa} - {v.nome}" for v in veiculos.itertuples()]
+        escolha = st.selectbox("Veículo", rotulos, key=f"{chave}_veiculo")
+        if escolha != "Nenhum":
+            veiculo = veiculos.iloc[rotulos.index(escolha) - 1]
+            combustivel = veiculo.get('combustivel', combustivel)
+            consumo = float(veiculo.get('consumo', consumo))
+            # Consumo medido pela telemetria tem precedência sobre o cadastrado
+            desempenho = data_loader.desempenho_veiculos()
+            medido = desempenho.loc[desempenho['placa'] == str(veiculo['placa']).upper(), 'km_l_recente']
+            if not medido.dropna().empty:
+                consumo = round(float(medido.dropna().iloc[0]), 2)
+                st.caption(f"Consumo real (telemetria): {consumo:.2f} km/l")
+    opcoes = list(PRODUTOS_POR_COMBUSTIVEL)
+    combustivel = st.selectbox(
+        "Combustível", opcoes, index=opcoes.index(combustivel) if combustivel in opcoes else 0,
+        key=f"{chave}_combustivel",
+    )
+    return combustivel, consumo, veiculo
+
+
+def precos_referencia(data_loader, combustivel, locais):
+    """Consulta o índice de preços para cada (rótulo, UF, município).
+    
+    Retorna a tabela exibida ao usuário e o preço sugerido (média das medianas).
+    """
+    linhas = []
+    for rotulo, estado, municipio in locais:
+        preco = data_loader.preco_referencia(combustivel, estado, municipio)
+        if preco is not None:
+            linhas.append({
+                'Local': rotulo, 'Referência': f"{preco['nivel']} ({preco['produto']})",
+                'Último': preco['ultimo'], 'Mediana': preco['mediana'], 'Mais barato': preco['minimo'],
+                'Semana': preco['semana'],
+            })
+    tabela = pd.DataFrame(linhas)
+    sugerido = round(float(tabela['Mediana'].mean()), 2) if not tabela.empty else None
+    return tabela, sugerido
 
 # ========== MÓDULO DASHBOARD ==========
 class Dashboard:
@@ -360,12 +384,17 @@ class Dashboard:
         st.markdown('<h1 class="main-header">📊 Dashboard</h1>', unsafe_allow_html=True)
         
         veiculos_count = len(self.data_loader.veiculos_df) if not self.data_loader.veiculos_df.empty else 0
-        stats_anp = self.data_loader.anp_manager.obter_estatisticas_precos()
+        stats_anp = self.data_loader.estatisticas_precos()
+        custos = self.data_loader.custos_mensais()
+        mes_atual = datetime.now().strftime("%Y-%m-01")
         
         col1, col2, col3, col4 = st.columns(4)
         col1.metric("Veículos Cadastrados", veiculos_count)
         col2.metric("Preços ANP", f"{stats_anp['total_registros'] if stats_anp else 0}")
-        col3.metric("Custo Total", "R$ 15.000")
+        col3.metric(
+            "Custo Total", formatar_reais(custos['total'].sum()),
+            f"{formatar_reais(custos.loc[custos['mes'] == mes_atual, 'total'].sum())} no mês", delta_color="off",
+        )
         col4.metric("Estados", f"{stats_anp['estados_cobertos'] if stats_anp else 0}")
         
         col1, col2 = st.columns(2)
@@ -390,6 +419,32 @@ class Dashboard:
                 st.plotly_chart(fig, use_container_width=True)
             else:
                 st.info("Importe dados da ANP")
+        
+        self._mostrar_consumo_real()
+    
+    def _mostrar_consumo_real(self):
+        st.subheader("🚛 Consumo Real (telemetria)")
+        desempenho = self.data_loader.desempenho_veiculos()
+        if desempenho.empty:
+            st.info("Importe abastecimentos em Adicionar Dados > Telemetria para ver o consumo real")
+            return
+        
+        veiculos = self.data_loader.veiculos_df
+        tabela = desempenho.copy()
+        if not veiculos.empty and 'consumo' in veiculos.columns:
+            cadastro = veiculos.assign(placa=veiculos['placa'].astype(str).str.upper()).drop_duplicates('placa')
+            tabela = tabela.merge(cadastro[['placa', 'nome', 'consumo']], on='placa', how='left')
+            tabela['diferenca_pct'] = ((tabela['km_l_recente'] / tabela['consumo'] - 1) * 100).round(1)
+        
+        col1, col2, col3 = st.columns(3)
+        medianos = desempenho['km_l'].dropna()
+        col1.metric("Consumo mediano da frota", f"{medianos.median():.2f} km/l" if not medianos.empty else "-")
+        col2.metric("Litros registrados", f"{desempenho['litros'].sum():,.0f}")
+        col3.metric("Último evento", str(desempenho['ultimo_evento'].max()))
+        
+        colunas = [coluna for coluna in ['placa', 'nome', 'consumo', 'km_l', 'km_l_recente', 'diferenca_pct',
+                                         'km_monitorado', 'abastecimentos', 'ultimo_evento'] if coluna in tabela.columns]
+        st.dataframe(tabela[colunas].round(2), hide_index=True, use_container_width=True)
 
 # ========== MÓDULO FUEL ANALYSIS ==========
 class FuelAnalysis:
@@ -402,26 +457,152 @@ class FuelAnalysis:
         col1, col2 = st.columns(2)
         
         with col1:
-            st.subheader("📈 Evolução de Preços")
-            df_precos = self.data_loader.db_manager.carregar_precos_anp()
-            
-            if not df_precos.empty:
-                precos_por_combustivel = df_precos.groupby('produto')['preco'].mean().reset_index()
-                fig = px.bar(precos_por_combustivel, x='produto', y='preco')
-                st.plotly_chart(fig, use_container_width=True)
-            else:
-                st.info("Importe dados da ANP para ver preços")
+            self._mostrar_evolucao_precos()
         
         with col2:
             st.subheader("🧮 Calculadora de Viagem")
+            combustivel, consumo_veiculo, _ = selecionar_veiculo(self.data_loader, "calculadora")
+            col_uf, col_municipio = st.columns([1, 2])
+            with col_uf:
+                estado = st.selectbox("UF", UFS, index=UFS.index('SP'), key="calculadora_uf")
+            with col_municipio:
+                municipio = st.text_input("Município do abastecimento", "São Paulo", key="calculadora_municipio")
+            
+            tabela, preco_sugerido = precos_referencia(
+                self.data_loader, combustivel, [(municipio, estado, municipio)]
+            )
+            if not tabela.empty:
+                st.caption(
+                    f"Referência ANP ({tabela['Referência'].iloc[0]}): último R$ {tabela['Último'].iloc[0]:.2f} • "
+                    f"mediana R$ {tabela['Mediana'].iloc[0]:.2f} • mais barato R$ {tabela['Mais barato'].iloc[0]:.2f}"
+                )
+            
             with st.form("calculadora_viagem"):
                 distancia = st.number_input("Distância (km)", min_value=1, value=300)
-                consumo = st.number_input("Consumo (km/l)", min_value=1.0, value=10.0)
-                preco = st.number_input("Preço (R$/litro)", min_value=0.1, value=5.80)
+                consumo = st.number_input("Consumo (km/l)", min_value=1.0, value=max(consumo_veiculo, 1.0))
+                preco = st.number_input("Preço (R$/litro)", min_value=0.1, value=preco_sugerido or 5.80)
                 
                 if st.form_submit_button("Calcular Custo"):
                     custo_total = (distancia / consumo) * preco
                     st.success(f"**Custo total: R$ {custo_total:.2f}**")
+        
+        self._mostrar_custo_previsto()
+        self._mostrar_alertas()
+    
+    def _mostrar_custo_previsto(self):
+        st.subheader("📅 Custo de Diesel Previsto (4 semanas)")
+        with st.spinner("Ajustando previsões de preço..."):
+            previsoes_brasil = self.data_loader.previsoes_precos('brasil')
+        if previsoes_brasil.empty:
+            st.info("Importe dados da ANP para prever preços")
+            return
+        
+        # Volume semanal: telemetria dos veículos a diesel; sem ela, informado pelo usuário
+        veiculos = self.data_loader.veiculos_df
+        placas = []
+        if not veiculos.empty and 'combustivel' in veiculos.columns:
+            placas = veiculos.loc[veiculos['combustivel'] == 'Diesel', 'placa'].astype(str).str.upper().tolist()
+        litros = self.data_loader.litros_semanais(placas) if placas else pd.DataFrame()
+        if litros.empty or litros['litros'].sum() <= 0:
+            col_litros, col_uf = st.columns(2)
+            volume = col_litros.number_input("Litros de diesel por semana", min_value=0.0, value=1000.0, step=100.0,
+                                             key="previsao_litros")
+            estado = col_uf.selectbox("UF de abastecimento", UFS, index=UFS.index('SP'), key="previsao_uf")
+            litros = pd.DataFrame({'estado': [estado], 'litros': [volume]})
+            st.caption("Sem telemetria dos veículos a diesel: volume informado manualmente")
+        else:
+            st.caption(f"Volume semanal médio das últimas 8 semanas de telemetria ({len(placas)} veículo(s) a diesel)")
+        
+        custos = custo_previsto(
+            litros, self.data_loader.previsoes_precos('estado'), previsoes_brasil, PRODUTOS_POR_COMBUSTIVEL['Diesel']
+        )
+        if custos.empty:
+            st.info("Sem previsão de preço para diesel")
+            return
+        semanal = custos.groupby('semana', as_index=False)[['litros', 'custo', 'custo_minimo', 'custo_maximo']].sum()
+        
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Custo previsto", formatar_reais(semanal['custo'].sum()))
+        col2.metric("Faixa (95%)", f"{formatar_reais(semanal['custo_minimo'].sum())} a "
+                                   f"{formatar_reais(semanal['custo_maximo'].sum())}")
+        col3.metric("Litros/semana", f"{semanal['litros'].iloc[0]:,.0f}")
+        
+        fig = go.Figure([
+            go.Scatter(x=semanal['semana'], y=semanal['custo_maximo'], mode='lines', line=dict(width=0),
+                       showlegend=False, hoverinfo='skip'),
+            go.Scatter(x=semanal['semana'], y=semanal['custo_minimo'], mode='lines', line=dict(width=0),
+                       fill='tonexty', name='Faixa 95%'),
+            go.Scatter(x=semanal['semana'], y=semanal['custo'], mode='lines+markers', name='Custo previsto'),
+        ])
+        fig.update_layout(xaxis_title="Semana", yaxis_title="R$", height=320)
+        st.plotly_chart(fig, use_container_width=True)
+        
+        with st.expander("Preço previsto por UF"):
+            st.dataframe(
+                custos[['semana', 'estado', 'produto', 'referencia', 'litros', 'previsao', 'inferior', 'superior',
+                        'custo']].round(2),
+                hide_index=True, use_container_width=True,
+            )
+        st.caption(
+            "Semanas seguintes à última coleta ANP importada. Em cada série vence o modelo "
+            "(ingênuo, suavização exponencial, Holt amortecido ou sazonal) de menor erro recente."
+        )
+    
+    def _mostrar_alertas(self):
+        st.subheader("🚨 Alertas de Abastecimento")
+        dias = st.selectbox("Período", [30, 90, 365], index=1, format_func=lambda d: f"Últimos {d} dias",
+                            key="alertas_periodo")
+        inicio = (datetime.now() - timedelta(days=dias)).strftime("%Y-%m-%d")
+        with st.spinner("Analisando abastecimentos..."):
+            alertas = self.data_loader.alertas_abastecimento(inicio)
+        if alertas.empty:
+            st.info("Nenhum abastecimento suspeito no período (ou sem telemetria importada)")
+            return
+        
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Alertas", f"{len(alertas):,}")
+        col2.metric("Veículos com alerta", alertas['placa'].nunique())
+        col3.metric("Perda estimada", formatar_reais(alertas['perda_estimada'].sum()))
+        st.caption(
+            "Consumo comparado à mediana do próprio veículo (desvio robusto pela MAD) e preço pago "
+            "comparado à mediana ANP do município, estado ou Brasil. Ordenado por gravidade."
+        )
+        st.dataframe(alertas.head(500), hide_index=True, use_container_width=True)
+        st.download_button(
+            "📥 Baixar alertas (CSV)", alertas.to_csv(index=False).encode('utf-8'),
+            file_name=f"alertas_abastecimento_{inicio}.csv", mime="text/csv",
+        )
+    
+    def _mostrar_evolucao_precos(self):
+        st.subheader("📈 Evolução de Preços")
+        locais = self.data_loader.carregar_resumo_precos(agrupar_por=['produto', 'estado'])
+        
+        if locais.empty:
+            st.info("Importe dados da ANP para ver preços")
+            return
+        
+        opcoes_produto = sorted(locais['produto'].unique())
+        padrao = [p for p in opcoes_produto if 'DIESEL' in p][:2] or opcoes_produto[:1]
+        produtos = st.multiselect("Combustíveis", opcoes_produto, default=padrao, key="evolucao_produtos")
+        estados = st.multiselect(
+            "Estados (vazio = Brasil)", sorted(e for e in locais['estado'].unique() if e), key="evolucao_estados"
+        )
+        if not produtos:
+            st.info("Escolha ao menos um combustível")
+            return
+        
+        serie, granularidade = self.data_loader.serie_precos(produtos, estados, por_estado=bool(estados))
+        if serie.empty:
+            st.info("Sem dados para a seleção")
+            return
+        
+        serie['serie'] = serie['produto'] + (" - " + serie['estado'] if estados else "")
+        fig = px.line(
+            serie, x='periodo', y='preco_medio', color='serie', markers=True,
+            labels={'periodo': 'Data da coleta', 'preco_medio': 'Preço médio (R$/l)', 'serie': ''},
+        )
+        st.plotly_chart(fig, use_container_width=True)
+        st.caption(f"Médias {granularidade} calculadas na importação")
 
 # ========== MÓDULO ANP PRICES ==========
 class ANPPrices:
@@ -450,10 +631,17 @@ class ANPPrices:
         
         uploaded_file = st.file_uploader("Escolha o arquivo", type=['csv', 'xlsx'])
         
+        streaming = st.checkbox(
+            "Importação em blocos (arquivos grandes, como a série histórica completa)",
+            help="Lê e grava o arquivo em partes, mantendo o uso de memória constante"
+        )
+        
         if uploaded_file is not None:
             if st.button("Processar Arquivo"):
                 with st.spinner("Processando..."):
-                    sucesso, mensagem = self.data_loader.anp_manager.processar_planilha_anp(uploaded_file)
+                    sucesso, mensagem = self.data_loader.anp_manager.processar_planilha_anp(
+                        uploaded_file, streaming=streaming
+                    )
                     if sucesso:
                         st.success(mensagem)
                     else:
@@ -462,12 +650,63 @@ class ANPPrices:
     def _mostrar_precos(self):
         st.subheader("📋 Dados de Preços")
         
-        df_precos = self.data_loader.db_manager.carregar_precos_anp()
-        
-        if not df_precos.empty:
-            st.dataframe(df_precos, use_container_width=True)
-        else:
+        locais = self.data_loader.carregar_resumo_precos(agrupar_por=['produto', 'estado', 'municipio'])
+        if locais.empty:
             st.info("Nenhum dado disponível")
+            return
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            produtos = st.multiselect("Produto", sorted(locais['produto'].unique()))
+        with col2:
+            estados = st.multiselect("Estado", sorted(e for e in locais['estado'].unique() if e))
+        with col3:
+            opcoes_municipio = locais[locais['estado'].isin(estados)] if estados else locais
+            municipios = st.multiselect("Município", sorted(m for m in opcoes_municipio['municipio'].unique() if m))
+        with col4:
+            periodo = st.date_input("Período da coleta", value=(), help="Deixe vazio para todo o histórico")
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            colunas_ordenacao = {
+                "Sem ordenação": None, "Preço": 'preco', "Data da coleta": 'data_coleta',
+                "Data de importação": 'data_importacao', "Município": 'municipio', "Revenda": 'revenda',
+            }
+            ordenar_por = colunas_ordenacao[st.selectbox("Ordenar por", list(colunas_ordenacao))]
+        with col2:
+            decrescente = st.checkbox("Decrescente", value=False)
+        with col3:
+            tamanho_pagina = st.selectbox("Linhas por página", [25, 50, 100, 500], index=1)
+        
+        filtros = {}
+        if produtos:
+            filtros['produto'] = produtos
+        if estados:
+            filtros['estado'] = estados
+        if municipios:
+            filtros['municipio'] = municipios
+        data_inicio = periodo[0] if len(periodo) > 0 else None
+        data_fim = periodo[1] if len(periodo) > 1 else data_inicio
+        
+        _, total = self.data_loader.consultar_precos(
+            filtros, data_inicio, data_fim, pagina=1, tamanho_pagina=1
+        )
+        total_paginas = max((total + tamanho_pagina - 1) // tamanho_pagina, 1)
+        with col4:
+            pagina = st.number_input("Página", min_value=1, max_value=total_paginas, value=1, step=1)
+        
+        df_pagina, total = self.data_loader.consultar_precos(
+            filtros, data_inicio, data_fim, ordenar_por, decrescente, int(pagina), tamanho_pagina
+        )
+        
+        if total == 0:
+            st.info("Nenhum registro para os filtros escolhidos")
+            return
+        
+        primeira = (int(pagina) - 1) * tamanho_pagina + 1
+        st.caption(f"Mostrando {primeira:,}–{primeira + len(df_pagina) - 1:,} de {total:,} registros "
+                   f"(página {int(pagina)} de {total_paginas})")
+        st.dataframe(df_pagina, use_container_width=True, hide_index=True)
 
 # ========== MÓDULO ROUTE OPTIMIZER ==========
 class RouteOptimizer:
@@ -477,69 +716,428 @@ class RouteOptimizer:
     def mostrar(self):
         st.markdown('<h1 class="main-header">🗺️ Otimização de Rotas</h1>', unsafe_allow_html=True)
         
+        tab_simples, tab_paradas, tab_abastecimento, tab_lote = st.tabs(
+            ["📍 Rota Simples", "🚚 Múltiplas Paradas", "⛽ Abastecimento", "📦 Viagens em Lote"]
+        )
+        with tab_simples:
+            self._mostrar_rota_simples()
+        with tab_paradas:
+            self._mostrar_multiplas_paradas()
+        with tab_abastecimento:
+            self._mostrar_abastecimento()
+        with tab_lote:
+            self._mostrar_viagens_em_lote()
+    
+    def _mostrar_rota_simples(self):
         st.subheader("📍 Configurar Rota")
         col1, col2 = st.columns(2)
         
         with col1:
-            origem = st.text_input("Origem", "São Paulo")
-            destino = st.text_input("Destino", "Rio de Janeiro")
-            distancia = st.number_input("Distância (km)", min_value=1, value=450)
+            col_origem, col_uf_origem = st.columns([3, 1])
+            origem = col_origem.text_input("Origem", "São Paulo")
+            uf_origem = col_uf_origem.selectbox("UF", UFS, index=UFS.index('SP'), key="rota_uf_origem")
+            col_destino, col_uf_destino = st.columns([3, 1])
+            destino = col_destino.text_input("Destino", "Rio de Janeiro")
+            uf_destino = col_uf_destino.selectbox("UF ", UFS, index=UFS.index('RJ'), key="rota_uf_destino")
+            
+            calculadora = self.data_loader.distancias
+            codigos = calculadora.localizar([origem, destino], [uf_origem, uf_destino])
+            estimada = calculadora.distancias(codigos[:1], codigos[1:])[0] if (codigos >= 0).all() else np.nan
+            distancia = st.number_input(
+                "Distância (km)", min_value=1, value=max(int(round(estimada)), 1) if not np.isnan(estimada) else 450,
+                help=f"Estimada pela linha reta × {calculadora.fator_rodoviario:.2f}, ou a distância gravada para o trecho",
+            )
+            if np.isnan(estimada):
+                st.caption("Origem ou destino fora da tabela de municípios: informe a distância.")
+            elif distancia != round(estimada) and st.button("💾 Gravar como distância real do trecho"):
+                calculadora.informar_distancia(codigos[0], codigos[1], distancia)
+                st.success("Distância gravada para as próximas consultas")
         
         with col2:
-            consumo = st.number_input("Consumo (km/l)", min_value=1.0, value=8.0)
-            preco_combustivel = st.number_input("Preço (R$/litro)", min_value=0.1, value=4.20)
+            combustivel, consumo_veiculo, _ = selecionar_veiculo(self.data_loader, "rota")
+            tabela, preco_sugerido = precos_referencia(
+                self.data_loader, combustivel,
+                [(f"Origem: {origem}", uf_origem, origem), (f"Destino: {destino}", uf_destino, destino)],
+            )
+            consumo = st.number_input("Consumo (km/l)", min_value=1.0, value=max(consumo_veiculo, 1.0))
+            preco_combustivel = st.number_input(
+                "Preço (R$/litro)", min_value=0.1, value=preco_sugerido or 4.20,
+                help="Sugerido pela mediana ANP da última semana na origem e no destino",
+            )
             pedagios = st.number_input("Pedágios (R$)", min_value=0, value=120)
         
+        if not tabela.empty:
+            st.caption("Preços ANP de referência (R$/litro)")
+            st.dataframe(tabela, hide_index=True, use_container_width=True)
+        else:
+            st.info("Sem preços ANP para a rota. Importe planilhas em 'Preços ANP' para sugerir o preço.")
+        
         if st.button("Calcular Custo"):
             litros_necessarios = distancia / consumo
             custo_combustivel = litros_necessarios * preco_combustivel
             custo_total = custo_combustivel + pedagios
             
             st.success(f"**Custo total da viagem: R$ {custo_total:.2f}**")
+    
+    # Exemplo inicial do editor de paradas; a primeira linha é sempre o depósito
+    PARADAS_EXEMPLO = pd.DataFrame({
+        'nome': ["Depósito", "Cliente A", "Cliente B", "Cliente C", "Cliente D", "Cliente E"],
+        'municipio': ["São Paulo", "Campinas", "Jundiaí", "Sorocaba", "Santos", "São José dos Campos"],
+        'uf': ["SP"] * 6,
+        'latitude': [np.nan] * 6,
+        'longitude': [np.nan] * 6,
+        'carga': [0, 1200, 800, 2500, 1500, 3000],
+    })
+    
+    def _preparar_paradas(self, paradas):
+        """Completa as coordenadas pelo município e escolhe a matriz de distâncias:
+        km rodoviários do cache quando todas as paradas são municípios conhecidos,
+        senão linha reta × fator rodoviário entre as coordenadas"""
+        calculadora = self.data_loader.distancias
+        paradas = paradas.copy()
+        for coluna in ['municipio', 'uf', 'latitude', 'longitude']:
+            if coluna not in paradas.columns:
+                paradas[coluna] = np.nan
+        codigos = calculadora.localizar(paradas['municipio'], paradas['uf'])
+        latitudes, longitudes = calculadora.coordenadas(codigos)
+        paradas['latitude'] = pd.to_numeric(paradas['latitude'], errors='coerce').fillna(pd.Series(latitudes))
+        paradas['longitude'] = pd.to_numeric(paradas['longitude'], errors='coerce').fillna(pd.Series(longitudes))
+        
+        validas = paradas[['latitude', 'longitude']].notna().all(axis=1).to_numpy()
+        paradas, codigos = paradas[validas].reset_index(drop=True), codigos[validas]
+        if (codigos >= 0).all():
+            return paradas, calculadora.matriz(codigos)
+        return paradas, matriz_distancias(paradas['latitude'], paradas['longitude']) * calculadora.fator_rodoviario
+    
+    def _mostrar_multiplas_paradas(self):
+        st.subheader("🚚 Roteirização da Frota")
+        st.caption("A primeira linha é o depósito (saída e retorno). Carga em kg.")
+        
+        arquivo = st.file_uploader(
+            "Paradas (CSV com nome, carga e municipio/uf ou latitude/longitude)", type=['csv']
+        )
+        paradas = pd.read_csv(arquivo) if arquivo is not None else self.PARADAS_EXEMPLO
+        paradas = st.data_editor(paradas, num_rows="dynamic", use_container_width=True, key="paradas_rota")
+        
+        veiculos = self.data_loader.veiculos_df
+        if veiculos.empty:
+            st.warning("Cadastre veículos em 'Adicionar Dados' para roteirizar a frota.")
+            return
+        placas = st.multiselect("Veículos disponíveis", veiculos['placa'].tolist(), default=veiculos['placa'].tolist())
+        tempo_limite = st.slider("Tempo limite da otimização (s)", 1, 60, 5)
+        
+        if st.button("Otimizar Rotas", type="primary"):
+            paradas, matriz = self._preparar_paradas(paradas)
+            frota = veiculos[veiculos['placa'].isin(placas)].reset_index(drop=True)
+            if len(paradas) < 2 or frota.empty:
+                st.error("Informe o depósito, ao menos uma parada e um veículo")
+                return
+            
+            with st.spinner("Otimizando rotas..."):
+                plano, resultado = roteirizar(paradas, frota, tempo_limite=tempo_limite, matriz=matriz)
+            
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Viagens", len(resultado['rotas']))
+            col2.metric(
+                "Distância total", f"{resultado['distancia_total']:,.0f} km",
+                f"{resultado['distancia_total'] - resultado['distancia_inicial']:,.0f} km na busca local",
+                delta_color="inverse",
+            )
+            col3.metric("Paradas atendidas", len(paradas) - 1 - len(resultado['nao_atendidas']))
+            col4.metric("Tempo", f"{resultado['segundos']:.1f} s")
+            if resultado['nao_atendidas']:
+                st.warning(
+                    "Carga acima da capacidade de qualquer veículo: "
+                    + ", ".join(paradas['nome'].iloc[resultado['nao_atendidas']].astype(str))
+                )
+            
+            pontos = plano.copy()
+            pontos['rota'] = pontos['placa'] + " • viagem " + pontos['viagem'].astype(str)
+            fig = px.line(pontos, x='longitude', y='latitude', color='rota', markers=True,
+                          hover_name='parada', title="Rotas (coordenadas)")
+            fig.update_yaxes(scaleanchor="x")
+            st.plotly_chart(fig, use_container_width=True)
+            st.dataframe(plano, hide_index=True, use_container_width=True)
+    
+    ROTA_EXEMPLO = "São Paulo/SP\nCampinas/SP\nRibeirão Preto/SP\nUberaba/MG\nUberlândia/MG\nGoiânia/GO\nBrasília/DF"
+    
+    def _mostrar_abastecimento(self):
+        st.subheader("⛽ Planejamento de Abastecimento")
+        st.caption("Onde e quanto abastecer para gastar menos, com os preços ANP de cada cidade da rota.")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            rota = st.text_area("Cidades da rota, em ordem (Cidade/UF por linha)", self.ROTA_EXEMPLO, height=220)
+        with col2:
+            combustivel, consumo_veiculo, veiculo = selecionar_veiculo(self.data_loader, "abastecimento")
+            tanque_veiculo = pd.to_numeric(veiculo.get('tanque'), errors='coerce') if veiculo is not None else np.nan
+            consumo = st.number_input("Consumo (km/l)", min_value=0.5, value=max(consumo_veiculo, 0.5),
+                                      key="abastecimento_consumo")
+            tanque = st.number_input("Tanque (litros)", min_value=1.0,
+                                     value=float(tanque_veiculo) if tanque_veiculo > 0 else 300.0)
+            inicial = st.number_input("Combustível na saída (litros)", min_value=0.0, max_value=tanque,
+                                      value=min(tanque / 4, tanque))
+            reserva = st.number_input("Reserva mínima (litros)", min_value=0.0, max_value=tanque,
+                                      value=min(tanque * 0.1, tanque))
+            usar_minimo = st.checkbox("Usar o posto mais barato de cada cidade (em vez da mediana)")
+        
+        cidades = [linha.strip() for linha in rota.splitlines() if linha.strip()]
+        if len(cidades) < 2:
+            st.info("Informe ao menos a origem e o destino.")
+            return
+        try:
+            tabela, plano = plano_abastecimento_rota(
+                cidades, self.data_loader.distancias, self.data_loader.indice_precos(), combustivel,
+                consumo, tanque, inicial, reserva, coluna_preco='minimo' if usar_minimo else 'mediana',
+            )
+        except ValueError as erro:
+            st.error(str(erro))
+            return
+        
+        if not plano['viavel']:
+            trecho = plano['trecho_inviavel']
+            st.error(
+                f"Rota inviável: o trecho {tabela['parada'].iloc[trecho]} → {tabela['parada'].iloc[trecho + 1]} "
+                f"não é coberto pelo tanque (ou não há preço para abastecer antes dele)."
+            )
+        
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Distância", f"{tabela['km_acumulado'].iloc[-1]:,.0f} km")
+        col2.metric("Custo planejado", f"R$ {plano['custo']:,.2f}")
+        if not np.isnan(plano['custo_referencia']):
+            col3.metric("Enchendo só quando precisa", f"R$ {plano['custo_referencia']:,.2f}",
+                        f"R$ {plano['custo'] - plano['custo_referencia']:,.2f}", delta_color="inverse")
+        col4.metric("Paradas para abastecer", int((plano['litros'] > 0).sum()))
+        
+        # Onde abastecer: posto cadastrado mais barato em cada cidade de compra
+        produtos = PRODUTOS_POR_COMBUSTIVEL[combustivel]
+        tabela['posto_sugerido'] = ""
+        for indice in np.flatnonzero(plano['litros'] > 0):
+            postos = self.data_loader.db_manager.postos_mais_baratos(
+                tabela['uf'].iloc[indice], tabela['parada'].iloc[indice], produtos, limite=1
+            )
+            if not postos.empty:
+                posto = postos.iloc[0]
+                tabela.loc[indice, 'posto_sugerido'] = f"{posto['nome']} (R$ {posto['preco']:.2f})"
+        st.dataframe(tabela, hide_index=True, use_container_width=True)
+    
+    def _mostrar_viagens_em_lote(self):
+        st.subheader("📦 Custo de Viagens em Lote")
+        st.caption(
+            "Manifesto CSV/XLSX com placa, origem, destino e, opcionalmente, uf_origem, uf_destino, km e pedágios. "
+            "Sem km, a distância é estimada pela tabela de municípios; o preço é a mediana ANP na origem e no destino."
+        )
+        arquivo = st.file_uploader("Manifesto de viagens", type=['csv', 'xlsx'], key="manifesto_viagens")
+        if arquivo is None:
+            return
+        
+        try:
+            viagens = ler_manifesto(arquivo, arquivo.name)
+        except ValueError as erro:
+            st.error(str(erro))
+            return
+        
+        with st.spinner(f"Calculando {len(viagens):,} viagens..."):
+            inicio = datetime.now()
+            custos = calcular_custos_viagens(
+                viagens, self.data_loader.veiculos_df, self.data_loader.indice_precos(), self.data_loader.distancias
+            )
+            segundos = (datetime.now() - inicio).total_seconds()
+        
+        calculadas = custos['custo_total'].notna()
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Viagens", f"{len(custos):,}", f"{segundos:.1f} s", delta_color="off")
+        col2.metric("Custo total", f"R$ {custos['custo_total'].sum():,.2f}")
+        col3.metric("Distância total", f"{custos['km'].sum():,.0f} km")
+        col4.metric("Sem custo", f"{(~calculadas).sum():,}")
+        if not calculadas.all():
+            st.warning("Viagens sem custo: " + ", ".join(
+                f"{situacao} ({quantidade:,})"
+                for situacao, quantidade in custos.loc[~calculadas, 'situacao'].value_counts().items()
+            ))
+        
+        st.dataframe(
+            custos.groupby('placa', as_index=False)[['km', 'litros', 'custo_total']].sum()
+            .sort_values('custo_total', ascending=False),
+            hide_index=True, use_container_width=True,
+        )
+        st.dataframe(custos.head(1000), hide_index=True, use_container_width=True)
+        
+        nome_base = os.path.splitext(arquivo.name)[0] + "_custos"
+        col_csv, col_xlsx = st.columns(2)
+        col_csv.download_button(
+            "⬇️ Exportar CSV", custos.to_csv(index=False, sep=';', decimal=',').encode('utf-8-sig'),
+            file_name=f"{nome_base}.csv", mime="text/csv",
+        )
+        planilha = io.BytesIO()
+        custos.to_excel(planilha, index=False)
+        col_xlsx.download_button(
+            "⬇️ Exportar XLSX", planilha.getvalue(), file_name=f"{nome_base}.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
+        
+        col_data, col_lancar = st.columns([1, 2])
+        data_viagens = col_data.date_input("Data das viagens", datetime.now(), format="DD/MM/YYYY")
+        if col_lancar.button("💰 Lançar combustível e pedágios no controle de custos"):
+            lancadas = custos[calculadas]
+            lancamentos = pd.concat([
+                pd.DataFrame({'placa': lancadas['placa'], 'categoria': 'combustivel',
+                              'valor': lancadas['custo_combustivel'], 'litros': lancadas['litros']}),
+                pd.DataFrame({'placa': lancadas['placa'], 'categoria': 'pedagio',
+                              'valor': lancadas['pedagios']})[lancadas['pedagios'] > 0],
+            ], ignore_index=True)
+            lancamentos['data'] = data_viagens.strftime("%Y-%m-%d")
+            lancamentos['descricao'] = f"Manifesto {arquivo.name}"
+            gravados, _ = self.data_loader.db_manager.registrar_custos(lancamentos)
+            st.success(f"{gravados:,} lançamento(s) gravado(s) no controle de custos")
 
 # ========== MÓDULO COST CONTROL ==========
 class CostControl:
     def __init__(self, data_loader=None):
         self.data_loader = data_loader
     
+    PERIODOS = {"Últimos 6 meses": 6, "Últimos 12 meses": 12, "Últimos 24 meses": 24, "Tudo": None}
+    
     def mostrar(self):
         st.markdown('<h1 class="main-header">💰 Controle de Custos</h1>', unsafe_allow_html=True)
         
+        veiculos = self.data_loader.veiculos_df
+        placas_frota = veiculos['placa'].astype(str).tolist() if 'placa' in veiculos.columns else []
+        # Lançamentos antes dos gráficos: o que for gravado já aparece nesta execução
+        self._form_lancamento(placas_frota)
+        self._importar_lancamentos()
+        self._resumo_semanal()
+        
+        col_filtro, col_periodo = st.columns([3, 1])
+        placas = col_filtro.multiselect("Veículos", placas_frota, placeholder="Todos")
+        meses = self.PERIODOS[col_periodo.selectbox("Período", list(self.PERIODOS), index=1)]
+        inicio = (
+            (pd.Timestamp.now().normalize().replace(day=1) - pd.DateOffset(months=meses - 1)).strftime("%Y-%m-%d")
+            if meses else None
+        )
+        custos = self.data_loader.custos_mensais(placas, inicio)
+        
         col1, col2 = st.columns(2)
         
         with col1:
             st.subheader("📊 Custos Mensais")
-            meses = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun']
-            combustivel = [12000, 13500, 14200, 12800, 15600, 14900]
-            manutencao = [2000, 1500, 3000, 1800, 2200, 1900]
-            
-            fig = go.Figure()
-            fig.add_trace(go.Bar(name='Combustível', x=meses, y=combustivel))
-            fig.add_trace(go.Bar(name='Manutenção', x=meses, y=manutencao))
-            fig.update_layout(barmode='stack')
-            st.plotly_chart(fig, use_container_width=True)
+            if custos.empty:
+                st.info("Nenhum custo lançado no período")
+            else:
+                por_mes = custos.groupby(['mes', 'categoria'], as_index=False)['total'].sum()
+                por_mes['categoria'] = por_mes['categoria'].map(CATEGORIAS_CUSTO).fillna(por_mes['categoria'])
+                por_mes['mes'] = pd.to_datetime(por_mes['mes'])
+                fig = px.bar(por_mes, x='mes', y='total', color='categoria', barmode='stack',
+                             labels={'mes': 'Mês', 'total': 'R$', 'categoria': 'Categoria'})
+                fig.update_xaxes(dtick="M1", tickformat="%b/%y")
+                st.plotly_chart(fig, use_container_width=True)
         
         with col2:
             st.subheader("📈 Métricas")
-            st.metric("Custo Total", "R$ 89.500,00")
-            st.metric("Custo Médio Mensal", "R$ 14.916,67")
+            total = custos['total'].sum()
+            meses_com_custo = custos['mes'].nunique()
+            st.metric("Custo Total", formatar_reais(total))
+            st.metric("Custo Médio Mensal", formatar_reais(total / meses_com_custo if meses_com_custo else 0))
+            if not custos.empty:
+                por_veiculo = custos.pivot_table(
+                    index='placa', columns='categoria', values='total', aggfunc='sum', fill_value=0
+                ).rename(columns=CATEGORIAS_CUSTO)
+                por_veiculo['Total'] = por_veiculo.sum(axis=1)
+                st.dataframe(por_veiculo.sort_values('Total', ascending=False).round(2), use_container_width=True)
+    
+    def _form_lancamento(self, placas_frota):
+        with st.expander("➕ Lançar custo"):
+            with st.form("lancamento_custo", clear_on_submit=True):
+                col1, col2, col3 = st.columns(3)
+                data = col1.date_input("Data", datetime.now(), format="DD/MM/YYYY")
+                placa = col2.selectbox("Veículo", placas_frota) if placas_frota else col2.text_input("Placa")
+                categoria = col3.selectbox("Categoria", list(CATEGORIAS_CUSTO), format_func=CATEGORIAS_CUSTO.get)
+                col1, col2, col3 = st.columns(3)
+                valor = col1.number_input("Valor (R$)", value=0.0, step=10.0,
+                                          help="Use valor negativo para estornar um lançamento")
+                litros = col2.number_input("Litros (combustível)", min_value=0.0, value=0.0)
+                descricao = col3.text_input("Descrição")
+                
+                if st.form_submit_button("Lançar"):
+                    gravados, erros = self.data_loader.db_manager.registrar_custos(pd.DataFrame([{
+                        'data': data.strftime("%Y-%m-%d"), 'placa': placa, 'categoria': categoria,
+                        'valor': valor, 'litros': litros or None, 'descricao': descricao,
+                    }]))
+                    if gravados:
+                        st.success("Custo lançado")
+                    for erro in erros:
+                        st.error(erro)
+    
+    def _importar_lancamentos(self):
+        with st.expander("📥 Importar lançamentos (CSV/XLSX)"):
+            st.caption(
+                "Colunas: data, placa, categoria (" + ", ".join(CATEGORIAS_CUSTO) + "), valor e, opcionais, "
+                "litros e descricao"
+            )
+            arquivo = st.file_uploader("Arquivo de lançamentos", type=['csv', 'xlsx'], key="lancamentos_custos")
+            if arquivo is not None and st.button("Importar lançamentos"):
+                if arquivo.name.lower().endswith('.xlsx'):
+                    lancamentos = pd.read_excel(arquivo)
+                else:
+                    lancamentos = ler_csv(arquivo, detectar_dialeto_csv(arquivo))
+                lancamentos.columns = [str(coluna).strip().lower() for coluna in lancamentos.columns]
+                if 'valor' in lancamentos.columns:
+                    lancamentos['valor'] = converter_precos_br(lancamentos['valor'])
+                gravados, erros = self.data_loader.db_manager.registrar_custos(lancamentos)
+                st.success(f"{gravados:,} lançamento(s) importado(s)")
+                for erro in erros:
+                    st.warning(erro)
+
+    def _resumo_semanal(self):
+        with st.expander("📑 Resumo semanal (XLSX)"):
+            st.caption(
+                "Custos e consumo por veículo e preços médios da ANP no período, no leiaute das planilhas "
+                "semanais da ANP. Para gerar várias semanas ou filiais: python gerar_resumo.py --help"
+            )
+            semana_inicio, semana_fim = semanas_anteriores(1)[0]
+            col1, col2, col3 = st.columns(3)
+            inicio = col1.date_input("De", semana_inicio.date(), format="DD/MM/YYYY", key="resumo_inicio")
+            fim = col2.date_input("Até", semana_fim.date(), format="DD/MM/YYYY", key="resumo_fim")
+            filial = col3.text_input("Filial (opcional)", key="resumo_filial")
+            if st.button("Gerar resumo"):
+                if fim < inicio:
+                    st.error("A data final é anterior à inicial")
+                    return
+                planilha = io.BytesIO()
+                with st.spinner("Gerando resumo..."):
+                    linhas = gerar_resumo_semanal(self.data_loader.db_manager, inicio, fim, planilha, filial or None)
+                st.caption(" • ".join(f"{aba}: {quantidade:,} linha(s)" for aba, quantidade in linhas.items()))
+                st.download_button(
+                    "⬇️ Baixar resumo", planilha.getvalue(), file_name=nome_resumo_semanal(inicio, fim, filial or None),
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                )
 
 # ========== MÓDULO DATA MANAGER ==========
 class DataManager:
     def __init__(self, data_loader=None):
         self.data_loader = data_loader
-        self.db_manager = DatabaseManager()
+        self.db_manager = data_loader.db_manager
+        self.motoristas = DriverManager(self.db_manager)
+        self.desempenho = AnalisadorDesempenho(self.db_manager)
     
     def mostrar(self):
         st.markdown('<h1 class="main-header">📊 Adicionar Dados</h1>', unsafe_allow_html=True)
         
-        tab1, tab2 = st.tabs(["🚛 Veículos", "⛽ Postos"])
+        tab1, tab2, tab3, tab4 = st.tabs(["🚛 Veículos", "⛽ Postos", "👤 Motoristas", "📡 Telemetria"])
         
         with tab1:
             self._form_veiculo()
         
         with tab2:
             self._form_posto()
+        
+        with tab3:
+            self._form_motorista()
+            self._importar_motoristas()
+            self._consultar_motoristas()
+        
+        with tab4:
+            self._importar_telemetria()
     
     def _form_veiculo(self):
         st.subheader("Adicionar Veículo")
@@ -556,6 +1154,8 @@ class DataManager:
                 modelo = st.text_input("Modelo")
                 combustivel = st.selectbox("Combustível", ["Diesel", "Gasolina", "Álcool"])
                 consumo = st.number_input("Consumo (km/l)", min_value=0.1, value=8.0)
+                carga = st.number_input("Capacidade de carga (kg)", min_value=0, value=10000, step=500)
+                tanque = st.number_input("Tanque (litros)", min_value=1, value=300, step=10)
             
             if st.form_submit_button("Salvar Veículo"):
                 if nome and placa and modelo:
@@ -566,37 +1166,187 @@ class DataManager:
                         'modelo': modelo,
                         'combustivel': combustivel,
                         'consumo': consumo,
+                        'carga': carga,
+                        'tanque': tanque,
                         'data_cadastro': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                     }
                     
                     sucesso, mensagem = self.db_manager.salvar_veiculo(dados_veiculo)
                     if sucesso:
                         st.success(mensagem)
-                        self.data_loader.veiculos_df = self.db_manager.carregar_veiculos()
                     else:
                         st.error(mensagem)
                 else:
                     st.error("Preencha todos os campos")
     
+    # Campos de preço do formulário de posto -> produto ANP gravado
+    PRODUTOS_FORM_POSTO = {"Gasolina": "GASOLINA", "Diesel S10": "DIESEL S10", "Etanol": "ETANOL"}
+    
     def _form_posto(self):
         st.subheader("Cadastrar Posto")
+        st.caption("Postos das planilhas ANP (revenda, endereço e bairro) são cadastrados automaticamente na importação.")
         
         with st.form("posto_form"):
             col1, col2 = st.columns(2)
             
             with col1:
                 nome = st.text_input("Nome do Posto")
-                cidade = st.text_input("Cidade")
+                col_cidade, col_uf = st.columns([3, 1])
+                cidade = col_cidade.text_input("Cidade")
+                estado = col_uf.selectbox("UF", UFS, index=UFS.index('SP'), key="posto_uf")
+                endereco = st.text_input("Endereço")
+                bairro = st.text_input("Bairro")
             
             with col2:
-                preco_gasolina = st.number_input("Preço Gasolina", min_value=0.0, value=5.80)
-                preco_diesel = st.number_input("Preço Diesel", min_value=0.0, value=4.20)
+                precos = {
+                    produto: st.number_input(f"Preço {rotulo} (R$/litro)", min_value=0.0, value=0.0, step=0.01,
+                                             help="Deixe 0 se o posto não vende ou o preço não mudou")
+                    for rotulo, produto in self.PRODUTOS_FORM_POSTO.items()
+                }
             
             if st.form_submit_button("Salvar Posto"):
                 if nome and cidade:
-                    st.success(f"Posto '{nome}' salvo com sucesso!")
+                    sucesso, mensagem = self.db_manager.salvar_posto(
+                        {'nome': nome, 'municipio': cidade, 'estado': estado, 'endereco': endereco, 'bairro': bairro},
+                        precos,
+                    )
+                    if sucesso:
+                        st.success(mensagem)
+                    else:
+                        st.error(mensagem)
                 else:
                     st.warning("Preencha todos os campos")
+        
+        self._consultar_postos()
+    
+    def _consultar_postos(self):
+        st.subheader("🔎 Posto Mais Barato")
+        col1, col2, col3 = st.columns([3, 1, 2])
+        cidade = col1.text_input("Cidade", "São Paulo", key="consulta_posto_cidade")
+        estado = col2.selectbox("UF", UFS, index=UFS.index('SP'), key="consulta_posto_uf")
+        combustivel = col3.selectbox("Combustível", list(PRODUTOS_POR_COMBUSTIVEL), key="consulta_posto_combustivel")
+        
+        postos = self.db_manager.postos_mais_baratos(
+            estado, cidade, PRODUTOS_POR_COMBUSTIVEL[combustivel], limite=10
+        )
+        if postos.empty:
+            st.info("Nenhum posto com preço para esse combustível na cidade")
+            return
+        st.dataframe(postos.drop(columns=['id']), hide_index=True, use_container_width=True)
+        
+        rotulos = {f"{linha.nome} - {linha.endereco or linha.bairro or linha.municipio}": linha.id
+                   for linha in postos.drop_duplicates('id').itertuples()}
+        escolhido = st.selectbox("Histórico de preços do posto", list(rotulos))
+        historico = self.db_manager.historico_posto(rotulos[escolhido])
+        historico['data'] = pd.to_datetime(historico['data'], errors='coerce')
+        fig = px.line(historico, x='data', y='preco', color='produto', markers=True,
+                      labels={'data': 'Data', 'preco': 'R$/litro', 'produto': 'Produto'})
+        st.plotly_chart(fig, use_container_width=True)
+
+    def _form_motorista(self):
+        st.subheader("Adicionar Motorista")
+        
+        with st.form("motorista_form"):
+            col1, col2 = st.columns(2)
+            nome = col1.text_input("Nome")
+            cpf = col1.text_input("CPF")
+            telefone = col1.text_input("Telefone")
+            cnh = col2.text_input("Nº de registro da CNH")
+            categoria = col2.selectbox("Categoria da CNH", CATEGORIAS_CNH, index=CATEGORIAS_CNH.index('D'))
+            email = col2.text_input("E-mail")
+            
+            if st.form_submit_button("Salvar Motorista"):
+                sucesso, mensagem = self.motoristas.cadastrar({
+                    'nome': nome, 'cpf': cpf, 'cnh': cnh, 'categoria_cnh': categoria,
+                    'telefone': telefone, 'email': email,
+                })
+                if sucesso:
+                    st.success(mensagem)
+                else:
+                    st.error(mensagem)
+    
+    def _importar_motoristas(self):
+        with st.expander("📥 Importar motoristas (CSV/XLSX)"):
+            st.caption("Colunas: nome, cpf, cnh, categoria_cnh e, opcionais, telefone e email")
+            arquivo = st.file_uploader("Arquivo de motoristas", type=['csv', 'xlsx'], key="importar_motoristas")
+            if arquivo is not None and st.button("Importar motoristas"):
+                try:
+                    gravados, rejeitados = self.motoristas.importar(arquivo)
+                except ValueError as erro:
+                    st.error(str(erro))
+                    return
+                st.success(f"{gravados:,} motorista(s) importado(s)")
+                if not rejeitados.empty:
+                    st.warning(f"{len(rejeitados):,} linha(s) rejeitada(s)")
+                    st.dataframe(rejeitados[['nome', 'cpf', 'cnh', 'categoria_cnh', 'motivo']],
+                                 hide_index=True, use_container_width=True)
+    
+    def _consultar_motoristas(self):
+        st.subheader("🔎 Motoristas e Frota")
+        invalidos = self.db_manager.buscar_motoristas(invalidos=True)
+        if not invalidos.empty:
+            with st.expander(f"⚠️ {len(invalidos):,} registro(s) do motoristas.csv com documento inválido"):
+                st.dataframe(invalidos, hide_index=True, use_container_width=True)
+        categorias = st.multiselect("Categorias da CNH", CATEGORIAS_CNH, key="consulta_motoristas_categorias")
+        if categorias:
+            motoristas = self.motoristas.por_categoria(categorias)
+        else:
+            motoristas = self.db_manager.buscar_motoristas()
+        if motoristas.empty:
+            st.info("Nenhum motorista cadastrado nessas categorias")
+            return
+        st.dataframe(motoristas, hide_index=True, use_container_width=True)
+        
+        veiculos = self.data_loader.veiculos_df
+        if veiculos.empty:
+            return
+        compatibilidade = self.motoristas.compatibilidade_frota(veiculos).loc[motoristas['cpf']]
+        col1, col2 = st.columns(2)
+        col1.metric("Veículos sem motorista habilitado", int((~compatibilidade.any(axis=0)).sum()))
+        col2.metric("Motoristas sem veículo compatível", int((~compatibilidade.any(axis=1)).sum()))
+        
+        frota = veiculos[['placa', 'nome']].copy()
+        frota['categoria_minima'] = categoria_minima(
+            veiculos['carga'] if 'carga' in veiculos.columns else np.zeros(len(veiculos))
+        )
+        frota['motoristas_habilitados'] = compatibilidade.sum(axis=0).to_numpy()
+        st.dataframe(frota, hide_index=True, use_container_width=True)
+        
+        if len(compatibilidade) <= 200:
+            tabela = compatibilidade.set_axis(motoristas['nome'], axis=0).replace({True: '✅', False: '—'})
+            st.dataframe(tabela, use_container_width=True)
+
+    def _importar_telemetria(self):
+        st.subheader("Abastecimentos e Hodômetro")
+        st.caption(
+            "Colunas: placa, data e odometro e/ou litros; opcionais valor, produto, municipio e uf. "
+            "Registros já importados são ignorados."
+        )
+        arquivo = st.file_uploader("Arquivo de telemetria", type=['csv', 'xlsx'], key="importar_telemetria")
+        if arquivo is not None and st.button("Importar telemetria"):
+            with st.spinner("Importando eventos..."):
+                resultado = self.desempenho.importar(arquivo)
+            self._mostrar_resultado_telemetria(resultado)
+        
+        st.markdown("---")
+        pendentes = self.desempenho.arquivos_pendentes()
+        st.write(f"**Pasta de entrada:** `{self.desempenho.pasta_entrada}` • {len(pendentes)} arquivo(s) aguardando")
+        st.caption("Também processada por `python importar_telemetria.py` (ex.: agendado no cron)")
+        if pendentes and st.button("Processar pasta de entrada"):
+            with st.spinner("Processando arquivos..."):
+                resultados = self.desempenho.processar_entrada()
+            for resultado in resultados:
+                self._mostrar_resultado_telemetria(resultado)
+    
+    @staticmethod
+    def _mostrar_resultado_telemetria(resultado):
+        if not resultado['sucesso']:
+            st.error(f"{resultado['arquivo']}: {resultado['mensagem']}")
+            return
+        st.success(f"{resultado['arquivo']}: {resultado['mensagem']} em {resultado['segundos']:.1f} s")
+        if not resultado['rejeitados'].empty:
+            st.warning(f"{len(resultado['rejeitados']):,} linha(s) rejeitada(s)")
+            st.dataframe(resultado['rejeitados'].head(100), hide_index=True, use_container_width=True)
 
 # ========== APP PRINCIPAL ==========
 class TManager:
@@ -0,0 +1,75 @@
+# bench_limpeza_anp.py - compara a limpeza antiga (texto por linha) com limpar_dados_anp
+#
+# Uso (a partir da pasta TManager):
+#     python benchmarks/bench_limpeza_anp.py [linhas]
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.anp_import import COMBUSTIVEIS_PRINCIPAIS, limpar_dados_anp, resolver_colunas_anp
+
+
+def gerar_dados(linhas, semente=42):
+    rng = np.random.default_rng(semente)
+    precos = [f"{valor:.2f}".replace('.', ',') for valor in rng.uniform(4.5, 7.5, 300)]
+    municipios = [f"MUNICIPIO {i}" for i in range(800)]
+    return pd.DataFrame({
+        'produto': rng.choice(COMBUSTIVEIS_PRINCIPAIS + ['GLP', 'QUEROSENE'], linhas),
+        'estado': rng.choice(['SP', 'RJ', 'MG', 'PR', 'BA', 'RS', 'GO', 'PE'], linhas),
+        'municipio': rng.choice(municipios, linhas),
+        'preco': rng.choice(precos, linhas),
+    })
+
+
+def limpar_antes(df):
+    df = df.copy()
+    df['preco'] = (
+        df['preco']
+        .astype(str)
+        .str.replace('R$', '', regex=False)
+        .str.replace('$', '', regex=False)
+        .str.replace(',', '.')
+        .str.strip()
+    )
+    df['preco'] = pd.to_numeric(df['preco'], errors='coerce')
+    df = df.dropna(subset=['preco'])
+    mask = df['produto'].astype(str).str.upper().isin(COMBUSTIVEIS_PRINCIPAIS)
+    df = df[mask].copy()
+    df['estado'] = df['estado'].astype(str).str.upper().str.strip()
+    df['municipio'] = df['municipio'].astype(str).str.title().str.strip()
+    return df
+
+
+def limpar_depois(df):
+    # A limpeza que roda na importação, com os cabeçalhos resolvidos como no ImportadorANP
+    return limpar_dados_anp(df, resolver_colunas_anp(df.columns))
+
+
+def medir(funcao, df, repeticoes=3):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao(df)
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), resultado
+
+
+if __name__ == "__main__":
+    linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    df = gerar_dados(linhas)
+    
+    tempo_antes, antes = medir(limpar_antes, df)
+    tempo_depois, depois = medir(limpar_depois, df)
+    
+    assert len(antes) == len(depois)
+    assert np.allclose(antes['preco'].to_numpy(), depois['preco'].to_numpy())
+    
+    print(f"Linhas: {linhas:,}")
+    print(f"Antes:  {tempo_antes:.3f} s  ({antes.memory_usage(deep=True).sum() / 2**20:.1f} MiB)")
+    print(f"Depois: {tempo_depois:.3f} s  ({depois.memory_usage(deep=True).sum() / 2**20:.1f} MiB)")
+    print(f"Ganho:  {tempo_antes / tempo_depois:.1f}x")
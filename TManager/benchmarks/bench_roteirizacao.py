@@ -0,0 +1,47 @@
+# bench_roteirizacao.py - roteirização de instâncias aleatórias com 50/200/1000 paradas
+#
+# Uso (a partir da pasta TManager):
+#     python benchmarks/bench_roteirizacao.py [tempo_limite_s] [paradas ...]
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.roteirizacao import matriz_distancias, resolver_rotas
+
+
+def gerar_instancia(paradas, semente=42):
+    """Depósito em São Paulo e paradas espalhadas pelo estado; frota de 8 caminhões"""
+    rng = np.random.default_rng(semente)
+    latitudes = np.concatenate([[-23.55], rng.uniform(-24.5, -20.5, paradas)])
+    longitudes = np.concatenate([[-46.63], rng.uniform(-52.0, -44.5, paradas)])
+    demandas = np.concatenate([[0], rng.integers(100, 1500, paradas)])
+    capacidades = rng.choice([6000, 10000, 15000], 8)
+    return matriz_distancias(latitudes, longitudes), demandas, capacidades
+
+
+def verificar(resultado, demandas, capacidades, paradas):
+    visitadas = sorted(no for rota in resultado['rotas'] for no in rota[1:-1])
+    assert visitadas == list(range(1, paradas + 1)), "parada repetida ou faltando"
+    for rota, veiculo in zip(resultado['rotas'], resultado['veiculos']):
+        assert rota[0] == rota[-1] == 0
+        assert demandas[rota].sum() <= capacidades[veiculo]
+
+
+if __name__ == "__main__":
+    tempo_limite = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    tamanhos = [int(valor) for valor in sys.argv[2:]] or [50, 200, 1000]
+
+    print(f"Tempo limite da busca local: {tempo_limite:.0f} s")
+    print(f"{'Paradas':>8} {'Viagens':>8} {'Construção km':>14} {'Final km':>10} {'Ganho':>7} {'Tempo':>8}")
+    for paradas in tamanhos:
+        matriz, demandas, capacidades = gerar_instancia(paradas)
+        resultado = resolver_rotas(matriz, demandas, capacidades, tempo_limite=tempo_limite)
+        verificar(resultado, demandas, capacidades, paradas)
+        ganho = 1 - resultado['distancia_total'] / resultado['distancia_inicial']
+        print(
+            f"{paradas:>8} {len(resultado['rotas']):>8} {resultado['distancia_inicial']:>14,.0f} "
+            f"{resultado['distancia_total']:>10,.0f} {ganho:>7.1%} {resultado['segundos']:>7.2f}s"
+        )
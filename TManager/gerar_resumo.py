@@ -0,0 +1,97 @@
+# gerar_resumo.py - resumos semanais (XLSX) da frota e dos combustíveis em lote, sem Streamlit
+#
+# Uso (a partir da pasta TManager):
+#     python gerar_resumo.py --inicio 2025-09-28 --fim 2025-10-04 [--saida relatorios]
+#     python gerar_resumo.py --semanas 4 --filial lpc=/dados/lpc --filial cps=/dados/cps [--workers 4]
+#
+# Cada filial é uma pasta de dados do T-Manager (NOME=PASTA, ou só PASTA e o
+# nome vem da pasta). Cada par (semana, filial) é gerado em um processo do pool.
+#
+# Exemplo de agendamento semanal no cron (domingos, 7h, semana anterior):
+#     0 7 * * 0 cd /opt/tmanager/TManager && python gerar_resumo.py --semanas 1 >> resumos.log 2>&1
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from utils.database import DatabaseManager
+from modules.relatorios import gerar_resumo_semanal_arquivo, semana_anp, semanas_anteriores
+
+
+def ler_filial(valor):
+    """'nome=pasta' -> (nome, pasta); só 'pasta' usa o nome da pasta"""
+    nome, separador, pasta = valor.partition('=')
+    if not separador:
+        pasta = valor
+        nome = os.path.basename(os.path.normpath(os.path.abspath(valor)))
+    return nome, pasta
+
+
+def periodos(args):
+    if args.semanas:
+        return semanas_anteriores(args.semanas)
+    if args.inicio is None:
+        raise ValueError("Informe --inicio (e --fim) ou --semanas")
+    inicio = pd.Timestamp(args.inicio)
+    fim = pd.Timestamp(args.fim) if args.fim else semana_anp(inicio)[1]
+    return [(inicio, fim)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera os resumos semanais (XLSX) da frota e dos combustíveis")
+    parser.add_argument("--inicio", help="data inicial (AAAA-MM-DD)")
+    parser.add_argument("--fim", help="data final, inclusive (padrão: sábado da semana ANP da data inicial)")
+    parser.add_argument("--semanas", type=int, help="gera as N últimas semanas ANP completas (domingo a sábado)")
+    parser.add_argument("--filial", action="append", default=[],
+                        help="NOME=PASTA de dados de uma filial; pode ser repetido (padrão: data)")
+    parser.add_argument("--saida", default="relatorios", help="pasta dos arquivos gerados (padrão: relatorios)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processos em paralelo (padrão: número de CPUs)")
+    args = parser.parse_args(argv)
+
+    try:
+        semanas = periodos(args)
+    except ValueError as erro:
+        print(erro, file=sys.stderr)
+        return 2
+    filiais = [ler_filial(valor) for valor in args.filial] or [(None, "data")]
+    ausentes = [pasta for _, pasta in filiais if not os.path.isdir(pasta)]
+    if ausentes:
+        print(f"Pasta de dados não encontrada: {', '.join(ausentes)}", file=sys.stderr)
+        return 2
+
+    # Migrações e resumos pendentes rodam uma vez por filial, antes dos processos concorrerem
+    for _, pasta in filiais:
+        DatabaseManager(pasta).versao_dados()
+
+    inicio = time.perf_counter()
+    falhas = 0
+    tarefas = [(pasta, nome, ini, fim) for nome, pasta in filiais for ini, fim in semanas]
+    print(f"Gerando {len(tarefas)} resumo(s) com {args.workers} processo(s)...")
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futuros = {
+            pool.submit(gerar_resumo_semanal_arquivo, pasta, ini, fim, args.saida, nome): (nome, ini, fim)
+            for pasta, nome, ini, fim in tarefas
+        }
+        for futuro in as_completed(futuros):
+            nome, ini, fim = futuros[futuro]
+            rotulo = f"{nome + ' ' if nome else ''}{ini:%d/%m/%Y}-{fim:%d/%m/%Y}"
+            try:
+                resultado = futuro.result()
+            except Exception as erro:
+                falhas += 1
+                print(f"❌ {rotulo}: {erro}", flush=True)
+                continue
+            contagens = ", ".join(f"{aba} {linhas:,}" for aba, linhas in resultado['linhas'].items())
+            print(f"✅ {rotulo}: {resultado['arquivo']} ({contagens})", flush=True)
+
+    print("-" * 60)
+    print(f"Resumos: {len(tarefas)} ({falhas} com falha) em {time.perf_counter() - inicio:.1f} s")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
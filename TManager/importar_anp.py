@@ -0,0 +1,91 @@
+# importar_anp.py - importação em lote das planilhas da ANP, sem Streamlit
+#
+# Uso (a partir da pasta TManager):
+#     python importar_anp.py /caminho/das/planilhas [--workers 4] [--data-dir data]
+#
+# Exemplo de agendamento semanal no cron (segundas, 6h):
+#     0 6 * * 1 cd /opt/tmanager/TManager && python importar_anp.py /dados/anp >> importacao_anp.log 2>&1
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from utils.database import DatabaseManager
+from utils.anp_import import ImportadorANP
+
+EXTENSOES_ANP = ('.csv', '.xlsx')
+
+
+def listar_planilhas(diretorio):
+    return sorted(
+        os.path.join(diretorio, nome)
+        for nome in os.listdir(diretorio)
+        if nome.lower().endswith(EXTENSOES_ANP) and os.path.isfile(os.path.join(diretorio, nome))
+    )
+
+
+def importar_arquivo(caminho, data_dir):
+    """Executado em um processo do pool: cada processo abre seu próprio DatabaseManager"""
+    return ImportadorANP(DatabaseManager(data_dir)).importar(caminho)
+
+
+def formatar_resultado(resultado):
+    if resultado['ja_importado']:
+        return f"⏭️  {resultado['arquivo']}: já importado anteriormente"
+    if not resultado['sucesso']:
+        return f"❌ {resultado['arquivo']}: {resultado['mensagem']}"
+
+    vazao = resultado['linhas_lidas'] / max(resultado['segundos'], 1e-6)
+    return (
+        f"✅ {resultado['arquivo']}: {resultado['linhas_lidas']:,} linhas, "
+        f"{resultado['novos']:,} novos registros em {resultado['segundos']:.1f} s "
+        f"({vazao:,.0f} linhas/s)"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa em lote as planilhas de preços da ANP")
+    parser.add_argument("diretorio", help="pasta com os arquivos CSV/XLSX da ANP")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processos em paralelo (padrão: número de CPUs)")
+    parser.add_argument("--data-dir", default="data", help="pasta de dados do T-Manager (padrão: data)")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.diretorio):
+        print(f"Diretório não encontrado: {args.diretorio}", file=sys.stderr)
+        return 2
+
+    arquivos = listar_planilhas(args.diretorio)
+    if not arquivos:
+        print(f"Nenhum arquivo CSV/XLSX em {args.diretorio}")
+        return 0
+
+    # Garante que o diretório e o banco existam antes dos processos concorrerem
+    DatabaseManager(args.data_dir).versao_dados()
+
+    inicio = time.perf_counter()
+    resultados = []
+    print(f"Importando {len(arquivos)} arquivo(s) com {args.workers} processo(s)...")
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futuros = {pool.submit(importar_arquivo, caminho, args.data_dir): caminho for caminho in arquivos}
+        for futuro in as_completed(futuros):
+            resultado = futuro.result()
+            resultados.append(resultado)
+            print(formatar_resultado(resultado), flush=True)
+
+    decorrido = time.perf_counter() - inicio
+    falhas = [r for r in resultados if not r['sucesso']]
+    linhas = sum(r['linhas_lidas'] for r in resultados)
+    novos = sum(r['novos'] for r in resultados)
+
+    print("-" * 60)
+    print(f"Arquivos: {len(resultados)} ({len(falhas)} com falha, "
+          f"{sum(r['ja_importado'] for r in resultados)} já importados)")
+    print(f"Linhas lidas: {linhas:,} • Novos registros: {novos:,}")
+    print(f"Tempo total: {decorrido:.1f} s ({linhas / max(decorrido, 1e-6):,.0f} linhas/s)")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
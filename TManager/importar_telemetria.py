@@ -0,0 +1,46 @@
+# importar_telemetria.py - ingestão de abastecimentos e hodômetro, sem Streamlit
+#
+# Uso (a partir da pasta TManager):
+#     python importar_telemetria.py                      # processa data/telemetria_entrada
+#     python importar_telemetria.py arquivo1.csv ...     # importa arquivos avulsos
+#
+# Exemplo no cron, a cada 5 minutos, para a pasta alimentada pela telemetria:
+#     */5 * * * * cd /opt/tmanager/TManager && python importar_telemetria.py >> telemetria.log 2>&1
+import sys
+import argparse
+
+from utils.database import DatabaseManager
+from modules.performance_analysis import AnalisadorDesempenho
+
+
+def formatar_resultado(resultado):
+    if not resultado['sucesso']:
+        return f"❌ {resultado['arquivo']}: {resultado['mensagem']}"
+    return (
+        f"✅ {resultado['arquivo']}: {resultado['linhas_lidas']:,} linhas, {resultado['novos']:,} novos eventos, "
+        f"{len(resultado['rejeitados']):,} rejeitados em {resultado['segundos']:.1f} s"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa eventos de abastecimento e hodômetro")
+    parser.add_argument("arquivos", nargs="*", help="arquivos CSV/XLSX (padrão: a pasta de entrada)")
+    parser.add_argument("--pasta", help="pasta de entrada (padrão: <data-dir>/telemetria_entrada)")
+    parser.add_argument("--data-dir", default="data", help="pasta de dados do T-Manager (padrão: data)")
+    args = parser.parse_args(argv)
+
+    analisador = AnalisadorDesempenho(DatabaseManager(args.data_dir))
+    if args.arquivos:
+        resultados = [analisador.importar(caminho) for caminho in args.arquivos]
+    else:
+        resultados = analisador.processar_entrada(args.pasta)
+        if not resultados:
+            print(f"Nenhum arquivo em {args.pasta or analisador.pasta_entrada}")
+
+    for resultado in resultados:
+        print(formatar_resultado(resultado), flush=True)
+    return 1 if any(not r['sucesso'] for r in resultados) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
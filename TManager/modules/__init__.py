@@ -0,0 +1,3 @@
+# modules - subsistemas do T-Manager sobre o núcleo de utils/
+from .driver_manager import DriverManager, compatibilidade_motoristas
+from .performance_analysis import AnalisadorDesempenho
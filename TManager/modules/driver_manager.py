@@ -0,0 +1,149 @@
+# driver_manager.py - cadastro de motoristas e habilitação para a frota, sem Streamlit
+#
+# O cadastro fica em data/motoristas.csv; CPF e CNH únicos e a busca por
+# categoria vêm do índice SQLite do DatabaseManager (tabela indice_motoristas).
+# A compatibilidade motorista x veículo compara a categoria da CNH com a carga
+# do veículo para a frota inteira de uma vez (broadcasting NumPy).
+import io
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from utils.anp_import import detectar_dialeto_csv, ler_csv, normalizar_nome_coluna
+from utils.documentos import motivo_documentos, somente_digitos
+
+COLUNAS_MOTORISTAS = ['nome', 'cpf', 'cnh', 'categoria_cnh', 'telefone', 'email', 'data_cadastro']
+ALIASES_COLUNAS_MOTORISTAS = {
+    'nome': ['NOME', 'MOTORISTA', 'NOME DO MOTORISTA'],
+    'cpf': ['CPF'],
+    'cnh': ['CNH', 'REGISTRO CNH', 'NUMERO CNH', 'N CNH'],
+    'categoria_cnh': ['CATEGORIA_CNH', 'CATEGORIA CNH', 'CATEGORIA'],
+    'telefone': ['TELEFONE', 'CELULAR', 'FONE'],
+    'email': ['EMAIL', 'E-MAIL'],
+}
+
+# Hierarquia das categorias de veículos de carga: D e E habilitam tudo o que C
+# habilita, e C tudo o que B habilita. A (motos) não conta para a frota.
+NIVEL_CATEGORIA = {'B': 1, 'C': 2, 'D': 3, 'E': 4}
+CATEGORIAS_CNH = ['A', 'B', 'C', 'D', 'E', 'AB', 'AC', 'AD', 'AE']
+# Carga do veículo (kg) até a qual cada nível basta. A lei usa o peso bruto
+# total; com só a capacidade de carga no cadastro, estes limites aproximam
+# utilitários (B), caminhões simples (C/D) e combinações articuladas (E).
+CARGA_MAXIMA_POR_NIVEL = {1: 3500.0, 2: 23000.0, 3: 23000.0, 4: np.inf}
+
+
+def nivel_categoria(categorias):
+    """Maior nível de carga habilitado por categoria de CNH ('AD' -> 3); 0 sem habilitação"""
+    categorias = pd.Series(categorias, dtype=object).fillna('').astype(str).str.upper()
+    niveis = np.zeros(len(categorias), dtype=np.int64)
+    for letra, nivel in NIVEL_CATEGORIA.items():
+        niveis = np.where(categorias.str.contains(letra, regex=False).to_numpy(), np.maximum(niveis, nivel), niveis)
+    return niveis
+
+
+def nivel_exigido(cargas):
+    """Nível mínimo de CNH para conduzir veículos com estas capacidades de carga (kg)"""
+    cargas = pd.to_numeric(pd.Series(cargas, dtype=object), errors='coerce').fillna(0.0).to_numpy(dtype=float)
+    niveis = np.array(sorted(CARGA_MAXIMA_POR_NIVEL))
+    limites = np.array([CARGA_MAXIMA_POR_NIVEL[nivel] for nivel in niveis])
+    return niveis[np.minimum(np.searchsorted(limites, cargas, side='left'), len(niveis) - 1)]
+
+
+def categoria_minima(cargas):
+    """Categoria de CNH mais baixa que conduz cada carga ('B', 'C' ou 'E')"""
+    letras = np.array([''] + sorted(NIVEL_CATEGORIA, key=NIVEL_CATEGORIA.get))
+    return letras[nivel_exigido(cargas)]
+
+
+def compatibilidade_motoristas(motoristas, veiculos):
+    """Matriz motoristas x veículos (True = CNH habilita o veículo).
+
+    Índice pelo CPF, colunas pelas placas; uma comparação com broadcasting
+    entre o nível de cada CNH e o nível exigido pela carga de cada veículo.
+    """
+    if motoristas.empty or veiculos.empty:
+        return pd.DataFrame(dtype=bool)
+    habilitado = nivel_categoria(motoristas['categoria_cnh'])
+    exigido = nivel_exigido(veiculos['carga'] if 'carga' in veiculos.columns else np.zeros(len(veiculos)))
+    return pd.DataFrame(
+        habilitado[:, None] >= exigido[None, :],
+        index=pd.Index(motoristas['cpf'].astype(str), name='cpf'),
+        columns=pd.Index(veiculos['placa'].astype(str), name='placa'),
+    )
+
+
+def preparar_motoristas(df):
+    """Padroniza cabeçalhos e documentos; retorna (validos, rejeitados com 'motivo')"""
+    aliases = {
+        normalizar_nome_coluna(alias): padrao
+        for padrao, nomes in ALIASES_COLUNAS_MOTORISTAS.items() for alias in nomes
+    }
+    motoristas = df.rename(columns=lambda coluna: aliases.get(normalizar_nome_coluna(coluna), coluna))
+    faltando = [coluna for coluna in ['nome', 'cpf', 'cnh', 'categoria_cnh'] if coluna not in motoristas.columns]
+    if faltando:
+        raise ValueError(f"Colunas obrigatórias ausentes: {', '.join(faltando)}")
+
+    motoristas = motoristas.reindex(columns=COLUNAS_MOTORISTAS).copy()
+    motoristas['nome'] = motoristas['nome'].fillna('').astype(str).str.strip()
+    motoristas['cpf'] = somente_digitos(motoristas['cpf'], 11).to_numpy()
+    motoristas['cnh'] = somente_digitos(motoristas['cnh'], 11).to_numpy()
+    motoristas['categoria_cnh'] = (
+        motoristas['categoria_cnh'].fillna('').astype(str).str.upper().str.replace(r'[^A-E]', '', regex=True)
+    )
+    motoristas['data_cadastro'] = motoristas['data_cadastro'].fillna(datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+
+    motivo = motivo_documentos(motoristas['cpf'], motoristas['cnh'])
+    motivo = motivo.where(
+        motivo.notna() | motoristas['categoria_cnh'].isin(CATEGORIAS_CNH), "categoria de CNH inválida"
+    )
+    motivo[motoristas['nome'] == ''] = "nome vazio"
+    return motoristas[motivo.isna()], motoristas[motivo.notna()].assign(motivo=motivo[motivo.notna()])
+
+
+class DriverManager:
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+
+    def cadastrar(self, dados_motorista):
+        """Cadastra um motorista; retorna (sucesso, mensagem) como salvar_veiculo"""
+        validos, rejeitados = preparar_motoristas(pd.DataFrame([dados_motorista]))
+        if not rejeitados.empty:
+            return False, rejeitados['motivo'].iloc[0].capitalize()
+        gravados, rejeitados = self.db_manager.salvar_motoristas(validos)
+        if not gravados:
+            return False, rejeitados['motivo'].iloc[0]
+        return True, "Motorista salvo com sucesso"
+
+    def importar(self, arquivo, nome=None):
+        """Importa um CSV (dialeto detectado) ou XLSX de motoristas.
+
+        Retorna (gravados, rejeitados): linhas inválidas ou com CPF/CNH já
+        cadastrados voltam em rejeitados com o motivo.
+        """
+        nome = (nome or getattr(arquivo, 'name', '')).lower()
+        if isinstance(arquivo, str):
+            with open(arquivo, 'rb') as origem:
+                arquivo = io.BytesIO(origem.read())
+        if nome.endswith('.xlsx'):
+            df = pd.read_excel(arquivo, dtype=str)
+        else:
+            df = ler_csv(arquivo, detectar_dialeto_csv(arquivo))
+        validos, invalidos = preparar_motoristas(df)
+        gravados, duplicados = self.db_manager.salvar_motoristas(validos)
+        return gravados, pd.concat([invalidos, duplicados])
+
+    def por_categoria(self, categorias):
+        """Motoristas com alguma das categorias de CNH (consulta indexada)"""
+        return self.db_manager.buscar_motoristas(categorias=list(categorias))
+
+    def habilitados_para(self, carga):
+        """Motoristas cuja CNH permite conduzir um veículo com esta carga (kg)"""
+        exigido = int(nivel_exigido([carga])[0])
+        return self.por_categoria([
+            categoria for categoria in CATEGORIAS_CNH if nivel_categoria([categoria])[0] >= exigido
+        ])
+
+    def compatibilidade_frota(self, veiculos):
+        """Matriz de compatibilidade de todos os motoristas com todos os veículos"""
+        return compatibilidade_motoristas(self.db_manager.buscar_motoristas(), veiculos)
@@ -0,0 +1,521 @@
+# performance_analysis.py - telemetria de abastecimentos e hodômetro, sem Streamlit
+#
+# Entradas: planilhas enviadas pela interface e a pasta data/telemetria_entrada,
+# onde um integrador de telemetria (ou uma exportação agendada) deixa arquivos
+# CSV/XLSX. Os eventos vão para o histórico Parquet do DatabaseManager
+# (placa/mês, só anexação) e, a cada ingestão, as estatísticas das placas
+# afetadas são recalculadas e gravadas em desempenho_veiculos, que é o que o
+# Dashboard lê.
+#
+# Consumo real pelo método do tanque cheio: km rodados entre dois abastecimentos
+# divididos pelos litros do segundo. A média móvel soma km e litros das últimas
+# JANELA_CONSUMO medições (somas acumuladas por veículo, sem laço em Python).
+# A cada ingestão só a janela recente de cada placa é relida: os totais são
+# acumulados em desempenho_veiculos e somados aos dos eventos novos.
+import os
+import time
+import shutil
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from utils.anp_import import (
+    converter_numeros_br, converter_precos_br, detectar_dialeto_csv, iterar_blocos_csv, iterar_blocos_xlsx, normalizar_nome_coluna,
+)
+from utils.custos import precos_por_combustivel, preco_por_local
+from utils.distancias import chave_municipio
+
+PASTA_ENTRADA_TELEMETRIA = "telemetria_entrada"
+EXTENSOES_TELEMETRIA = ('.csv', '.xlsx')
+TAMANHO_BLOCO_TELEMETRIA = 1_000_000
+# Abastecimentos somados na média móvel de consumo
+JANELA_CONSUMO = 5
+# Medições recentes na mediana de km/l de desempenho_veiculos (relidas a cada ingestão)
+JANELA_MEDIANA = 20
+# km/l fora desta faixa indica hodômetro ou litros digitados errado: a medição é descartada
+LIMITES_KM_L = (0.5, 50.0)
+ALIASES_COLUNAS_TELEMETRIA = {
+    'placa': ['PLACA', 'VEICULO'],
+    'data': ['DATA', 'DATA HORA', 'DATA/HORA', 'DATAHORA', 'TIMESTAMP'],
+    'odometro': ['ODOMETRO', 'HODOMETRO', 'KM', 'ODOMETRO (KM)', 'HODOMETRO (KM)'],
+    'litros': ['LITROS', 'VOLUME', 'QUANTIDADE', 'LITROS ABASTECIDOS'],
+    'valor': ['VALOR', 'VALOR TOTAL', 'TOTAL', 'VALOR (R$)'],
+    'produto': ['PRODUTO', 'COMBUSTIVEL'],
+    'municipio': ['MUNICIPIO', 'CIDADE'],
+    'estado': ['ESTADO', 'UF'],
+}
+COLUNAS_TELEMETRIA = ['placa', 'data', 'odometro', 'litros', 'valor', 'produto', 'municipio', 'estado', 'origem']
+# Detecção de anomalias: z robusto (mediana/MAD) do km/l e desvio do preço
+# pago sobre a mediana ANP a partir dos quais o abastecimento vira alerta
+LIMITE_Z_CONSUMO = 3.5
+LIMITE_DESVIO_PRECO = 0.15
+# Medições de km/l necessárias para o veículo ter histórico de referência
+MINIMO_MEDICOES = 5
+# Folga sobre a capacidade do tanque antes de alertar
+FOLGA_TANQUE = 1.05
+# Semanas de abastecimentos que estimam o volume semanal da frota
+SEMANAS_VOLUME = 8
+
+
+# ========== LEITURA ==========
+def converter_datas(valores):
+    """Datas ISO ('2025-03-01 08:00') ou brasileiras ('01/03/2025 08:00')"""
+    valores = pd.Series(valores)
+    if pd.api.types.is_datetime64_any_dtype(valores):
+        return valores
+    texto = valores.astype(object).where(valores.notna(), None)
+    amostra = texto.dropna().astype(str).head(1)
+    iso = amostra.empty or bool(amostra.str.match(r'^\d{4}-').iloc[0])
+    return pd.to_datetime(texto, errors='coerce', dayfirst=not iso)
+
+
+def preparar_telemetria(df, origem):
+    """Padroniza cabeçalhos e tipos; retorna (validos, rejeitados com 'motivo')"""
+    aliases = {
+        normalizar_nome_coluna(alias): padrao
+        for padrao, nomes in ALIASES_COLUNAS_TELEMETRIA.items() for alias in nomes
+    }
+    eventos = df.rename(columns=lambda coluna: aliases.get(normalizar_nome_coluna(coluna), coluna))
+    faltando = [coluna for coluna in ['placa', 'data'] if coluna not in eventos.columns]
+    if faltando:
+        raise ValueError(f"Colunas obrigatórias ausentes: {', '.join(faltando)}")
+
+    eventos = eventos.reindex(columns=COLUNAS_TELEMETRIA).copy()
+    eventos['placa'] = eventos['placa'].astype(object).fillna('').astype(str).str.upper().str.strip()
+    eventos['data'] = converter_datas(eventos['data'])
+    # Hodômetro "125.300" é 125300 km; litros e valores podem ter três casas decimais
+    eventos['odometro'] = converter_numeros_br(eventos['odometro'].astype(object))
+    for coluna in ('litros', 'valor'):
+        eventos[coluna] = converter_precos_br(eventos[coluna].astype(object))
+    eventos['estado'] = eventos['estado'].astype(object).where(eventos['estado'].notna()).str.upper().str.strip()
+    eventos['origem'] = origem
+
+    motivo = pd.Series(None, index=eventos.index, dtype=object)
+    motivo[eventos['odometro'].isna() & eventos['litros'].isna()] = "sem hodômetro nem litros"
+    motivo[(eventos['odometro'] < 0) | (eventos['litros'] < 0)] = "valor negativo"
+    motivo[eventos['data'].isna()] = "data inválida"
+    motivo[eventos['placa'] == ''] = "placa vazia"
+    return eventos[motivo.isna()], eventos[motivo.notna()].assign(motivo=motivo[motivo.notna()])
+
+
+def _blocos_arquivo(arquivo, nome, tamanho_bloco):
+    if nome.lower().endswith('.xlsx'):
+        return iterar_blocos_xlsx(arquivo, tamanho_bloco)
+    return iterar_blocos_csv(arquivo, detectar_dialeto_csv(arquivo), tamanho_bloco)
+
+
+# ========== CONSUMO ==========
+def consumo_por_abastecimento(eventos, janela=JANELA_CONSUMO, limites=LIMITES_KM_L):
+    """Uma linha por abastecimento com km rodados, km/l da medição e km/l móvel.
+
+    Abastecimentos sem hodômetro somam seus litros ao abastecimento seguinte
+    que o tenha; trechos com hodômetro parado ou voltando, ou com km/l fora de
+    limites (None = sem faixa), ficam sem medição. O índice é o dos eventos.
+    """
+    abastecimentos = eventos.loc[eventos['litros'] > 0, ['placa', 'data', 'odometro', 'litros', 'valor']]
+    # Agrupamentos por código inteiro do veículo: a placa (texto) é fatorada uma só vez
+    veiculo = pd.factorize(abastecimentos['placa'])[0]
+    ordem = np.lexsort((abastecimentos['odometro'].to_numpy(), abastecimentos['data'].to_numpy(), veiculo))
+    abastecimentos = abastecimentos.iloc[ordem]
+    veiculo = veiculo[ordem]
+
+    # Bloco = próximo abastecimento com hodômetro (contado de trás para frente)
+    com_odometro = abastecimentos['odometro'].notna().to_numpy()
+    bloco = pd.Series(com_odometro[::-1].astype(np.int64)).groupby(veiculo[::-1]).cumsum().to_numpy()[::-1]
+    litros_bloco = abastecimentos['litros'].groupby([veiculo, bloco]).transform('sum')
+
+    medidos = abastecimentos[com_odometro].copy()
+    veiculo = veiculo[com_odometro]
+    medidos['litros_medidos'] = litros_bloco[com_odometro]
+    km = medidos['odometro'].groupby(veiculo).diff()
+    valida = km > 0
+    if limites is not None:
+        valida &= (km / medidos['litros_medidos']).between(*limites)
+    medidos['km'] = km.where(valida)
+    medidos['km_l'] = medidos['km'] / medidos['litros_medidos'].where(valida)
+
+    # Média móvel: diferença de somas acumuladas separadas por `janela` medições
+    km_acumulado = medidos['km'].fillna(0.0).groupby(veiculo).cumsum()
+    litros_acumulados = medidos['litros_medidos'].where(valida, 0.0).groupby(veiculo).cumsum()
+    km_janela = km_acumulado - km_acumulado.groupby(veiculo).shift(janela, fill_value=0.0)
+    litros_janela = litros_acumulados - litros_acumulados.groupby(veiculo).shift(janela, fill_value=0.0)
+    medidos['km_l_movel'] = km_janela / litros_janela.where(litros_janela > 0)
+    return medidos
+
+
+def _estatisticas_janela(eventos, medidos, janela):
+    """Colunas de desempenho_veiculos que dependem só das medições recentes.
+
+    inicio_janela é a data do abastecimento com hodômetro que antecede as
+    últimas max(janela, JANELA_MEDIANA) medições (ou o primeiro evento, se
+    houver menos): relendo a partir dele, a próxima ingestão refaz estas colunas.
+    """
+    medicoes = max(janela, JANELA_MEDIANA)
+    por_placa = medidos.groupby('placa')
+    recentes = por_placa.tail(medicoes)
+    estatisticas = pd.DataFrame({
+        'km_l_recente': medidos.dropna(subset=['km_l_movel']).groupby('placa')['km_l_movel'].last(),
+        'km_l_mediana': recentes.groupby('placa')['km_l'].median(),
+        'inicio_janela': por_placa['data'].nth(-medicoes - 1).groupby(medidos['placa']).first(),
+    }, index=pd.Index(eventos['placa'].unique(), name='placa'))
+    estatisticas['inicio_janela'] = estatisticas['inicio_janela'].fillna(eventos.groupby('placa')['data'].min())
+    estatisticas['inicio_janela'] = estatisticas['inicio_janela'].dt.strftime("%Y-%m-%d %H:%M:%S")
+    return estatisticas
+
+
+def estatisticas_veiculos(eventos, janela=JANELA_CONSUMO):
+    """Estatísticas de consumo real por placa, no formato de desempenho_veiculos"""
+    medidos = consumo_por_abastecimento(eventos, janela)
+    validos = medidos[medidos['km_l'].notna()]
+    por_placa = eventos.groupby('placa')
+    estatisticas = pd.DataFrame({
+        'km_monitorado': por_placa['odometro'].max() - por_placa['odometro'].min(),
+        'litros': por_placa['litros'].sum(),
+        'valor': por_placa['valor'].sum(),
+        'abastecimentos': (eventos['litros'] > 0).groupby(eventos['placa']).sum(),
+        'ultimo_odometro': por_placa['odometro'].max(),
+        'primeiro_evento': por_placa['data'].min().dt.strftime("%Y-%m-%d %H:%M:%S"),
+        'ultimo_evento': por_placa['data'].max().dt.strftime("%Y-%m-%d %H:%M:%S"),
+    })
+    medicoes = validos.groupby('placa')
+    estatisticas['km_medido'] = medicoes['km'].sum()
+    estatisticas['litros_medidos'] = medicoes['litros_medidos'].sum()
+    estatisticas['km_l'] = estatisticas['km_medido'] / estatisticas['litros_medidos']
+    estatisticas = estatisticas.join(_estatisticas_janela(eventos, medidos, janela))
+    estatisticas['atualizado_em'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return estatisticas.rename_axis('placa').reset_index()
+
+
+def estatisticas_incrementais(eventos, anteriores, janela=JANELA_CONSUMO):
+    """Atualiza desempenho_veiculos a partir só da janela recente de cada placa.
+
+    eventos: os de cada placa a partir do seu inicio_janela gravado; anteriores:
+    as linhas atuais de desempenho_veiculos. Os eventos depois de ultimo_evento
+    são os novos: seus totais somam aos gravados, e as colunas da janela são
+    refeitas. Supõe que nenhum evento novo é anterior a ultimo_evento.
+    """
+    anteriores = anteriores.set_index('placa')
+    medidos = consumo_por_abastecimento(eventos, janela)
+    ultimo = pd.to_datetime(anteriores['ultimo_evento'])
+    novos = eventos[eventos['data'] > eventos['placa'].map(ultimo)]
+    medicoes = medidos[medidos['km_l'].notna() & (medidos['data'] > medidos['placa'].map(ultimo))]
+
+    por_placa = novos.groupby('placa')
+    somas = pd.DataFrame({
+        'litros': por_placa['litros'].sum(),
+        'valor': por_placa['valor'].sum(),
+        'abastecimentos': (novos['litros'] > 0).groupby(novos['placa']).sum(),
+        'km_medido': medicoes.groupby('placa')['km'].sum(),
+        'litros_medidos': medicoes.groupby('placa')['litros_medidos'].sum(),
+    }).reindex(anteriores.index)
+    estatisticas = anteriores[somas.columns].fillna(0).add(somas.fillna(0))
+
+    odometro_inicial = anteriores['ultimo_odometro'] - anteriores['km_monitorado']
+    estatisticas['ultimo_odometro'] = np.fmax(
+        anteriores['ultimo_odometro'], por_placa['odometro'].max().reindex(anteriores.index)
+    )
+    estatisticas['km_monitorado'] = estatisticas['ultimo_odometro'] - np.fmin(
+        odometro_inicial, por_placa['odometro'].min().reindex(anteriores.index)
+    )
+    estatisticas['km_l'] = estatisticas['km_medido'] / estatisticas['litros_medidos'].where(
+        estatisticas['litros_medidos'] > 0
+    )
+    estatisticas['primeiro_evento'] = anteriores['primeiro_evento']
+    estatisticas['ultimo_evento'] = (
+        pd.concat([ultimo, por_placa['data'].max().reindex(anteriores.index)], axis=1).max(axis=1)
+        .dt.strftime("%Y-%m-%d %H:%M:%S")
+    )
+    estatisticas = estatisticas.join(_estatisticas_janela(eventos, medidos, janela))
+    estatisticas['atualizado_em'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return estatisticas.rename_axis('placa').reset_index()
+
+
+def litros_por_semana(eventos, semanas=SEMANAS_VOLUME):
+    """Litros abastecidos por semana em cada UF (vazia = não informada), média
+    das últimas `semanas` semanas até o último evento"""
+    if eventos.empty:
+        return pd.DataFrame(columns=['estado', 'litros'])
+    fim = eventos['data'].max()
+    recentes = eventos[eventos['data'] > fim - pd.Timedelta(weeks=semanas)]
+    # Histórico mais curto que a janela: divide pelo período realmente coberto
+    cobertas = min(max(int(np.ceil((fim - recentes['data'].min()) / pd.Timedelta(weeks=1))), 1), semanas)
+    estados = recentes['estado'].fillna('').astype(str).str.upper().str.strip()
+    litros = recentes['litros'].fillna(0).groupby(estados).sum() / cobertas
+    return litros.rename_axis('estado').reset_index(name='litros')
+
+
+# ========== ANOMALIAS ==========
+def _precos_anp_eventos(eventos, indice_precos, combustiveis):
+    """Mediana ANP (município -> estado -> Brasil) do produto de cada evento.
+
+    Sem produto reconhecido no índice, usa o produto preferido do combustível
+    do veículo. As consultas são feitas uma vez por local distinto: cada coluna
+    é fatorada e os códigos combinados em um só inteiro por evento.
+    """
+    colunas = {
+        'produto': eventos.get('produto'), 'estado': eventos.get('estado'),
+        'chave': eventos.get('municipio'), 'combustivel': combustiveis,
+    }
+    combinado = np.zeros(len(eventos), dtype=np.int64)
+    valores = {}
+    for nome, coluna in colunas.items():
+        codigos, unicos = pd.factorize(
+            pd.Series(coluna, dtype=object) if coluna is not None else pd.Series('', index=eventos.index)
+        )
+        valores[nome] = (codigos, np.append(unicos.to_numpy(dtype=object), ''))
+        combinado = combinado * (len(unicos) + 1) + codigos + 1
+    codigos, combinacoes = pd.factorize(combinado)
+    primeiro = pd.Series(np.arange(len(codigos))).groupby(codigos).first().to_numpy()
+    unicos = pd.DataFrame({nome: rotulos[codigos_coluna[primeiro]] for nome, (codigos_coluna, rotulos) in valores.items()})
+    unicos['produto'] = chave_municipio(unicos['produto'])
+    unicos['estado'] = unicos['estado'].fillna('').astype(str).str.upper().str.strip()
+    unicos['chave'] = chave_municipio(unicos['chave'])
+
+    # O produto do evento faz o papel do combustível na busca em cascata
+    por_produto = indice_precos.assign(
+        combustivel=chave_municipio(indice_precos['produto']), chave=chave_municipio(indice_precos['municipio']),
+    )
+    preco, nivel = preco_por_local(unicos['produto'], unicos['estado'], unicos['chave'], por_produto)
+    faltando = preco.isna()
+    if faltando.any():
+        preco[faltando], nivel[faltando] = preco_por_local(
+            unicos.loc[faltando, 'combustivel'].fillna(''), unicos.loc[faltando, 'estado'],
+            unicos.loc[faltando, 'chave'], precos_por_combustivel(indice_precos),
+        )
+    return preco.to_numpy()[codigos], nivel.to_numpy()[codigos]
+
+
+def detectar_anomalias(eventos, indice_precos, veiculos=None, limite_z=LIMITE_Z_CONSUMO,
+                       limite_preco=LIMITE_DESVIO_PRECO):
+    """Pontua todos os abastecimentos da frota de uma vez; retorna os alertas
+    ordenados do mais grave para o menos grave.
+
+    Consumo: z robusto do km/l da medição frente à mediana/MAD do próprio
+    veículo (km/l baixo = litros demais para os km rodados). Preço: desvio do
+    R$/litro pago sobre a mediana ANP do produto no município (ou estado/Brasil).
+    Também alerta litros acima do tanque cadastrado. pontuacao = maior razão
+    entre o desvio e seu limite (>= 1 é alerta); perda_estimada em R$.
+    """
+    if eventos.empty:
+        return pd.DataFrame()
+    if not eventos.index.is_unique:
+        eventos = eventos.reset_index(drop=True)
+    medidos = consumo_por_abastecimento(eventos, limites=None)
+    if medidos.empty:
+        return pd.DataFrame()
+    veiculo, placas = pd.factorize(medidos['placa'])
+
+    # Histórico do veículo: mediana e MAD só das medições plausíveis
+    plausivel = medidos['km_l'].where(medidos['km_l'].between(*LIMITES_KM_L))
+    mediana = plausivel.groupby(veiculo).transform('median')
+    mad = (plausivel - mediana).abs().groupby(veiculo).transform('median')
+    escala = np.maximum(1.4826 * mad, 0.02 * mediana)
+    suficientes = plausivel.notna().groupby(veiculo).transform('sum') >= MINIMO_MEDICOES
+    medidos['km_l_mediana'] = mediana.where(suficientes)
+    medidos['z_consumo'] = ((medidos['km_l'] - mediana) / escala).where(suficientes)
+
+    # Cadastro (combustível, tanque) consultado uma vez por placa
+    frota = pd.DataFrame(index=placas, columns=['combustivel', 'tanque'])
+    if veiculos is not None and not veiculos.empty:
+        cadastro = veiculos.reindex(columns=['placa', 'combustivel', 'tanque']).assign(
+            placa=veiculos['placa'].astype(str).str.upper().str.strip()
+        ).drop_duplicates('placa', keep='last').set_index('placa')
+        frota = cadastro.reindex(placas)
+    localizacao = eventos.loc[medidos.index, [
+        coluna for coluna in ('produto', 'municipio', 'estado') if coluna in eventos.columns
+    ]]
+    medidos['preco_pago'] = medidos['valor'] / medidos['litros']
+    medidos['preco_anp'], medidos['referencia_preco'] = _precos_anp_eventos(
+        localizacao, indice_precos, frota['combustivel'].to_numpy(dtype=object)[veiculo]
+    )
+    medidos['desvio_preco'] = medidos['preco_pago'] / medidos['preco_anp'] - 1
+    tanque = pd.to_numeric(frota['tanque'], errors='coerce').to_numpy(dtype=float)[veiculo]
+
+    razao_consumo = (-medidos['z_consumo']).clip(lower=0) / limite_z
+    razao_preco = medidos['desvio_preco'].abs() / limite_preco
+    razao_tanque = medidos['litros'] / (tanque * FOLGA_TANQUE)
+    medidos['pontuacao'] = np.fmax(np.fmax(razao_consumo, razao_preco), razao_tanque)
+
+    alertas = medidos[medidos['pontuacao'] >= 1].copy()
+    alertas = alertas.join(localizacao.loc[alertas.index])
+    motivos = pd.DataFrame({
+        'consumo abaixo do histórico': razao_consumo[alertas.index] >= 1,
+        'preço acima da ANP': razao_preco[alertas.index].ge(1) & alertas['desvio_preco'].gt(0),
+        'preço abaixo da ANP': razao_preco[alertas.index].ge(1) & alertas['desvio_preco'].lt(0),
+        'litros acima do tanque': razao_tanque[alertas.index] >= 1,
+    })
+    alertas['motivos'] = motivos.dot(motivos.columns + '; ').str.rstrip('; ')
+
+    # Perda: litros além do esperado pelo histórico e sobrepreço pago
+    litros_excedentes = (alertas['litros_medidos'] - alertas['km'] / alertas['km_l_mediana']).clip(lower=0)
+    sobrepreco = (alertas['preco_pago'] - alertas['preco_anp']).clip(lower=0) * alertas['litros']
+    alertas['perda_estimada'] = (
+        litros_excedentes.where(motivos['consumo abaixo do histórico'], 0).fillna(0) * alertas['preco_pago'].fillna(0)
+        + sobrepreco.where(motivos['preço acima da ANP'], 0).fillna(0)
+    ).round(2)
+
+    alertas['desvio_consumo_pct'] = ((alertas['km_l'] / alertas['km_l_mediana'] - 1) * 100).round(1)
+    alertas['desvio_preco_pct'] = (alertas['desvio_preco'] * 100).round(1)
+    colunas = [
+        'placa', 'data', 'municipio', 'estado', 'produto', 'litros', 'km', 'km_l', 'km_l_mediana',
+        'desvio_consumo_pct', 'z_consumo', 'preco_pago', 'preco_anp', 'referencia_preco', 'desvio_preco_pct',
+        'motivos', 'pontuacao', 'perda_estimada',
+    ]
+    alertas = alertas.reindex(columns=colunas).sort_values(['pontuacao', 'perda_estimada'], ascending=False)
+    alertas = alertas.round({'km_l': 2, 'km_l_mediana': 2, 'z_consumo': 1, 'preco_pago': 3, 'pontuacao': 2})
+    return alertas.reset_index(drop=True)
+
+
+# ========== INGESTÃO ==========
+class AnalisadorDesempenho:
+    def __init__(self, db_manager, tamanho_bloco=TAMANHO_BLOCO_TELEMETRIA, janela=JANELA_CONSUMO):
+        self.db_manager = db_manager
+        self.tamanho_bloco = tamanho_bloco
+        self.janela = janela
+
+    @property
+    def pasta_entrada(self):
+        return os.path.join(self.db_manager.data_dir, PASTA_ENTRADA_TELEMETRIA)
+
+    def importar(self, arquivo, nome=None, origem=None):
+        """Importa um CSV/XLSX de abastecimentos e leituras de hodômetro.
+
+        arquivo: caminho ou arquivo binário aberto (ex.: upload do Streamlit).
+        Retorna dict com arquivo, sucesso, mensagem, linhas_lidas, novos,
+        rejeitados (DataFrame com motivo), placas e segundos.
+        """
+        if isinstance(arquivo, (str, os.PathLike)):
+            # O arquivo aberto é lido em blocos: arquivos grandes da pasta de entrada não vão inteiros para a memória
+            with open(arquivo, 'rb') as aberto:
+                return self.importar(aberto, nome or os.path.basename(arquivo), origem)
+
+        nome = nome or getattr(arquivo, 'name', 'arquivo')
+        resultado = {
+            'arquivo': nome, 'sucesso': False, 'mensagem': '', 'linhas_lidas': 0, 'novos': 0,
+            'rejeitados': pd.DataFrame(), 'placas': [], 'segundos': 0.0,
+        }
+        inicio = time.perf_counter()
+        placas, rejeitados, desde = set(), [], []
+        try:
+            for bloco in _blocos_arquivo(arquivo, nome, self.tamanho_bloco):
+                validos, invalidos = preparar_telemetria(bloco, origem or nome)
+                if not validos.empty:
+                    novos, placas_bloco = self.db_manager.salvar_telemetria(validos)
+                    resultado['novos'] += novos
+                    placas.update(placas_bloco)
+                    desde.append(validos.groupby('placa')['data'].min())
+                rejeitados.append(invalidos)
+                resultado['linhas_lidas'] += len(bloco)
+        except Exception as e:
+            resultado['mensagem'] = f"❌ Erro ao processar arquivo: {str(e)}"
+        else:
+            resultado['sucesso'] = True
+            resultado['mensagem'] = f"✅ {resultado['novos']:,} evento(s) novo(s) de {len(placas)} veículo(s)"
+        finally:
+            # Mesmo com falha no meio, os blocos já gravados têm estatísticas em dia
+            if placas:
+                self.atualizar_estatisticas(sorted(placas), pd.concat(desde).groupby(level=0).min())
+        resultado['placas'] = sorted(placas)
+        resultado['rejeitados'] = pd.concat(rejeitados) if rejeitados else pd.DataFrame()
+        resultado['segundos'] = time.perf_counter() - inicio
+        return resultado
+
+    def processar_entrada(self, pasta=None):
+        """Importa os arquivos deixados na pasta de entrada.
+
+        Cada arquivo vai para processados/ ou com_erro/ ao final; arquivos
+        ocultos ou ainda sendo gravados (.tmp, .part) são ignorados.
+        """
+        pasta = pasta or self.pasta_entrada
+        os.makedirs(pasta, exist_ok=True)
+        resultados = []
+        for nome in sorted(os.listdir(pasta)):
+            caminho = os.path.join(pasta, nome)
+            if nome.startswith('.') or not nome.lower().endswith(EXTENSOES_TELEMETRIA) or not os.path.isfile(caminho):
+                continue
+            resultado = self.importar(caminho, origem=f"{PASTA_ENTRADA_TELEMETRIA}/{nome}")
+            destino = os.path.join(pasta, 'processados' if resultado['sucesso'] else 'com_erro')
+            os.makedirs(destino, exist_ok=True)
+            shutil.move(caminho, os.path.join(destino, f"{datetime.now():%Y%m%d%H%M%S}-{nome}"))
+            resultados.append(resultado)
+        return resultados
+
+    def arquivos_pendentes(self, pasta=None):
+        pasta = pasta or self.pasta_entrada
+        if not os.path.isdir(pasta):
+            return []
+        return sorted(
+            nome for nome in os.listdir(pasta)
+            if not nome.startswith('.') and nome.lower().endswith(EXTENSOES_TELEMETRIA)
+            and os.path.isfile(os.path.join(pasta, nome))
+        )
+
+    def atualizar_estatisticas(self, placas=None, desde=None):
+        """Atualiza desempenho_veiculos para as placas (todas, se None).
+
+        desde: data do evento mais antigo recebido de cada placa (Series). Placas
+        já calculadas cujos eventos recebidos são todos posteriores ao último
+        evento gravado releem só a janela recente; as demais (ou todas, sem
+        desde) são recalculadas com o histórico inteiro da placa.
+        """
+        colunas = ['placa', 'data', 'odometro', 'litros', 'valor']
+        partes = []
+        completas = placas
+        if desde is not None and placas is not None:
+            anteriores = self.db_manager.carregar_desempenho(placas).dropna(
+                subset=['inicio_janela', 'ultimo_evento']
+            )
+            recebidos = pd.to_datetime(anteriores['placa'].map(desde))
+            anteriores = anteriores[(recebidos > pd.to_datetime(anteriores['ultimo_evento'])).to_numpy()]
+            completas = sorted(set(placas) - set(anteriores['placa']))
+            if not anteriores.empty:
+                inicio_janela = pd.to_datetime(anteriores.set_index('placa')['inicio_janela'])
+                eventos = self.db_manager.carregar_telemetria(
+                    placas=anteriores['placa'].tolist(), colunas=colunas, inicio=inicio_janela.min()
+                )
+                eventos = eventos[(eventos['data'] >= eventos['placa'].map(inicio_janela)).to_numpy()]
+                partes.append(estatisticas_incrementais(eventos, anteriores, self.janela))
+        if completas is None or completas:
+            eventos = self.db_manager.carregar_telemetria(placas=completas, colunas=colunas)
+            if not eventos.empty:
+                partes.append(estatisticas_veiculos(eventos, self.janela))
+        if not partes:
+            return pd.DataFrame()
+        estatisticas = pd.concat(partes, ignore_index=True)
+        self.db_manager.salvar_desempenho(estatisticas)
+        return estatisticas
+
+    def detectar_anomalias(self, indice_precos, veiculos=None, inicio=None):
+        """Alertas de abastecimento da frota; o histórico de referência usa todos
+        os eventos, inicio só limita os alertas devolvidos"""
+        eventos = self.db_manager.carregar_telemetria(
+            colunas=['placa', 'data', 'odometro', 'litros', 'valor', 'produto', 'municipio', 'estado']
+        )
+        if eventos.empty:
+            return pd.DataFrame()
+        alertas = detectar_anomalias(eventos, indice_precos, veiculos)
+        if inicio is not None and not alertas.empty:
+            alertas = alertas[alertas['data'] >= pd.Timestamp(inicio)].reset_index(drop=True)
+        return alertas
+
+    def litros_semanais(self, placas=None, semanas=SEMANAS_VOLUME):
+        """Volume semanal abastecido pelas placas (todas, se None), por UF"""
+        desempenho = self.db_manager.carregar_desempenho(placas)
+        if desempenho.empty:
+            return litros_por_semana(pd.DataFrame())
+        inicio = pd.Timestamp(desempenho['ultimo_evento'].max()) - pd.Timedelta(weeks=semanas)
+        eventos = self.db_manager.carregar_telemetria(
+            placas=desempenho['placa'].tolist(), colunas=['placa', 'data', 'litros', 'estado'], inicio=inicio
+        )
+        return litros_por_semana(eventos, semanas)
+
+    def consumo_veiculo(self, placa, inicio=None):
+        """Série de km/l (medição e média móvel) de um veículo, para gráficos"""
+        eventos = self.db_manager.carregar_telemetria(
+            placas=[placa], colunas=['placa', 'data', 'odometro', 'litros', 'valor'], inicio=inicio
+        )
+        if eventos.empty:
+            return pd.DataFrame(columns=['data', 'km', 'km_l', 'km_l_movel'])
+        return consumo_por_abastecimento(eventos, self.janela)[['data', 'odometro', 'km', 'litros_medidos',
+                                                                  'km_l', 'km_l_movel']]
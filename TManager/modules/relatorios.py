@@ -0,0 +1,281 @@
+# relatorios.py - resumo semanal da frota e dos combustíveis em XLSX, sem Streamlit
+#
+# Mesmo leiaute das planilhas semanais da ANP (resumo_semanal_lpc_*.xlsx):
+# título nas primeiras linhas, período e observações, cabeçalho na linha
+# LINHA_CABECALHO e painel congelado logo abaixo. A planilha é gravada pelo
+# modo write_only do openpyxl: cada linha vai direto para o arquivo, então a
+# memória do gerador não cresce com o tamanho das abas. Os dados vêm agregados
+# dos armazenamentos do DatabaseManager (livro de custos, telemetria e
+# histórico ANP lidos em blocos).
+import os
+import re
+from itertools import chain
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+from utils.database import DatabaseManager, CATEGORIAS_CUSTO
+from modules.performance_analysis import consumo_por_abastecimento
+
+# Linha do cabeçalho das colunas, como nas planilhas da ANP
+LINHA_CABECALHO = 10
+# Dias de telemetria lidos antes do período: o primeiro abastecimento da semana
+# precisa do anterior para medir km/l
+DIAS_ANTERIORES_CONSUMO = 31
+FORMATO_DATA = 'DD/MM/YYYY'
+FORMATO_REAIS = '#,##0.00'
+FORMATO_PRECO = '0.000'
+FORMATO_INTEIRO = '#,##0'
+# (título, coluna, largura, formato) de cada aba
+COLUNAS_VEICULOS = [
+    ('PLACA', 'placa', 12, None),
+    ('NOME', 'nome', 20, None),
+    ('COMBUSTÍVEL', 'combustivel', 13, None),
+    ('KM RODADOS', 'km_rodados', 12, FORMATO_INTEIRO),
+    ('LITROS ABASTECIDOS', 'litros', 12, FORMATO_REAIS),
+    ('ABASTECIMENTOS', 'abastecimentos', 16, FORMATO_INTEIRO),
+    ('CONSUMO REAL (KM/L)', 'km_l', 12, '0.00'),
+    ('CONSUMO CADASTRADO (KM/L)', 'consumo', 14, '0.00'),
+    ('PREÇO MÉDIO PAGO (R$/L)', 'preco_pago', 12, FORMATO_PRECO),
+] + [
+    (f'CUSTO {rotulo.upper()} (R$)', f'custo_{categoria}', 14, FORMATO_REAIS)
+    for categoria, rotulo in CATEGORIAS_CUSTO.items()
+] + [
+    ('CUSTO TOTAL (R$)', 'custo_total', 14, FORMATO_REAIS),
+    ('CUSTO POR KM (R$)', 'custo_km', 12, FORMATO_PRECO),
+]
+COLUNAS_PRECOS = [
+    ('DATA INICIAL', 'data_inicial', 12, FORMATO_DATA),
+    ('DATA FINAL', 'data_final', 12, FORMATO_DATA),
+    ('ESTADO', 'estado', 10, None),
+    ('MUNICÍPIO', 'municipio', 28, None),
+    ('PRODUTO', 'produto', 20, None),
+    ('NÚMERO DE PREÇOS PESQUISADOS', 'n', 16, FORMATO_INTEIRO),
+    ('UNIDADE DE MEDIDA', 'unidade', 12, None),
+    ('PREÇO MÉDIO REVENDA', 'preco_medio', 12, FORMATO_PRECO),
+    ('DESVIO PADRÃO REVENDA', 'desvio_padrao', 12, FORMATO_PRECO),
+    ('PREÇO MÍNIMO REVENDA', 'minimo', 12, FORMATO_PRECO),
+    ('PREÇO MÁXIMO REVENDA', 'maximo', 12, FORMATO_PRECO),
+    ('COEF DE VARIAÇÃO REVENDA', 'coef_variacao', 12, FORMATO_PRECO),
+]
+# Aba de preços -> colunas de agrupamento (ESTADO e MUNICÍPIO só onde se aplicam)
+ABAS_PRECOS = {
+    'BRASIL': ['produto'],
+    'ESTADOS': ['estado', 'produto'],
+    'MUNICIPIOS': ['estado', 'municipio', 'produto'],
+}
+UNIDADE_PRODUTO = {'GLP': 'R$/13kg', 'GNV': 'R$/m3'}
+COR_CABECALHO = PatternFill('solid', fgColor='2E86AB')
+
+
+def nome_resumo_semanal(inicio, fim, filial=None):
+    """resumo_semanal[_filial]_AAAA-MM-DD_AAAA-MM-DD.xlsx"""
+    partes = ['resumo_semanal']
+    if filial:
+        partes.append(re.sub(r'[^0-9a-z]+', '_', str(filial).lower()).strip('_'))
+    partes += [pd.Timestamp(inicio).strftime("%Y-%m-%d"), pd.Timestamp(fim).strftime("%Y-%m-%d")]
+    return "_".join(partes) + ".xlsx"
+
+
+def semana_anp(data):
+    """(domingo, sábado) da semana de pesquisa da ANP que contém a data"""
+    data = pd.Timestamp(data).normalize()
+    inicio = data - pd.Timedelta(days=(data.weekday() + 1) % 7)
+    return inicio, inicio + pd.Timedelta(days=6)
+
+
+def semanas_anteriores(quantidade, referencia=None):
+    """As `quantidade` últimas semanas ANP completas antes da referência (padrão: hoje), da mais antiga à mais recente"""
+    inicio_atual, _ = semana_anp(referencia if referencia is not None else datetime.now())
+    return [
+        (inicio_atual - pd.Timedelta(weeks=n), inicio_atual - pd.Timedelta(weeks=n) + pd.Timedelta(days=6))
+        for n in range(quantidade, 0, -1)
+    ]
+
+
+def resumo_veiculos(db_manager, inicio, fim):
+    """Uma linha por veículo com km, litros e consumo real da telemetria e os custos do livro no período"""
+    inicio, fim = pd.Timestamp(inicio).normalize(), pd.Timestamp(fim).normalize()
+    veiculos = db_manager.carregar_veiculos()
+    veiculos = veiculos.reindex(columns=['placa', 'nome', 'combustivel', 'consumo'])
+    veiculos['placa'] = veiculos['placa'].astype(str).str.upper().str.strip()
+    veiculos = veiculos.drop_duplicates('placa', keep='last').set_index('placa')
+
+    eventos = db_manager.carregar_telemetria(
+        colunas=['placa', 'data', 'odometro', 'litros', 'valor'],
+        inicio=inicio - pd.Timedelta(days=DIAS_ANTERIORES_CONSUMO), fim=fim,
+    )
+    no_periodo = eventos['data'] >= inicio
+    periodo = eventos[no_periodo]
+    por_placa = periodo.groupby('placa')
+    # Km rodados: do último hodômetro antes do período (ou do primeiro dentro dele) ao último do período
+    odometro_inicial = eventos[~no_periodo].groupby('placa')['odometro'].max().combine_first(
+        por_placa['odometro'].min()
+    )
+    resumo = pd.DataFrame({
+        'km_rodados': por_placa['odometro'].max() - odometro_inicial,
+        'litros': por_placa['litros'].sum(),
+        'valor': por_placa['valor'].sum(),
+        'abastecimentos': (periodo['litros'] > 0).groupby(periodo['placa']).sum(),
+    })
+    if not eventos.empty:
+        medidos = consumo_por_abastecimento(eventos)
+        medidos = medidos[medidos['km_l'].notna() & (medidos['data'] >= inicio)].groupby('placa')
+        resumo['km_l'] = medidos['km'].sum() / medidos['litros_medidos'].sum()
+    resumo = resumo.reindex(columns=['km_rodados', 'litros', 'valor', 'abastecimentos', 'km_l'])
+    resumo['preco_pago'] = resumo['valor'] / resumo['litros'].where(resumo['litros'] > 0)
+
+    custos = db_manager.custos_periodo(inicio, fim)
+    por_categoria = custos.pivot_table(
+        index='placa', columns='categoria', values='total', aggfunc='sum', fill_value=0.0
+    ).reindex(columns=list(CATEGORIAS_CUSTO), fill_value=0.0).add_prefix('custo_')
+
+    placas = veiculos.index.union(resumo.index).union(por_categoria.index)
+    resumo = veiculos.reindex(placas).join(resumo).join(por_categoria)
+    colunas_custo = [f'custo_{categoria}' for categoria in CATEGORIAS_CUSTO]
+    resumo[colunas_custo] = resumo[colunas_custo].fillna(0.0)
+    resumo['custo_total'] = resumo[colunas_custo].sum(axis=1)
+    resumo['custo_km'] = resumo['custo_total'] / resumo['km_rodados'].where(resumo['km_rodados'] > 0)
+    return resumo.rename_axis('placa').reset_index()
+
+
+def total_frota(resumo):
+    """Linha de totais do resumo por veículo (consumo e preço ponderados pelos litros)"""
+    total = {coluna: resumo[coluna].sum() for coluna in ['km_rodados', 'litros', 'valor', 'abastecimentos']}
+    colunas_custo = [coluna for coluna in resumo.columns if coluna.startswith('custo_') and coluna != 'custo_km']
+    total.update({coluna: resumo[coluna].sum() for coluna in colunas_custo})
+    # Consumo da frota: km rodados sobre litros abastecidos dos veículos que têm os dois
+    medidos = (resumo['km_rodados'] > 0) & (resumo['litros'] > 0)
+    litros_medidos = resumo.loc[medidos, 'litros'].sum()
+    total['km_l'] = resumo.loc[medidos, 'km_rodados'].sum() / litros_medidos if litros_medidos else np.nan
+    total['preco_pago'] = total['valor'] / total['litros'] if total['litros'] else np.nan
+    total['custo_km'] = total['custo_total'] / total['km_rodados'] if total['km_rodados'] else np.nan
+    total['placa'] = 'TOTAL DA FROTA'
+    return total
+
+
+def _valor_celula(valor):
+    """NaN/NA viram célula vazia; tipos do numpy viram tipos do Python"""
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return None
+    return valor.item() if isinstance(valor, np.generic) else valor
+
+
+def escrever_aba(livro, titulo, descricao, cabecalho, colunas, linhas):
+    """Acrescenta uma aba ao livro write_only e grava as linhas à medida que são produzidas.
+
+    cabecalho: linhas de texto acima do cabeçalho das colunas (até LINHA_CABECALHO - 2);
+    linhas: iterável de tuplas na ordem de `colunas`. Retorna o número de linhas gravadas.
+    """
+    aba = livro.create_sheet(titulo)
+    # Larguras e painel congelado precisam ser definidos antes da primeira linha
+    for posicao, (_, _, largura, _) in enumerate(colunas, start=1):
+        aba.column_dimensions[get_column_letter(posicao)].width = largura
+    aba.freeze_panes = f"A{LINHA_CABECALHO + 1}"
+
+    negrito = Font(bold=True)
+    textos = ["T-MANAGER - SISTEMA DE GESTÃO DE FROTAS", "RESUMO SEMANAL DA FROTA E DOS COMBUSTÍVEIS", descricao, None]
+    textos += list(cabecalho)
+    textos += [None] * (LINHA_CABECALHO - 1 - len(textos))
+    for numero, texto in enumerate(textos[:LINHA_CABECALHO - 1]):
+        if texto is None:
+            aba.append([])
+            continue
+        celula = WriteOnlyCell(aba, texto)
+        celula.font = negrito if numero < 3 else Font(italic=texto.startswith("OBS"))
+        aba.append([celula])
+
+    titulos = []
+    for rotulo, _, _, _ in colunas:
+        celula = WriteOnlyCell(aba, rotulo)
+        celula.font = Font(bold=True, color='FFFFFF')
+        celula.fill = COR_CABECALHO
+        celula.alignment = Alignment(wrap_text=True, vertical='center', horizontal='center')
+        titulos.append(celula)
+    aba.append(titulos)
+
+    formatos = [formato for _, _, _, formato in colunas]
+    gravadas = 0
+    for linha in linhas:
+        celulas = []
+        for valor, formato in zip(linha, formatos):
+            valor = _valor_celula(valor)
+            if formato is None or valor is None:
+                celulas.append(valor)
+                continue
+            celula = WriteOnlyCell(aba, valor)
+            celula.number_format = formato
+            celulas.append(celula)
+        aba.append(celulas)
+        gravadas += 1
+    return gravadas
+
+
+def _linhas_precos(estatisticas, inicio, fim):
+    """Tuplas na ordem de COLUNAS_PRECOS, produzidas sob demanda"""
+    estatisticas = estatisticas.reindex(columns=['estado', 'municipio', 'produto', 'n', 'preco_medio',
+                                                 'desvio_padrao', 'minimo', 'maximo'])
+    coef_variacao = estatisticas['desvio_padrao'] / estatisticas['preco_medio']
+    data_inicial, data_final = inicio.to_pydatetime(), fim.to_pydatetime()
+    for registro, coef in zip(estatisticas.itertuples(index=False), coef_variacao):
+        yield (
+            data_inicial, data_final, registro.estado, registro.municipio, registro.produto, registro.n,
+            UNIDADE_PRODUTO.get(registro.produto, 'R$/l'), registro.preco_medio, registro.desvio_padrao,
+            registro.minimo, registro.maximo, coef,
+        )
+
+
+def gerar_resumo_semanal(db_manager, inicio, fim, destino, filial=None):
+    """Grava o resumo do período (datas inclusivas) em `destino` (caminho ou arquivo binário).
+
+    Abas: VEICULOS (km, litros, consumo real e custos por veículo, com o total da
+    frota) e BRASIL, ESTADOS e MUNICIPIOS (preços de revenda ANP coletados no
+    período). Retorna {aba: linhas gravadas}.
+    """
+    inicio, fim = pd.Timestamp(inicio).normalize(), pd.Timestamp(fim).normalize()
+    if fim < inicio:
+        raise ValueError("A data final do resumo é anterior à inicial")
+
+    cabecalho = [
+        f"PERÍODO: {inicio:%d/%m/%Y} A {fim:%d/%m/%Y}",
+        f"FILIAL: {filial}" if filial else None,
+        f"GERADO EM: {datetime.now():%d/%m/%Y %H:%M}",
+    ]
+    livro = Workbook(write_only=True)
+    linhas = {}
+
+    resumo = resumo_veiculos(db_manager, inicio, fim)
+    colunas = [coluna for _, coluna, _, _ in COLUNAS_VEICULOS]
+    registros = resumo.reindex(columns=colunas).itertuples(index=False, name=None)
+    if not resumo.empty:
+        total = total_frota(resumo)
+        registros = chain(registros, [tuple(total.get(coluna) for coluna in colunas)])
+    linhas['VEICULOS'] = escrever_aba(
+        livro, 'VEICULOS', "CUSTOS E CONSUMO POR VEÍCULO",
+        cabecalho + ["OBS: consumo real pelo método do tanque cheio (telemetria); custos do livro de custos"],
+        COLUNAS_VEICULOS, registros,
+    )
+
+    for aba, grupos in ABAS_PRECOS.items():
+        estatisticas = db_manager.estatisticas_precos_periodo(grupos, inicio, fim)
+        linhas[aba] = escrever_aba(
+            livro, aba, f"PREÇOS DE REVENDA ANP - {aba}",
+            cabecalho + ["OBS: preços da ANP com data de coleta no período; desvio padrão amostral"],
+            COLUNAS_PRECOS, _linhas_precos(estatisticas, inicio, fim),
+        )
+
+    livro.save(destino)
+    return linhas
+
+
+def gerar_resumo_semanal_arquivo(data_dir, inicio, fim, pasta_saida, filial=None):
+    """Executado em um processo do pool: abre o DatabaseManager da filial e grava o resumo na pasta"""
+    os.makedirs(pasta_saida, exist_ok=True)
+    caminho = os.path.join(pasta_saida, nome_resumo_semanal(inicio, fim, filial))
+    linhas = gerar_resumo_semanal(DatabaseManager(data_dir), inicio, fim, caminho, filial)
+    return {'arquivo': caminho, 'filial': filial, 'linhas': linhas}
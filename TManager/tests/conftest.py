@@ -0,0 +1,55 @@
+# conftest.py - fixtures comuns: DatabaseManager em pasta temporária e planilhas ANP sintéticas
+#
+# Uso (a partir da pasta TManager):
+#     python -m pytest -q tests
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.database import DatabaseManager
+
+COLUNAS_ANP = [
+    'Estado - Sigla', 'Município', 'Revenda', 'Nome da Rua', 'Bairro',
+    'Produto', 'Data da Coleta', 'Valor de Venda',
+]
+MUNICIPIOS_TESTE = [('SP', 'CAMPINAS'), ('SP', 'SANTOS'), ('RJ', 'NITEROI'), ('MG', 'BELO HORIZONTE')]
+
+
+@pytest.fixture
+def db(tmp_path):
+    return DatabaseManager(str(tmp_path / "data"))
+
+
+@pytest.fixture
+def planilha_anp():
+    """Fábrica de planilhas no layout da ANP: uma revenda distinta por linha
+    (a revenda identifica a linha nos testes) e preços com vírgula decimal"""
+    def gerar(linhas, inicio=0, precos=(5.49, 5.89, 6.19), semente=0):
+        rng = np.random.default_rng(semente)
+        locais = [MUNICIPIOS_TESTE[i % len(MUNICIPIOS_TESTE)] for i in range(inicio, inicio + linhas)]
+        return pd.DataFrame({
+            'Estado - Sigla': [estado for estado, _ in locais],
+            'Município': [municipio for _, municipio in locais],
+            'Revenda': [f"POSTO {i:05d}" for i in range(inicio, inicio + linhas)],
+            'Nome da Rua': [f"RUA {i}" for i in range(inicio, inicio + linhas)],
+            'Bairro': "CENTRO",
+            'Produto': rng.choice(['GASOLINA', 'ETANOL', 'DIESEL S10'], linhas),
+            'Data da Coleta': "01/09/2025",
+            'Valor de Venda': [f"{preco:.2f}".replace('.', ',') for preco in rng.choice(precos, linhas)],
+        }, columns=COLUNAS_ANP)
+    return gerar
+
+
+@pytest.fixture
+def csv_anp(tmp_path):
+    """Grava a planilha como o CSV (';', latin-1) publicado pela ANP e devolve o caminho"""
+    def gravar(df, nome):
+        caminho = tmp_path / nome
+        df.to_csv(caminho, sep=';', index=False, encoding='latin-1')
+        return str(caminho)
+    return gravar
@@ -0,0 +1,58 @@
+# test_abastecimento.py - planejar_abastecimento contra uma programação dinâmica exaustiva
+import numpy as np
+import pytest
+
+from utils.abastecimento import planejar_abastecimento
+
+
+def custo_minimo_exaustivo(trechos, precos, tanque, inicial):
+    """Menor custo por programação dinâmica sobre litros inteiros no tanque.
+
+    Com trechos, tanque e carga inicial inteiros (consumo 1 km/l) as compras do
+    plano ótimo também são inteiras, então a busca discreta alcança o ótimo.
+    Retorna inf quando nenhum plano chega ao destino.
+    """
+    custo = np.full(tanque + 1, np.inf)
+    custo[inicial] = 0.0
+    for parada, trecho in enumerate(trechos):
+        proximo = np.full(tanque + 1, np.inf)
+        for litros in np.flatnonzero(np.isfinite(custo)):
+            compras = range(tanque - litros + 1) if np.isfinite(precos[parada]) else [0]
+            for compra in compras:
+                saida = litros + compra
+                if saida >= trecho:
+                    total = custo[litros] + compra * (precos[parada] if compra else 0.0)
+                    proximo[saida - trecho] = min(proximo[saida - trecho], total)
+        custo = proximo
+    return custo.min()
+
+
+def test_plano_guloso_tem_custo_da_busca_exaustiva():
+    rng = np.random.default_rng(2025)
+    viaveis = 0
+    for _ in range(500):
+        paradas = int(rng.integers(2, 8))
+        tanque = int(rng.integers(4, 16))
+        inicial = int(rng.integers(0, tanque + 1))
+        trechos = rng.integers(1, tanque + 2, paradas - 1)
+        precos = np.round(rng.uniform(4.0, 7.0, paradas), 2)
+        precos[rng.random(paradas) < 0.2] = np.nan  # paradas sem posto
+
+        plano = planejar_abastecimento(trechos, precos, 1.0, tanque, inicial)
+        esperado = custo_minimo_exaustivo(trechos, precos, tanque, inicial)
+        if np.isinf(esperado):
+            assert not plano['viavel']
+            continue
+        viaveis += 1
+        assert plano['viavel']
+        assert plano['custo'] == pytest.approx(esperado)
+        # Nunca compra além do tanque nem chega com combustível negativo
+        assert np.all(plano['chegada'][1:] >= -1e-9)
+        assert np.all(plano['chegada'][:-1] + plano['litros'][:-1] <= tanque + 1e-9)
+    assert viaveis > 200  # a maioria dos casos sorteados tem solução
+
+
+def test_reserva_nunca_e_consumida():
+    plano = planejar_abastecimento([300, 300, 300], [6.0, 5.0, 5.5, np.nan], 3.0, 200, 50, reserva=40)
+    assert plano['viavel']
+    assert plano['chegada'].min() >= 40 - 1e-9
@@ -0,0 +1,96 @@
+# test_precos_anp.py - histórico ANP: deduplicação, rollback sem arquivos órfãos e paginação
+import glob
+import os
+
+import pandas as pd
+import pytest
+
+from utils.anp_import import ImportadorANP, limpar_dados_anp, resolver_colunas_anp
+from utils.database import DatabaseManager
+
+
+def arquivos_parquet(db):
+    return sorted(glob.glob(os.path.join(db.precos_dir, "**", "*.parquet"), recursive=True))
+
+
+def limpar(df):
+    return limpar_dados_anp(df, resolver_colunas_anp(df.columns))
+
+
+def test_reimportar_mesmo_arquivo_nao_acrescenta_linhas(db, planilha_anp, csv_anp):
+    caminho = csv_anp(planilha_anp(300), "semana.csv")
+    importador = ImportadorANP(db)
+
+    primeira = importador.importar(caminho)
+    assert primeira['sucesso'] and primeira['novos'] == 300
+
+    segunda = importador.importar(caminho)
+    assert segunda['sucesso'] and segunda['ja_importado']
+    assert db.consultar_precos()[1] == 300
+
+
+def test_arquivo_sobreposto_so_acrescenta_linhas_novas(db, planilha_anp, csv_anp):
+    importador = ImportadorANP(db)
+    importador.importar(csv_anp(planilha_anp(300), "semana.csv"))
+
+    # Mesmas 300 linhas (outro arquivo, outro hash) mais 100 inéditas
+    sobreposto = pd.concat([planilha_anp(300), planilha_anp(100, inicio=300, semente=1)])
+    resultado = importador.importar(csv_anp(sobreposto, "semana_corrigida.csv"))
+
+    assert resultado['sucesso'] and resultado['novos'] == 100
+    assert db.consultar_precos()[1] == 400
+
+
+def test_salvar_sem_linhas_novas_nao_grava_arquivos(db, planilha_anp):
+    precos = limpar(planilha_anp(200))
+    assert db.salvar_precos_anp(precos) == 200
+    arquivos = arquivos_parquet(db)
+
+    assert db.salvar_precos_anp(precos) == 0
+    assert arquivos_parquet(db) == arquivos
+
+
+def test_falha_na_transacao_nao_deixa_parquet_orfao(db, planilha_anp, monkeypatch):
+    db.salvar_precos_anp(limpar(planilha_anp(200)))
+    arquivos = arquivos_parquet(db)
+
+    def falhar(*args, **kwargs):
+        raise RuntimeError("falha simulada")
+
+    novos = limpar(planilha_anp(150, inicio=200, semente=1))
+    with monkeypatch.context() as m:
+        m.setattr(DatabaseManager, '_atualizar_indice_precos', falhar)
+        with pytest.raises(RuntimeError):
+            db.salvar_precos_anp(novos)
+
+    assert arquivos_parquet(db) == arquivos
+    assert db.consultar_precos()[1] == 200
+    # O reenvio grava as linhas uma única vez
+    assert db.salvar_precos_anp(novos) == 150
+    assert db.consultar_precos()[1] == 350
+
+
+@pytest.mark.parametrize('ordenar_por', ['preco', 'municipio', 'produto'])
+@pytest.mark.parametrize('decrescente', [False, True])
+def test_paginas_ordenadas_com_empates_nao_repetem_nem_pulam(db, planilha_anp, ordenar_por, decrescente):
+    # Poucos valores distintos: quase todas as linhas empatam na chave de ordenação
+    db.salvar_precos_anp(limpar(planilha_anp(537, precos=(5.49, 5.89))))
+    db.salvar_precos_anp(limpar(planilha_anp(211, inicio=537, precos=(5.49, 5.89), semente=1)))
+
+    paginas = []
+    pagina = 1
+    while True:
+        df, total = db.consultar_precos(
+            ordenar_por=ordenar_por, decrescente=decrescente, pagina=pagina, tamanho_pagina=50
+        )
+        if df.empty:
+            break
+        paginas.append(df)
+        pagina += 1
+    todas = pd.concat(paginas, ignore_index=True)
+
+    assert total == 748
+    assert len(todas) == total
+    assert todas['revenda'].is_unique
+    chaves = todas[ordenar_por].astype(str) if ordenar_por != 'preco' else todas[ordenar_por]
+    assert (chaves.is_monotonic_decreasing if decrescente else chaves.is_monotonic_increasing)
@@ -0,0 +1,43 @@
+# test_roteirizacao.py - resolver_rotas: todas as paradas atendidas uma vez, sem exceder a carga
+import numpy as np
+import pytest
+
+from utils.roteirizacao import distancia_rota, matriz_distancias, resolver_rotas
+
+
+def instancia(semente, paradas):
+    rng = np.random.default_rng(semente)
+    latitudes = np.concatenate([[-22.9], rng.uniform(-23.5, -22.0, paradas)])
+    longitudes = np.concatenate([[-47.1], rng.uniform(-48.0, -46.0, paradas)])
+    demandas = np.concatenate([[0.0], rng.integers(100, 1500, paradas).astype(float)])
+    return matriz_distancias(latitudes, longitudes), demandas
+
+
+@pytest.mark.parametrize('semente', range(10))
+def test_rotas_respeitam_capacidade_e_atendem_todas_as_paradas(semente):
+    matriz, demandas = instancia(semente, paradas=40)
+    capacidades = [5000.0, 3500.0, 1200.0]
+    resultado = resolver_rotas(matriz, demandas, capacidades, tempo_limite=1.0)
+
+    visitadas = [no for rota in resultado['rotas'] for no in rota[1:-1]]
+    assert sorted(visitadas) == list(range(1, len(matriz)))
+    assert resultado['nao_atendidas'] == []
+    for rota, veiculo, carga, distancia in zip(
+        resultado['rotas'], resultado['veiculos'], resultado['carga'], resultado['distancias']
+    ):
+        assert rota[0] == 0 and rota[-1] == 0
+        assert carga == pytest.approx(demandas[rota].sum())
+        assert carga <= capacidades[veiculo] + 1e-9
+        assert distancia == pytest.approx(distancia_rota(matriz, rota))
+    assert resultado['distancia_total'] <= resultado['distancia_inicial'] + 1e-6
+
+
+def test_parada_maior_que_a_frota_fica_nao_atendida():
+    matriz, demandas = instancia(0, paradas=10)
+    demandas[3] = 10_000.0
+    resultado = resolver_rotas(matriz, demandas, [2000.0, 2000.0], tempo_limite=0.5)
+
+    visitadas = [no for rota in resultado['rotas'] for no in rota[1:-1]]
+    assert resultado['nao_atendidas'] == [3]
+    assert sorted(visitadas) == [no for no in range(1, len(matriz)) if no != 3]
+    assert all(carga <= 2000.0 for carga in resultado['carga'])
@@ -0,0 +1,3 @@
+# utils - núcleo do T-Manager sem dependência do Streamlit
+from .database import DatabaseManager
+from .anp_import import ImportadorANP, resolver_colunas_anp, converter_precos_br
@@ -0,0 +1,137 @@
+# abastecimento.py - onde e quanto abastecer ao longo de uma rota fixa
+#
+# Algoritmo guloso ótimo para o problema do posto em rota linear com tanque
+# limitado: em cada parada, se existe uma parada mais barata ao alcance de um
+# tanque cheio, compra-se só o necessário para chegar até ela; senão, enche-se
+# o tanque e segue-se para a próxima. A "próxima parada mais barata" de todas as
+# paradas sai de uma pilha monotônica, então o plano inteiro é O(paradas).
+import numpy as np
+import pandas as pd
+
+from .custos import precos_por_combustivel, preco_por_local, separar_uf
+from .distancias import chave_municipio
+
+
+def _proxima_mais_barata(precos):
+    """Índice da primeira parada seguinte com preço estritamente menor (n se não houver)"""
+    proxima = np.full(len(precos), len(precos))
+    pilha = []
+    for indice, preco in enumerate(precos):
+        while pilha and preco < precos[pilha[-1]]:
+            proxima[pilha.pop()] = indice
+        pilha.append(indice)
+    return proxima
+
+
+def planejar_abastecimento(trechos_km, precos, consumo, tanque, inicial, reserva=0.0):
+    """Plano de menor custo para percorrer as paradas na ordem dada.
+
+    trechos_km: km entre paradas consecutivas (n-1 valores para n paradas).
+    precos: R$/litro em cada parada; NaN onde não há como abastecer. O preço da
+    última parada (destino) é ignorado: não se compra combustível na chegada.
+    tanque, inicial e reserva em litros; a reserva nunca é consumida.
+
+    Retorna dict com litros (comprados em cada parada), chegada (litros ao
+    chegar em cada parada), custo, viavel e, se inviável, trecho_inviavel.
+    """
+    trechos = np.asarray(trechos_km, dtype=float) / consumo
+    n = len(trechos) + 1
+    precos = np.asarray(precos, dtype=float).copy()
+    precos[np.isnan(precos)] = np.inf
+    # O destino é "mais barato que tudo": força comprar só o necessário para chegar
+    precos[-1] = -np.inf
+    posicao = np.concatenate([[0.0], np.cumsum(trechos)])
+    capacidade = tanque - reserva
+    combustivel = inicial - reserva
+    proxima = _proxima_mais_barata(precos)
+
+    litros = np.zeros(n)
+    chegada = np.full(n, np.nan)
+    chegada[0] = inicial
+    plano = {'litros': litros, 'chegada': chegada, 'viavel': True, 'trecho_inviavel': None}
+    atual = 0
+    while atual < n - 1:
+        destino = proxima[atual]
+        consumo_ate_destino = posicao[destino] - posicao[atual] if destino < n else np.inf
+        if consumo_ate_destino <= capacidade:
+            compra = max(consumo_ate_destino - combustivel, 0.0)
+        else:
+            # Nada mais barato ao alcance: enche o tanque e vai à próxima parada
+            destino = atual + 1
+            compra = capacidade - combustivel
+        if compra > 0 and np.isinf(precos[atual]):
+            compra = 0.0  # parada sem preço: segue com o que tem
+        litros[atual] = compra
+        combustivel += compra
+
+        percorrido = posicao[atual + 1:destino + 1] - posicao[atual]
+        if percorrido[-1] > combustivel + 1e-9:
+            # Trecho maior que o tanque (ou sem preço para abastecer antes dele)
+            alcancadas = int(np.searchsorted(percorrido, combustivel + 1e-9, side='right'))
+            chegada[atual + 1:atual + 1 + alcancadas] = combustivel - percorrido[:alcancadas] + reserva
+            plano['viavel'] = False
+            plano['trecho_inviavel'] = atual + alcancadas
+            break
+        chegada[atual + 1:destino + 1] = combustivel - percorrido + reserva
+        combustivel -= percorrido[-1]
+        atual = destino
+
+    precos_compra = np.where(litros > 0, precos, 0.0)
+    plano['custo'] = float((litros * precos_compra).sum())
+    return plano
+
+
+def abastecer_quando_necessario(trechos_km, precos, consumo, tanque, inicial, reserva=0.0):
+    """Estratégia de referência: enche o tanque sempre que o combustível não
+    dá para o próximo trecho. Retorna o custo (NaN se inviável), descontando o
+    que sobra acima da reserva na chegada pelo preço da última compra."""
+    trechos = np.asarray(trechos_km, dtype=float) / consumo
+    precos = np.asarray(precos, dtype=float)
+    combustivel, custo, ultimo_preco = inicial - reserva, 0.0, 0.0
+    for indice, trecho in enumerate(trechos):
+        if combustivel < trecho and not np.isnan(precos[indice]):
+            custo += (tanque - reserva - combustivel) * precos[indice]
+            combustivel, ultimo_preco = tanque - reserva, precos[indice]
+        combustivel -= trecho
+        if combustivel < -1e-9:
+            return np.nan
+    return custo - max(combustivel, 0.0) * ultimo_preco
+
+
+def plano_abastecimento_rota(paradas, calculadora, indice_precos, combustivel, consumo, tanque,
+                             inicial, reserva=0.0, coluna_preco='mediana'):
+    """Plano para uma rota de municípios ('Cidade/UF' por item ou colunas municipio/uf).
+
+    Retorna (tabela, plano): uma linha por parada com km, preço, litros ao chegar,
+    litros comprados e custo; plano é o dict de planejar_abastecimento com
+    custo_referencia (enchendo o tanque só quando necessário).
+    """
+    if isinstance(paradas, pd.DataFrame):
+        municipios, ufs = separar_uf(paradas['municipio'], paradas.get('uf'))
+    else:
+        municipios, ufs = separar_uf(list(paradas))
+    codigos = calculadora.localizar(municipios, ufs)
+    if (codigos < 0).any():
+        desconhecidos = (municipios + "/" + ufs)[codigos < 0]
+        raise ValueError(f"Municípios não localizados: {', '.join(desconhecidos.unique())}")
+    trechos = calculadora.distancias(codigos[:-1], codigos[1:])
+
+    precos, nivel = preco_por_local(
+        pd.Series(combustivel, index=municipios.index), ufs, chave_municipio(municipios),
+        precos_por_combustivel(indice_precos), coluna=coluna_preco,
+    )
+    plano = planejar_abastecimento(trechos, precos.to_numpy(), consumo, tanque, inicial, reserva)
+    plano['custo_referencia'] = abastecer_quando_necessario(
+        trechos, precos.to_numpy(), consumo, tanque, inicial, reserva
+    )
+    tabela = pd.DataFrame({
+        'parada': municipios.to_numpy(),
+        'uf': ufs.to_numpy(),
+        'km_acumulado': np.concatenate([[0.0], np.cumsum(trechos)]).round(1),
+        'preco_litro': precos.round(3).to_numpy(),
+        'referencia_preco': nivel.fillna('-').to_numpy(),
+        'litros_chegada': np.round(plano['chegada'], 1),
+        'litros_comprados': np.round(plano['litros'], 1),
+    })
+    tabela['custo'] = (tabela['litros_comprados'] * tabela['preco_litro'].fillna(0)).round(2)
+    return tabela, plano
@@ -0,0 +1,410 @@
+# utils/anp_import.py - pipeline de importação ANP (sem dependência do Streamlit)
+#
+# Usado pela página "Dados ANP" e pelo importador em lote (importar_anp.py).
+import os
+import csv
+import time
+import codecs
+import hashlib
+import unicodedata
+from datetime import datetime
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import openpyxl
+
+# Linhas por bloco na importação em streaming (memória constante)
+TAMANHO_BLOCO_ANP = 100_000
+# Bytes lidos para detectar codificação e separador do CSV
+TAMANHO_AMOSTRA_CSV = 64 * 1024
+
+# ========== RESOLUÇÃO DE COLUNAS ==========
+# Mapeamento expandido: nome padrão -> nomes conhecidos, em ordem de preferência
+ALIASES_COLUNAS_ANP = {
+    'produto': ['Produto', 'Combustível', 'Tipo'],
+    'estado': ['Estado', 'UF', 'Estado - Sigla', 'Sigla'],
+    'municipio': ['Município', 'Cidade', 'Localidade'],
+    'preco': [
+        'Valor de Venda', 'Preço', 'Valor', 'Preço de Venda', 'Venda',
+        'Preço Revenda', 'Preço Máximo Revenda', 'Preço Máximo'
+    ],
+    'bairro': ['Bairro', 'Bairro Revendedor'],
+    'endereco': ['Endereço', 'Nome da Rua', 'Rua', 'Logradouro', 'Local'],
+    'revenda': ['Revenda', 'Nome da Revenda', 'Razão Social', 'Posto'],
+    'data_coleta': ['Data da Coleta', 'Data Coleta', 'Data'],
+}
+
+
+def normalizar_nome_coluna(nome):
+    """Maiúsculas, sem acentos e com espaços colapsados: 'Município ' -> 'MUNICIPIO'"""
+    sem_acento = unicodedata.normalize('NFKD', str(nome)).encode('ascii', 'ignore').decode('ascii')
+    return " ".join(sem_acento.upper().split())
+
+
+# Pré-compilado uma vez por processo
+_ALIASES_NORMALIZADOS = {
+    padrao: tuple(dict.fromkeys(normalizar_nome_coluna(nome) for nome in nomes))
+    for padrao, nomes in ALIASES_COLUNAS_ANP.items()
+}
+
+
+@lru_cache(maxsize=256)
+def _resolver_assinatura(assinatura):
+    normalizadas = [normalizar_nome_coluna(coluna) for coluna in assinatura]
+    posicoes = {}
+    for i, nome in enumerate(normalizadas):
+        posicoes.setdefault(nome, i)
+    
+    resolvido = []
+    usadas = set()
+    for padrao, aliases in _ALIASES_NORMALIZADOS.items():
+        # Busca exata por todos os aliases antes da correspondência parcial;
+        # uma coluna já atribuída não é reutilizada ('Preço Médio Revenda' não vira 'revenda')
+        indice = next(
+            (posicoes[alias] for alias in aliases if alias in posicoes and posicoes[alias] not in usadas),
+            None,
+        )
+        if indice is None:
+            indice = next(
+                (i for alias in aliases for i, nome in enumerate(normalizadas)
+                 if i not in usadas and nome and (alias in nome or nome in alias)),
+                None,
+            )
+        if indice is not None:
+            usadas.add(indice)
+            resolvido.append((padrao, assinatura[indice]))
+    return tuple(resolvido)
+
+
+def resolver_colunas_anp(colunas):
+    """Mapeia nome padrão -> coluna original para um cabeçalho da ANP.
+    
+    O resultado é cacheado pela assinatura do cabeçalho, então os layouts
+    semanais repetidos da ANP são resolvidos sem refazer a busca.
+    """
+    return dict(_resolver_assinatura(tuple(colunas)))
+
+
+# ========== CONVERSÃO DE DADOS ==========
+COMBUSTIVEIS_PRINCIPAIS = [
+    'GASOLINA', 'GASOLINA COMUM', 'ETANOL', 'ÓLEO DIESEL', 'DIESEL', 
+    'GASOLINA ADITIVADA', 'DIESEL S10', 'DIESEL S500', 'GNV',
+    'ETANOL HIDRATADO', 'GASOLINA C', 'GASOLINA A'
+]
+
+
+def converter_precos_br(valores):
+    """Converte preços como 'R$ 1.234,56', '5,89' ou '5.89' para float.
+    
+    O texto é tratado apenas uma vez por valor distinto (as planilhas da ANP
+    repetem poucos preços em milhões de linhas) e o resultado é expandido
+    de volta pelos códigos.
+    """
+    if pd.api.types.is_numeric_dtype(valores):
+        return valores.astype(float)
+    
+    codigos, unicos = pd.factorize(valores)
+    texto = pd.Series(unicos, dtype=object).astype(str).str.replace(r'[R$\s]', '', regex=True)
+    # Com vírgula decimal, pontos são separadores de milhar
+    com_virgula = texto.str.contains(',', regex=False)
+    texto = texto.where(
+        ~com_virgula,
+        texto.str.replace('.', '', regex=False).str.replace(',', '.', regex=False),
+    )
+    convertidos = np.append(pd.to_numeric(texto, errors='coerce').to_numpy(dtype=float), np.nan)
+    # Código -1 (valor ausente) aponta para o NaN acrescentado no fim
+    return pd.Series(convertidos[codigos], index=valores.index, name=valores.name)
+
+
+def converter_numeros_br(valores):
+    """Como converter_precos_br, mas '1.250' (ponto seguido de grupos de três
+    dígitos, sem vírgula) é milhar: 1250. Para km, hodômetros e pedágios, que
+    não vêm com três casas decimais; em preços '5.899' continua sendo 5,899.
+    """
+    if pd.api.types.is_numeric_dtype(valores):
+        return valores.astype(float)
+
+    texto = valores.astype(object)
+    milhar = texto.astype(str).str.fullmatch(r'[R$\s]*-?[1-9]\d{0,2}(?:\.\d{3})+\s*')
+    return converter_precos_br(texto.where(~milhar, texto.astype(str).str.replace('.', '', regex=False)))
+
+
+def transformar_categorias(valores, funcao):
+    """Aplica funcao (sobre uma Series de texto) uma vez por valor distinto e devolve uma categórica"""
+    categorica = valores.astype('category')
+    categorias = pd.Series(categorica.cat.categories.astype(str))
+    novos_codigos, novas_categorias = pd.factorize(funcao(categorias))
+    novos_codigos = np.append(novos_codigos, -1)
+    return pd.Series(
+        pd.Categorical.from_codes(novos_codigos[categorica.cat.codes.to_numpy()], categories=novas_categorias),
+        index=valores.index,
+        name=valores.name,
+    )
+
+
+# ========== LEITURA DE ARQUIVOS ==========
+def hash_conteudo(arquivo):
+    """SHA-256 do conteúdo do arquivo, lido em blocos"""
+    sha = hashlib.sha256()
+    arquivo.seek(0)
+    for parte in iter(lambda: arquivo.read(1024 * 1024), b""):
+        sha.update(parte if isinstance(parte, bytes) else parte.encode('utf-8'))
+    arquivo.seek(0)
+    return sha.hexdigest()
+
+
+def detectar_dialeto_csv(arquivo):
+    """Detecta codificação e separador a partir de uma amostra limitada do início do arquivo"""
+    arquivo.seek(0)
+    amostra = arquivo.read(TAMANHO_AMOSTRA_CSV)
+    if isinstance(amostra, str):
+        amostra = amostra.encode('utf-8')
+    
+    encoding = 'utf-8-sig' if amostra.startswith(codecs.BOM_UTF8) else 'utf-8'
+    try:
+        # final=False tolera um caractere multibyte cortado no fim da amostra
+        texto = codecs.getincrementaldecoder(encoding)().decode(amostra, final=False)
+    except UnicodeDecodeError:
+        encoding = 'latin-1'
+        texto = amostra.decode(encoding)
+    
+    linhas = texto.splitlines()[:50]
+    if len(texto) >= TAMANHO_AMOSTRA_CSV and len(linhas) > 1:
+        linhas = linhas[:-1]  # última linha pode estar incompleta
+    try:
+        sep = csv.Sniffer().sniff("\n".join(linhas), delimiters=";,\t|").delimiter
+    except csv.Error:
+        cabecalho = linhas[0] if linhas else ""
+        sep = max(";,\t|", key=cabecalho.count)
+    
+    return {'encoding': encoding, 'sep': sep}
+
+
+def descrever_dialeto(dialeto):
+    separadores = {';': 'ponto e vírgula', ',': 'vírgula', '\t': 'tabulação', '|': 'barra vertical'}
+    nome_sep = separadores.get(dialeto['sep'], repr(dialeto['sep']))
+    return f"codificação {dialeto['encoding']}, separador {nome_sep}"
+
+
+def ler_csv(arquivo, dialeto):
+    """Lê o CSV inteiro com uma única leitura pelo motor C"""
+    arquivo.seek(0)
+    # dtype=str evita a inferência de tipos; os preços são convertidos na limpeza
+    return pd.read_csv(arquivo, engine='c', dtype=str, **dialeto)
+
+
+def iterar_blocos_csv(arquivo, dialeto, tamanho_bloco=TAMANHO_BLOCO_ANP):
+    arquivo.seek(0)
+    yield from pd.read_csv(arquivo, chunksize=tamanho_bloco, engine='c', dtype=str, **dialeto)
+
+
+def iterar_blocos_xlsx(arquivo, tamanho_bloco=TAMANHO_BLOCO_ANP):
+    # read_only percorre as linhas sem montar a planilha inteira em memória
+    workbook = openpyxl.load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        linhas = workbook.active.iter_rows(values_only=True)
+        cabecalho = next(linhas, None)
+        if cabecalho is None:
+            return
+        
+        cabecalho = [str(c) if c is not None else f"coluna_{i}" for i, c in enumerate(cabecalho)]
+        lote = []
+        for linha in linhas:
+            lote.append(linha)
+            if len(lote) >= tamanho_bloco:
+                yield pd.DataFrame(lote, columns=cabecalho)
+                lote = []
+        if lote:
+            yield pd.DataFrame(lote, columns=cabecalho)
+    finally:
+        workbook.close()
+
+
+def fracao_lida(arquivo):
+    try:
+        posicao = arquivo.tell()
+        total = arquivo.seek(0, os.SEEK_END)
+        arquivo.seek(posicao)
+        return min(posicao / total, 1.0) if total else 1.0
+    except Exception:
+        return 0.0
+
+
+# ========== LIMPEZA ==========
+def limpar_dados_anp(df, colunas_detectadas, relatorio=None):
+    """Limpa e padroniza os dados da ANP
+    
+    colunas_detectadas vem de resolver_colunas_anp (padrão -> nome original).
+    Se relatorio (dict) for informado, recebe as contagens de cada etapa.
+    """
+    relatorio = relatorio if relatorio is not None else {}
+    
+    # Renomear colunas (o mapeamento detectado é padrão -> nome original)
+    df_renomeado = df.rename(columns={original: padrao for padrao, original in colunas_detectadas.items()})
+    
+    # Garantir colunas essenciais
+    for coluna in ['produto', 'estado', 'municipio', 'preco']:
+        if coluna not in df_renomeado.columns:
+            df_renomeado[coluna] = None
+    
+    # Converter preços para numérico (uma conversão por valor distinto)
+    relatorio['linhas'] = len(df_renomeado)
+    df_renomeado['preco'] = converter_precos_br(df_renomeado['preco'])
+    relatorio['precos_convertidos'] = int(df_renomeado['preco'].notna().sum())
+    df_renomeado = df_renomeado.dropna(subset=['preco'])
+    
+    # Colunas de baixa cardinalidade viram categóricas; a limpeza roda
+    # uma vez por categoria e o filtro compara apenas os códigos
+    df_renomeado['produto'] = transformar_categorias(
+        df_renomeado['produto'], lambda valores: valores.str.upper().str.strip()
+    )
+    df_renomeado['estado'] = transformar_categorias(
+        df_renomeado['estado'], lambda valores: valores.str.upper().str.strip()
+    )
+    # O nome do município fica como veio: o DatabaseManager o troca pelo id e
+    # pelo nome canônico, uma vez por (município, UF) distinto
+    df_renomeado['municipio'] = transformar_categorias(
+        df_renomeado['municipio'], lambda valores: valores.str.strip()
+    )
+    
+    if 'revenda' in df_renomeado.columns:
+        df_renomeado['revenda'] = transformar_categorias(
+            df_renomeado['revenda'], lambda valores: valores.str.upper().str.strip()
+        )
+    relatorio['datas_invalidas'] = 0
+    if 'data_coleta' in df_renomeado.columns:
+        coleta = df_renomeado['data_coleta'].astype('category')
+        df_renomeado['data_coleta'] = transformar_categorias(
+            coleta,
+            lambda valores: pd.to_datetime(valores, dayfirst=True, errors='coerce').dt.strftime("%Y-%m-%d"),
+        )
+        # Data preenchida que não é data: a linha é descartada (e contada), não
+        # redatada pela importação
+        preenchidas = (pd.Series(coleta.cat.categories.astype(str)).str.strip() != '').to_numpy()
+        codigos = coleta.cat.codes.to_numpy()
+        invalidas = (codigos >= 0) & preenchidas[codigos] & df_renomeado['data_coleta'].isna().to_numpy()
+        relatorio['datas_invalidas'] = int(invalidas.sum())
+        df_renomeado = df_renomeado[~invalidas]
+    
+    # Filtrar combustíveis
+    produtos = df_renomeado['produto'].cat
+    categorias_validas = produtos.categories.isin(COMBUSTIVEIS_PRINCIPAIS)
+    codigos = produtos.codes.to_numpy()
+    mask = (codigos >= 0) & categorias_validas[codigos]
+    df_filtrado = df_renomeado[mask].copy()
+    df_filtrado['produto'] = df_filtrado['produto'].cat.remove_unused_categories()
+    relatorio['combustiveis_filtrados'] = len(df_filtrado)
+    
+    # Timestamp
+    df_filtrado['data_importacao'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    
+    return df_filtrado
+
+
+def mensagem_importacao(novos, validos, datas_invalidas=0):
+    mensagem = f"✅ {novos} registros importados com sucesso!"
+    if validos > novos:
+        mensagem += f" ({validos - novos} já existentes foram ignorados)"
+    if datas_invalidas:
+        mensagem += f" ⚠️ {datas_invalidas} linha(s) com data de coleta inválida descartada(s)"
+    return mensagem
+
+
+# ========== IMPORTADOR ==========
+class ImportadorANP:
+    """Importa um arquivo da ANP (CSV ou XLSX) para o DatabaseManager.
+    
+    Não depende do Streamlit: a interface acompanha o processo pelos
+    callbacks ao_detectar(df_bruto, colunas, dialeto) e ao_progredir(resultado).
+    """
+    
+    def __init__(self, db_manager, tamanho_bloco=TAMANHO_BLOCO_ANP):
+        self.db_manager = db_manager
+        self.tamanho_bloco = tamanho_bloco
+    
+    def importar(self, arquivo, nome=None, streaming=True, ao_detectar=None, ao_progredir=None):
+        """arquivo: caminho ou arquivo binário aberto (ex.: upload do Streamlit)"""
+        if isinstance(arquivo, (str, os.PathLike)):
+            with open(arquivo, 'rb') as aberto:
+                return self.importar(aberto, nome or os.path.basename(arquivo), streaming, ao_detectar, ao_progredir)
+        
+        nome = nome or getattr(arquivo, 'name', 'arquivo')
+        resultado = {
+            'arquivo': nome, 'sucesso': False, 'mensagem': '', 'dialeto': None, 'colunas': {},
+            'linhas_lidas': 0, 'registros': 0, 'novos': 0, 'segundos': 0.0, 'ja_importado': False,
+        }
+        inicio = time.perf_counter()
+        try:
+            self._importar(arquivo, nome, streaming, resultado, inicio, ao_detectar, ao_progredir)
+        except Exception as e:
+            resultado['sucesso'] = False
+            resultado['mensagem'] = f"❌ Erro ao processar arquivo: {str(e)}"
+        resultado['segundos'] = time.perf_counter() - inicio
+        return resultado
+    
+    def _importar(self, arquivo, nome, streaming, resultado, inicio, ao_detectar, ao_progredir):
+        hash_arquivo = hash_conteudo(arquivo)
+        importacao = self.db_manager.buscar_importacao(hash_arquivo)
+        if importacao is not None:
+            resultado.update(sucesso=True, ja_importado=True, mensagem=(
+                f"⏭️ Arquivo idêntico já importado em {importacao['data_importacao']} "
+                f"({importacao['registros']} registros). Nada a importar."
+            ))
+            return
+        
+        extensao = nome.lower().rsplit('.', 1)[-1]
+        if extensao == 'csv':
+            resultado['dialeto'] = detectar_dialeto_csv(arquivo)
+            if streaming:
+                blocos = iterar_blocos_csv(arquivo, resultado['dialeto'], self.tamanho_bloco)
+            else:
+                blocos = [ler_csv(arquivo, resultado['dialeto'])]
+        elif extensao == 'xlsx':
+            if streaming:
+                blocos = iterar_blocos_xlsx(arquivo, self.tamanho_bloco)
+            else:
+                arquivo.seek(0)
+                blocos = [pd.read_excel(arquivo)]
+        else:
+            resultado['mensagem'] = "Formato não suportado. Use CSV ou XLSX."
+            return
+        
+        data_importacao = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        colunas_detectadas = None
+        for bloco in blocos:
+            if colunas_detectadas is None:
+                colunas_detectadas = resolver_colunas_anp(bloco.columns)
+                resultado['colunas'] = colunas_detectadas
+                if ao_detectar is not None:
+                    ao_detectar(bloco, colunas_detectadas, resultado['dialeto'])
+                if not colunas_detectadas:
+                    resultado['mensagem'] = "Nenhuma coluna da ANP reconhecida no arquivo."
+                    return
+            
+            relatorio = {}
+            df_limpo = limpar_dados_anp(bloco, colunas_detectadas, relatorio)
+            for etapa in ('precos_convertidos', 'datas_invalidas', 'combustiveis_filtrados'):
+                resultado[etapa] = resultado.get(etapa, 0) + relatorio[etapa]
+            if not df_limpo.empty:
+                resultado['novos'] += self.db_manager.salvar_precos_anp(df_limpo, data_importacao=data_importacao)
+            
+            resultado['linhas_lidas'] += len(bloco)
+            resultado['registros'] += len(df_limpo)
+            resultado['segundos'] = time.perf_counter() - inicio
+            resultado['fracao_lida'] = fracao_lida(arquivo)
+            if ao_progredir is not None:
+                ao_progredir(resultado)
+        
+        if resultado['registros'] == 0:
+            resultado['mensagem'] = (
+                "Arquivo vazio ou não pôde ser lido." if resultado['linhas_lidas'] == 0
+                else "Nenhum dado válido encontrado. Verifique o formato."
+            )
+            return
+        
+        self.db_manager.registrar_importacao(hash_arquivo, nome, resultado['novos'], data_importacao)
+        resultado['sucesso'] = True
+        resultado['mensagem'] = mensagem_importacao(
+            resultado['novos'], resultado['registros'], resultado.get('datas_invalidas', 0)
+        )
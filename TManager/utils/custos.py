@@ -0,0 +1,159 @@
+# custos.py - custo de viagens em lote (manifesto CSV/XLSX), sem Streamlit
+#
+# Uma única passada vetorizada: o manifesto é cruzado com o cadastro de veículos
+# (consumo, combustível), com o índice de preços da ANP (município -> estado ->
+# Brasil, como em DatabaseManager.consultar_preco) e, quando falta km, com a
+# calculadora de distâncias.
+import io
+
+import numpy as np
+import pandas as pd
+
+from .anp_import import converter_numeros_br, detectar_dialeto_csv, ler_csv, normalizar_nome_coluna
+from .database import PRODUTOS_POR_COMBUSTIVEL
+from .distancias import chave_municipio
+
+# Cabeçalhos aceitos no manifesto (comparados sem acentos e em maiúsculas)
+ALIASES_COLUNAS_VIAGENS = {
+    'placa': ['PLACA', 'VEICULO'],
+    'origem': ['ORIGEM', 'MUNICIPIO ORIGEM', 'CIDADE ORIGEM'],
+    'uf_origem': ['UF ORIGEM', 'UF_ORIGEM', 'ESTADO ORIGEM'],
+    'destino': ['DESTINO', 'MUNICIPIO DESTINO', 'CIDADE DESTINO'],
+    'uf_destino': ['UF DESTINO', 'UF_DESTINO', 'ESTADO DESTINO'],
+    'km': ['KM', 'DISTANCIA', 'DISTANCIA (KM)', 'DISTANCIA KM'],
+    'pedagios': ['PEDAGIOS', 'PEDAGIO', 'PEDAGIOS (R$)'],
+}
+COLUNAS_OBRIGATORIAS_VIAGENS = ['placa', 'origem', 'destino']
+# Ordem das colunas no resultado; colunas extras do manifesto vêm depois
+COLUNAS_CUSTO_VIAGENS = [
+    'placa', 'origem', 'uf_origem', 'destino', 'uf_destino', 'km', 'km_estimado', 'pedagios',
+    'combustivel', 'consumo', 'litros', 'preco_litro', 'referencia_preco',
+    'custo_combustivel', 'custo_total', 'situacao',
+]
+
+
+def ler_manifesto(arquivo, nome=None):
+    """Lê o manifesto de viagens (CSV com dialeto detectado ou XLSX) e padroniza os cabeçalhos"""
+    nome = (nome or getattr(arquivo, 'name', '')).lower()
+    if isinstance(arquivo, str):
+        with open(arquivo, 'rb') as origem:
+            arquivo = io.BytesIO(origem.read())
+    if nome.endswith('.xlsx'):
+        viagens = pd.read_excel(arquivo, dtype=str)
+    else:
+        viagens = ler_csv(arquivo, detectar_dialeto_csv(arquivo))
+
+    aliases = {
+        normalizar_nome_coluna(alias): padrao
+        for padrao, nomes in ALIASES_COLUNAS_VIAGENS.items() for alias in nomes
+    }
+    viagens = viagens.rename(columns=lambda coluna: aliases.get(normalizar_nome_coluna(coluna), coluna))
+    faltando = [coluna for coluna in COLUNAS_OBRIGATORIAS_VIAGENS if coluna not in viagens.columns]
+    if faltando:
+        raise ValueError(f"Colunas obrigatórias ausentes no manifesto: {', '.join(faltando)}")
+    return viagens
+
+
+def separar_uf(municipios, ufs=None):
+    """Aceita 'Campinas/SP' ou 'Campinas - SP' quando a UF não vem em coluna própria"""
+    texto = pd.Series(municipios, dtype=object).fillna('').astype(str)
+    partes = texto.str.extract(r'^\s*(.*?)\s*[/-]\s*([A-Za-z]{2})\s*$')
+    uf_no_nome = partes[1].str.upper()
+    ufs = pd.Series(ufs, index=texto.index, dtype=object) if ufs is not None else pd.Series(np.nan, index=texto.index)
+    ufs = ufs.fillna(uf_no_nome).fillna('').astype(str).str.upper().str.strip()
+    return partes[0].fillna(texto).str.strip(), ufs
+
+
+def precos_por_combustivel(indice_precos):
+    """Uma linha por (combustível, estado, chave do município) com o produto ANP
+    preferido disponível (ordem de PRODUTOS_POR_COMBUSTIVEL)"""
+    preferencias = pd.DataFrame(
+        [(combustivel, produto, ordem)
+         for combustivel, produtos in PRODUTOS_POR_COMBUSTIVEL.items()
+         for ordem, produto in enumerate(produtos)],
+        columns=['combustivel', 'produto', 'ordem'],
+    )
+    precos = indice_precos.merge(preferencias, on='produto')
+    precos['chave'] = chave_municipio(precos['municipio'])
+    precos = precos.sort_values('ordem', kind='stable').drop_duplicates(['combustivel', 'estado', 'chave'])
+    return precos[['combustivel', 'estado', 'chave', 'produto', 'mediana', 'minimo']]
+
+
+def preco_por_local(combustiveis, ufs, chaves, precos, coluna='mediana'):
+    """Preço (mediana ou minimo) de cada local, tentando município, estado e Brasil;
+    retorna (preço, nível)"""
+    consulta = pd.DataFrame({'combustivel': combustiveis, 'estado': ufs, 'chave': chaves})
+    preco = pd.Series(np.nan, index=consulta.index)
+    nivel = pd.Series(None, index=consulta.index, dtype=object)
+    for rotulo, colunas_vazias in [('município', []), ('estado', ['chave']), ('Brasil', ['estado', 'chave'])]:
+        busca = consulta.assign(**{coluna: '' for coluna in colunas_vazias})
+        encontrados = busca.merge(precos, on=['combustivel', 'estado', 'chave'], how='left')[coluna]
+        encontrados.index = consulta.index
+        # Sem UF ou município informado o nível não se aplica (evita rotular o Brasil como município)
+        informados = (consulta[['estado', 'chave']].drop(columns=colunas_vazias) != '').all(axis=1)
+        novos = preco.isna() & encontrados.notna() & informados
+        preco[novos] = encontrados[novos]
+        nivel[novos] = rotulo
+    return preco, nivel
+
+
+def calcular_custos_viagens(viagens, veiculos, indice_precos, calculadora=None):
+    """Custo de cada viagem do manifesto, em uma passada.
+
+    viagens: placa, origem, destino e, opcionais, uf_origem, uf_destino, km, pedagios.
+    Sem km, a distância vem da calculadora (se informada). O preço por litro é a
+    média das medianas ANP na origem e no destino para o combustível do veículo.
+    A coluna 'situacao' explica as viagens que ficaram sem custo.
+    """
+    resultado = viagens.copy()
+    resultado['placa'] = resultado['placa'].astype(str).str.upper().str.strip()
+    resultado['origem'], uf_origem = separar_uf(resultado['origem'], resultado.get('uf_origem'))
+    resultado['destino'], uf_destino = separar_uf(resultado['destino'], resultado.get('uf_destino'))
+    resultado['uf_origem'], resultado['uf_destino'] = uf_origem, uf_destino
+    resultado['km'] = converter_numeros_br(resultado['km']) if 'km' in resultado.columns else np.nan
+    resultado['pedagios'] = (
+        converter_numeros_br(resultado['pedagios']).fillna(0.0) if 'pedagios' in resultado.columns else 0.0
+    )
+
+    # Veículos: placa -> consumo, combustível
+    frota = veiculos[['placa', 'consumo', 'combustivel']].copy() if not veiculos.empty else pd.DataFrame(
+        columns=['placa', 'consumo', 'combustivel']
+    )
+    frota['placa'] = frota['placa'].astype(str).str.upper().str.strip()
+    frota['consumo'] = pd.to_numeric(frota['consumo'], errors='coerce')
+    frota = frota.drop_duplicates('placa', keep='last').set_index('placa')
+    resultado['consumo'] = resultado['placa'].map(frota['consumo'])
+    resultado['combustivel'] = resultado['placa'].map(frota['combustivel'])
+
+    # Distância: a do manifesto tem precedência sobre a estimada
+    resultado['km_estimado'] = False
+    sem_km = resultado['km'].isna()
+    if calculadora is not None and sem_km.any():
+        resultado.loc[sem_km, 'km'] = calculadora.distancias_por_nome(
+            resultado.loc[sem_km, 'origem'], resultado.loc[sem_km, 'uf_origem'],
+            resultado.loc[sem_km, 'destino'], resultado.loc[sem_km, 'uf_destino'],
+        )
+        resultado.loc[sem_km, 'km_estimado'] = resultado.loc[sem_km, 'km'].notna()
+
+    # Preço: média das medianas da origem e do destino disponíveis
+    precos = precos_por_combustivel(indice_precos)
+    preco_origem, nivel_origem = preco_por_local(
+        resultado['combustivel'], uf_origem, chave_municipio(resultado['origem']), precos
+    )
+    preco_destino, nivel_destino = preco_por_local(
+        resultado['combustivel'], uf_destino, chave_municipio(resultado['destino']), precos
+    )
+    resultado['preco_litro'] = pd.concat([preco_origem, preco_destino], axis=1).mean(axis=1).round(3)
+    resultado['referencia_preco'] = nivel_origem.fillna('-') + " / " + nivel_destino.fillna('-')
+
+    resultado['litros'] = (resultado['km'] / resultado['consumo']).round(2)
+    resultado['custo_combustivel'] = (resultado['litros'] * resultado['preco_litro']).round(2)
+    resultado['custo_total'] = (resultado['custo_combustivel'] + resultado['pedagios']).round(2)
+
+    situacao = pd.Series('ok', index=resultado.index, dtype=object)
+    situacao[resultado['preco_litro'].isna()] = 'sem preço ANP para o combustível'
+    situacao[resultado['km'].isna()] = 'sem km (município não localizado)'
+    situacao[resultado['consumo'].isna()] = 'placa não cadastrada ou sem consumo'
+    resultado['situacao'] = situacao
+    extras = [coluna for coluna in resultado.columns if coluna not in COLUNAS_CUSTO_VIAGENS]
+    return resultado[COLUNAS_CUSTO_VIAGENS + extras]
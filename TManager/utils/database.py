@@ -0,0 +1,1793 @@
+# utils/database.py - armazenamento do T-Manager (sem dependência do Streamlit)
+import os
+import uuid
+import shutil
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from .distancias import caminho_municipios, carregar_municipios, chave_municipio
+from .documentos import motivo_documentos, somente_digitos
+
+# Histórico ANP em Parquet particionado por semana de importação e produto.
+# O município é gravado como id da tabela municipios (nome canônico no SQLite)
+SCHEMA_PRECOS_ANP = pa.schema([
+    ('estado', pa.string()),
+    ('id_municipio', pa.int32()),
+    ('preco', pa.float64()),
+    ('bairro', pa.string()),
+    ('endereco', pa.string()),
+    ('revenda', pa.string()),
+    ('data_coleta', pa.string()),
+    ('data_importacao', pa.string()),
+    ('semana', pa.string()),
+    ('produto', pa.string()),
+])
+# Colunas devolvidas nas leituras do histórico, com o nome canônico do município
+COLUNAS_PRECOS_ANP = ['municipio' if c == 'id_municipio' else c for c in SCHEMA_PRECOS_ANP.names]
+# Chave natural de um registro de preço (deduplicação entre importações)
+CHAVE_NATURAL_PRECOS = ['produto', 'estado', 'id_municipio', 'revenda', 'data_coleta']
+# Linhas por lote ao converter o histórico antigo (município em texto) para ids
+TAMANHO_LOTE_MIGRACAO = 500_000
+# Linhas por bloco nas agregações em streaming do histórico e do livro de custos
+TAMANHO_BLOCO_LEITURA = 500_000
+# Blocos agregados acumulados antes de serem consolidados (memória limitada aos grupos)
+PARCIAIS_POR_CONSOLIDACAO = 8
+# Lotes lidos à frente do que está sendo agregado (limita a memória da varredura)
+LOTES_ANTECIPADOS = 2
+# Granularidade do resumo materializado de preços
+COLUNAS_RESUMO_PRECOS = ['produto', 'estado', 'municipio', 'semana']
+# Produtos ANP que atendem cada combustível do cadastro de veículos, em ordem de preferência
+PRODUTOS_POR_COMBUSTIVEL = {
+    'Diesel': ['DIESEL S10', 'ÓLEO DIESEL', 'DIESEL', 'DIESEL S500'],
+    'Gasolina': ['GASOLINA COMUM', 'GASOLINA', 'GASOLINA C', 'GASOLINA ADITIVADA'],
+    'Álcool': ['ETANOL', 'ETANOL HIDRATADO'],
+}
+# Categorias do livro de custos: valor gravado -> rótulo exibido
+CATEGORIAS_CUSTO = {'combustivel': 'Combustível', 'manutencao': 'Manutenção', 'pedagio': 'Pedágio'}
+COLUNAS_CUSTOS = ['data', 'placa', 'categoria', 'valor', 'litros', 'descricao', 'data_registro']
+# Resumos mantidos na importação: tabela -> período da coleta que ela agrega
+RESUMOS_PRECOS = {'resumo_precos': 'semana', 'resumo_precos_mensal': 'mes'}
+PARTICIONAMENTO_PRECOS_ANP = ds.partitioning(
+    pa.schema([('semana', pa.string()), ('produto', pa.string())]),
+    flavor="hive",
+)
+# Telemetria (abastecimentos e leituras de hodômetro): Parquet só de anexação,
+# particionado por placa e mês do evento
+SCHEMA_TELEMETRIA = pa.schema([
+    ('data', pa.timestamp('s')),
+    ('odometro', pa.float64()),
+    ('litros', pa.float64()),
+    ('valor', pa.float64()),
+    ('produto', pa.string()),
+    ('municipio', pa.string()),
+    ('estado', pa.string()),
+    ('origem', pa.string()),
+    ('data_importacao', pa.string()),
+    ('placa', pa.string()),
+    ('mes', pa.string()),
+])
+CHAVE_NATURAL_TELEMETRIA = ['placa', 'data', 'odometro', 'litros']
+PARTICIONAMENTO_TELEMETRIA = ds.partitioning(
+    pa.schema([('placa', pa.string()), ('mes', pa.string())]),
+    flavor="hive",
+)
+# Estatísticas por veículo pré-calculadas a cada ingestão de telemetria
+COLUNAS_DESEMPENHO = [
+    'placa', 'km_l', 'km_l_recente', 'km_l_mediana', 'km_monitorado', 'litros', 'valor',
+    'abastecimentos', 'ultimo_odometro', 'primeiro_evento', 'ultimo_evento', 'atualizado_em',
+    'km_medido', 'litros_medidos', 'inicio_janela',
+]
+COLUNAS_PREVISOES = [
+    'produto', 'estado', 'municipio', 'semana', 'horizonte', 'previsao', 'inferior', 'superior',
+    'modelo', 'erro_medio', 'ultimo_preco',
+]
+
+class DatabaseManager:
+    def __init__(self, data_dir="data"):
+        self.data_dir = data_dir
+        self._criar_diretorio()
+        # Formatos antigos do histórico são convertidos antes de qualquer leitura
+        self._migrar_csv_precos()
+        self._migrar_municipios_precos()
+        self._migrar_chaves_postos()
+        self._migrar_indice_motoristas()
+        self._migrar_desempenho_incremental()
+    
+    def _criar_diretorio(self):
+        if not os.path.exists(self.data_dir):
+            os.makedirs(self.data_dir)
+    
+    def salvar_veiculo(self, dados_veiculo):
+        arquivo = f"{self.data_dir}/veiculos.csv"
+        novo_veiculo = pd.DataFrame([dados_veiculo])
+        
+        with self._transacao(imediata=True) as conn:
+            self._sincronizar_indice_placas(conn, arquivo)
+            try:
+                # A chave primária do índice garante a unicidade sem ler o CSV
+                conn.execute("INSERT INTO indice_placas (placa) VALUES (?)", (dados_veiculo['placa'],))
+            except sqlite3.IntegrityError:
+                return False, "Placa já cadastrada"
+            
+            self._anexar_csv(arquivo, novo_veiculo)
+            self._registrar_assinatura(conn, arquivo)
+            self._incrementar_versao(conn)
+        return True, "Veículo salvo com sucesso"
+    
+    def salvar_motoristas(self, df_motoristas):
+        """Acrescenta motoristas ao data/motoristas.csv com CPF e CNH únicos.
+        
+        df_motoristas já normalizado (nome, cpf, cnh, categoria_cnh, ...). A
+        unicidade vem do índice SQLite, sem ler o CSV. Retorna (gravados,
+        rejeitados), onde rejeitados traz a coluna 'motivo'.
+        """
+        arquivo = self.arquivo_motoristas
+        novos = df_motoristas.copy()
+        novos['cpf'] = somente_digitos(novos['cpf'], 11).to_numpy()
+        novos['cnh'] = somente_digitos(novos['cnh'], 11).to_numpy()
+        repetidos = novos['cpf'].duplicated() | novos['cnh'].duplicated()
+        
+        with self._transacao(imediata=True) as conn:
+            self._sincronizar_indice_motoristas(conn, arquivo)
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS documentos_lote (documento TEXT PRIMARY KEY)")
+            conn.execute("DELETE FROM documentos_lote")
+            conn.executemany(
+                "INSERT OR IGNORE INTO documentos_lote VALUES (?)",
+                ((documento,) for documento in pd.concat([novos['cpf'], novos['cnh']]).unique()),
+            )
+            cpfs = {linha[0] for linha in conn.execute(
+                "SELECT cpf FROM indice_motoristas JOIN documentos_lote ON documento = cpf"
+            )}
+            cnhs = {linha[0] for linha in conn.execute(
+                "SELECT cnh FROM indice_motoristas JOIN documentos_lote ON documento = cnh"
+            )}
+            
+            motivo = pd.Series(None, index=novos.index, dtype=object)
+            motivo[repetidos] = "CPF ou CNH repetido no arquivo"
+            motivo[novos['cnh'].isin(cnhs)] = "CNH já cadastrada"
+            motivo[novos['cpf'].isin(cpfs)] = "CPF já cadastrado"
+            aceitos = novos[motivo.isna()]
+            if not aceitos.empty:
+                conn.executemany(
+                    "INSERT INTO indice_motoristas (cpf, cnh, nome, categoria_cnh) VALUES (?, ?, ?, ?)",
+                    aceitos[['cpf', 'cnh', 'nome', 'categoria_cnh']].itertuples(index=False, name=None),
+                )
+                self._anexar_csv(arquivo, aceitos)
+                self._registrar_assinatura(conn, arquivo)
+                self._incrementar_versao(conn)
+        return len(aceitos), novos[motivo.notna()].assign(motivo=motivo[motivo.notna()])
+    
+    def buscar_motoristas(self, cpf=None, cnh=None, categorias=None, invalidos=False):
+        """Consulta pelo índice: por CPF, por CNH ou pelas categorias de CNH.
+        
+        Documentos em qualquer formato ("529.982.247-25"). invalidos=True traz só
+        os registros antigos do CSV com CPF ou CNH inválido, com o 'motivo'.
+        """
+        condicoes = ["motivo IS NOT NULL" if invalidos else "motivo IS NULL"]
+        parametros = []
+        for coluna, valor in (('cpf', cpf), ('cnh', cnh)):
+            if valor:
+                condicoes.append(f"{coluna} = ?")
+                parametros.append(somente_digitos([valor], 11).iloc[0])
+        if categorias:
+            condicoes.append(f"categoria_cnh IN ({', '.join('?' * len(categorias))})")
+            parametros.extend(categorias)
+        colunas = ['cpf', 'cnh', 'nome', 'categoria_cnh'] + (['motivo'] if invalidos else [])
+        with self._transacao() as conn:
+            self._sincronizar_indice_motoristas(conn, self.arquivo_motoristas)
+            registros = conn.execute(
+                f"SELECT {', '.join(colunas)} FROM indice_motoristas "
+                f"WHERE {' AND '.join(condicoes)} ORDER BY nome", parametros
+            ).fetchall()
+        return pd.DataFrame(registros, columns=colunas)
+    
+    def carregar_motoristas(self):
+        arquivo = self.arquivo_motoristas
+        if os.path.exists(arquivo):
+            # Documentos como texto: preserva zeros à esquerda
+            return pd.read_csv(arquivo, dtype={'cpf': str, 'cnh': str, 'telefone': str})
+        return pd.DataFrame()
+    
+    @property
+    def arquivo_motoristas(self):
+        return f"{self.data_dir}/motoristas.csv"
+    
+    def registrar_custos(self, df_custos):
+        """Acrescenta lançamentos ao livro de custos (data/custos.csv, só anexação).
+        
+        df_custos: data, placa, categoria (chave de CATEGORIAS_CUSTO), valor e,
+        opcionais, litros e descricao. Correções entram como novos lançamentos
+        (ex.: valor negativo). Os totais mensais por veículo e categoria são
+        atualizados na mesma transação. Retorna (quantidade gravada, erros).
+        """
+        arquivo = self.arquivo_custos
+        custos = df_custos.reindex(columns=COLUNAS_CUSTOS).copy()
+        custos['data'] = pd.to_datetime(custos['data'], errors='coerce', dayfirst=True).dt.strftime("%Y-%m-%d")
+        custos['placa'] = custos['placa'].astype(str).str.upper().str.strip()
+        custos['categoria'] = custos['categoria'].astype(str).str.lower().str.strip()
+        custos['valor'] = pd.to_numeric(custos['valor'], errors='coerce')
+        custos['litros'] = pd.to_numeric(custos['litros'], errors='coerce')
+        custos['data_registro'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        
+        invalidos = custos['data'].isna() | custos['valor'].isna() | ~custos['categoria'].isin(list(CATEGORIAS_CUSTO))
+        erros = []
+        if invalidos.any():
+            erros.append(f"{int(invalidos.sum())} lançamento(s) ignorado(s): data, valor ou categoria inválidos")
+        custos = custos[~invalidos]
+        if custos.empty:
+            return 0, erros
+        
+        with self._transacao(imediata=True) as conn:
+            self._sincronizar_custos_mensais(conn, arquivo)
+            self._anexar_csv(arquivo, custos)
+            self._atualizar_custos_mensais(conn, custos)
+            self._registrar_assinatura(conn, arquivo)
+            self._incrementar_versao(conn)
+        return len(custos), erros
+    
+    def carregar_custos_mensais(self, placas=None, inicio=None, fim=None):
+        """Totais mensais (mes, placa, categoria, total, lancamentos) lidos do agregado.
+        
+        inicio/fim: 'YYYY-MM-01' inclusive. O custo não depende do tamanho do livro.
+        """
+        condicoes, parametros = [], []
+        if placas:
+            condicoes.append(f"placa IN ({', '.join('?' * len(placas))})")
+            parametros.extend(placas)
+        if inicio:
+            condicoes.append("mes >= ?")
+            parametros.append(str(inicio))
+        if fim:
+            condicoes.append("mes <= ?")
+            parametros.append(str(fim))
+        where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+        
+        with self._transacao() as conn:
+            self._sincronizar_custos_mensais(conn, self.arquivo_custos)
+            registros = conn.execute(
+                f"SELECT mes, placa, categoria, total, lancamentos FROM custos_mensais {where} "
+                "ORDER BY mes, placa, categoria",
+                parametros,
+            ).fetchall()
+        return pd.DataFrame(registros, columns=['mes', 'placa', 'categoria', 'total', 'lancamentos'])
+    
+    def custos_periodo(self, data_inicio=None, data_fim=None, placas=None, tamanho_bloco=TAMANHO_BLOCO_LEITURA):
+        """Totais (placa, categoria, total, litros, lancamentos) dos lançamentos entre as datas, inclusive.
+        
+        O livro é lido em blocos: só os totais por placa e categoria ficam em memória.
+        """
+        colunas = ['placa', 'categoria', 'total', 'litros', 'lancamentos']
+        arquivo = self.arquivo_custos
+        if not os.path.exists(arquivo):
+            return pd.DataFrame(columns=colunas)
+        
+        parciais = []
+        blocos = pd.read_csv(
+            arquivo, usecols=['data', 'placa', 'categoria', 'valor', 'litros'],
+            dtype={'data': str, 'placa': str, 'categoria': str}, chunksize=tamanho_bloco,
+        )
+        for bloco in blocos:
+            selecionados = pd.Series(True, index=bloco.index)
+            if data_inicio is not None:
+                selecionados &= bloco['data'] >= pd.Timestamp(data_inicio).strftime("%Y-%m-%d")
+            if data_fim is not None:
+                selecionados &= bloco['data'] <= pd.Timestamp(data_fim).strftime("%Y-%m-%d")
+            if placas:
+                selecionados &= bloco['placa'].isin(list(placas))
+            bloco = bloco[selecionados]
+            if not bloco.empty:
+                parciais.append(bloco.groupby(['placa', 'categoria'], as_index=False).agg(
+                    total=('valor', 'sum'), litros=('litros', 'sum'), lancamentos=('valor', 'size'),
+                ))
+        if not parciais:
+            return pd.DataFrame(columns=colunas)
+        return pd.concat(parciais, ignore_index=True).groupby(['placa', 'categoria'], as_index=False).agg(
+            total=('total', 'sum'), litros=('litros', 'sum'), lancamentos=('lancamentos', 'sum'),
+        )[colunas]
+    
+    def carregar_lancamentos_custos(self):
+        arquivo = self.arquivo_custos
+        if os.path.exists(arquivo):
+            return pd.read_csv(arquivo, dtype={'placa': str, 'descricao': str})
+        return pd.DataFrame(columns=COLUNAS_CUSTOS)
+    
+    @property
+    def arquivo_custos(self):
+        return f"{self.data_dir}/custos.csv"
+    
+    def salvar_posto(self, dados_posto, precos):
+        """Cadastra (ou reencontra) o posto e anexa os preços informados ao histórico.
+        
+        dados_posto: nome, municipio, estado e, opcionais, endereco e bairro.
+        precos: {produto: preço}. Retorna (sucesso, mensagem).
+        """
+        precos = {produto: float(preco) for produto, preco in precos.items() if preco and preco > 0}
+        # Carimbo completo: várias atualizações no mesmo dia ficam todas no histórico
+        agora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        linhas = pd.DataFrame([
+            {**dados_posto, 'revenda': dados_posto.get('nome'), 'produto': produto, 'preco': preco,
+             'data_coleta': agora}
+            for produto, preco in (precos.items() if precos else [(None, np.nan)])
+        ])
+        with self._transacao(imediata=True) as conn:
+            self._garantir_postos(conn)
+            self._atualizar_postos(conn, linhas, origem='manual')
+            self._incrementar_versao(conn)
+        return True, f"Posto '{dados_posto.get('nome')}' salvo com {len(precos)} preço(s)"
+    
+    def postos_mais_baratos(self, estado, municipio, produtos, limite=5):
+        """Postos com o menor preço atual no município para os produtos dados
+        (lista, ex.: PRODUTOS_POR_COMBUSTIVEL['Diesel']); busca direta no índice
+        (estado, município, produto, preço)."""
+        marcadores = ', '.join('?' * len(produtos))
+        with self._transacao() as conn:
+            self._garantir_postos(conn)
+            registros = conn.execute(
+                "SELECT p.id, p.nome, p.endereco, p.bairro, p.municipio, p.estado, a.produto, a.preco, a.data "
+                "FROM precos_atuais_postos a JOIN postos p ON p.id = a.id_posto "
+                f"WHERE a.estado = ? AND a.chave_municipio = ? AND a.produto IN ({marcadores}) "
+                "ORDER BY a.preco LIMIT ?",
+                ((estado or '').upper().strip(), chave_municipio([municipio])[0], *produtos, int(limite)),
+            ).fetchall()
+        return pd.DataFrame(
+            registros,
+            columns=['id', 'nome', 'endereco', 'bairro', 'municipio', 'estado', 'produto', 'preco', 'data'],
+        )
+    
+    def carregar_postos(self, estado=None, municipio=None):
+        """Postos com o preço atual de cada produto (uma linha por posto e produto)"""
+        condicoes, parametros = [], []
+        if estado:
+            condicoes.append("p.estado = ?")
+            parametros.append(estado.upper().strip())
+        if municipio:
+            condicoes.append("p.chave_municipio = ?")
+            parametros.append(chave_municipio([municipio])[0])
+        where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+        with self._transacao() as conn:
+            self._garantir_postos(conn)
+            registros = conn.execute(
+                "SELECT p.id, p.nome, p.endereco, p.bairro, p.municipio, p.estado, p.origem, "
+                "a.produto, a.preco, a.data FROM postos p "
+                f"LEFT JOIN precos_atuais_postos a ON a.id_posto = p.id {where} ORDER BY p.nome, a.produto",
+                parametros,
+            ).fetchall()
+        return pd.DataFrame(
+            registros,
+            columns=['id', 'nome', 'endereco', 'bairro', 'municipio', 'estado', 'origem', 'produto', 'preco', 'data'],
+        )
+    
+    def historico_posto(self, id_posto):
+        with self._transacao() as conn:
+            registros = conn.execute(
+                "SELECT produto, preco, data, origem FROM historico_precos_postos "
+                "WHERE id_posto = ? ORDER BY produto, data",
+                (int(id_posto),),
+            ).fetchall()
+        return pd.DataFrame(registros, columns=['produto', 'preco', 'data', 'origem'])
+    
+    def carregar_veiculos(self):
+        arquivo = f"{self.data_dir}/veiculos.csv"
+        if os.path.exists(arquivo):
+            return pd.read_csv(arquivo)
+        else:
+            return pd.DataFrame()
+    
+    def salvar_precos_anp(self, df_precos, data_importacao=None):
+        """Grava a importação como novas partições (semana, produto) do histórico
+        
+        data_importacao permite que todos os blocos de uma mesma importação
+        compartilhem o mesmo carimbo de tempo.
+        """
+        df_precos['data_importacao'] = data_importacao or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        # Variações do mesmo município passam a ter um só id e um só nome
+        locais = df_precos.reindex(columns=['estado', 'municipio'])
+        df_precos['id_municipio'], df_precos['municipio'] = self.ids_municipios(locais['estado'], locais['municipio'])
+        
+        chaves = self._chaves_naturais(df_precos)
+        arquivos = []
+        try:
+            with self._transacao(imediata=True) as conn:
+                self._garantir_chaves_precos(conn)
+                self._garantir_resumo_precos(conn)
+                self._garantir_indice_precos(conn)
+                self._garantir_postos(conn)
+                # Anti-join pelo índice de chaves: só o lote é percorrido, não o histórico
+                conn.execute("CREATE TEMP TABLE IF NOT EXISTS chaves_lote (chave INTEGER PRIMARY KEY)")
+                conn.execute("DELETE FROM chaves_lote")
+                conn.executemany(
+                    "INSERT OR IGNORE INTO chaves_lote (chave) VALUES (?)",
+                    ((chave,) for chave in chaves.unique().tolist()),
+                )
+                chaves_novas = [linha[0] for linha in conn.execute(
+                    "SELECT chave FROM chaves_lote "
+                    "WHERE NOT EXISTS (SELECT 1 FROM chaves_precos c WHERE c.chave = chaves_lote.chave)"
+                )]
+                
+                novos = chaves.isin(chaves_novas) & ~chaves.duplicated()
+                if novos.any():
+                    df_novos = df_precos[novos.to_numpy()]
+                    arquivos = self._gravar_particoes_precos(df_novos)
+                    conn.executemany(
+                        "INSERT INTO chaves_precos (chave) VALUES (?)",
+                        ((chave,) for chave in chaves_novas),
+                    )
+                    self._atualizar_resumo_precos(conn, df_novos)
+                    self._atualizar_indice_precos(conn, df_novos)
+                    self._atualizar_postos(conn, df_novos, origem='anp')
+                    self._incrementar_versao(conn)
+        except Exception:
+            # Partições de uma transação desfeita seriam lidas como histórico e o
+            # reenvio do arquivo as gravaria de novo: removidas antes de propagar o erro
+            self._remover_arquivos(arquivos)
+            raise
+        return int(novos.sum())
+    
+    def salvar_telemetria(self, df_eventos):
+        """Anexa os eventos de telemetria inéditos; retorna (novos, placas com eventos novos).
+        
+        df_eventos já normalizado (placa, data, odometro, litros, ...). Eventos
+        repetidos (mesma placa, data, hodômetro e litros) são descartados pelo
+        índice de chaves, como nos preços da ANP: reenviar um arquivo não duplica nada.
+        """
+        df = df_eventos.copy()
+        df['data_importacao'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        chaves = pd.util.hash_pandas_object(df[CHAVE_NATURAL_TELEMETRIA], index=False).astype('int64')
+        
+        arquivos = []
+        try:
+            with self._transacao(imediata=True) as conn:
+                conn.execute("CREATE TEMP TABLE IF NOT EXISTS chaves_lote (chave INTEGER PRIMARY KEY)")
+                conn.execute("DELETE FROM chaves_lote")
+                conn.executemany(
+                    "INSERT OR IGNORE INTO chaves_lote (chave) VALUES (?)",
+                    ((chave,) for chave in chaves.unique().tolist()),
+                )
+                chaves_novas = [linha[0] for linha in conn.execute(
+                    "SELECT chave FROM chaves_lote "
+                    "WHERE NOT EXISTS (SELECT 1 FROM chaves_telemetria c WHERE c.chave = chaves_lote.chave)"
+                )]
+                
+                novos = chaves.isin(chaves_novas) & ~chaves.duplicated()
+                if novos.any():
+                    arquivos = self._gravar_particoes_telemetria(df[novos.to_numpy()])
+                    conn.executemany(
+                        "INSERT INTO chaves_telemetria (chave) VALUES (?)",
+                        ((chave,) for chave in chaves_novas),
+                    )
+                    self._incrementar_versao(conn)
+        except Exception:
+            # Como nos preços: sem as chaves gravadas, os arquivos seriam duplicados no reenvio
+            self._remover_arquivos(arquivos)
+            raise
+        return int(novos.sum()), sorted(df.loc[novos.to_numpy(), 'placa'].unique())
+    
+    def carregar_telemetria(self, placas=None, colunas=None, inicio=None, fim=None):
+        """Lê os eventos de telemetria; filtros por placa e período descartam partições inteiras"""
+        if not os.path.exists(self.telemetria_dir):
+            # Vazio, mas com os tipos do esquema (data como datetime, medidas como float)
+            vazio = SCHEMA_TELEMETRIA.empty_table()
+            return (vazio.select(colunas) if colunas else vazio).to_pandas()
+        dataset = ds.dataset(
+            self.telemetria_dir, schema=SCHEMA_TELEMETRIA, format="parquet",
+            partitioning=PARTICIONAMENTO_TELEMETRIA,
+        )
+        expressao = self._expressao_filtros({'placa': list(placas)} if placas is not None else None)
+        condicoes = []
+        if inicio is not None:
+            inicio = pd.Timestamp(inicio)
+            condicoes += [ds.field('mes') >= inicio.strftime("%Y-%m"), ds.field('data') >= inicio]
+        if fim is not None:
+            limite = pd.Timestamp(fim) + pd.Timedelta(days=1)
+            condicoes += [ds.field('mes') <= pd.Timestamp(fim).strftime("%Y-%m"), ds.field('data') < limite]
+        for condicao in condicoes:
+            expressao = condicao if expressao is None else expressao & condicao
+        return dataset.to_table(columns=colunas, filter=expressao).to_pandas()
+    
+    def salvar_desempenho(self, df_desempenho):
+        """Substitui as estatísticas pré-calculadas das placas recebidas"""
+        df = df_desempenho.reindex(columns=COLUNAS_DESEMPENHO)
+        df = df.astype(object).where(df.notna(), None)
+        with self._transacao(imediata=True) as conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO desempenho_veiculos ({', '.join(COLUNAS_DESEMPENHO)}) "
+                f"VALUES ({', '.join('?' * len(COLUNAS_DESEMPENHO))})",
+                df.itertuples(index=False, name=None),
+            )
+            self._incrementar_versao(conn)
+    
+    def carregar_desempenho(self, placas=None):
+        """Estatísticas de consumo real por veículo (uma linha por placa)"""
+        consulta = f"SELECT {', '.join(COLUNAS_DESEMPENHO)} FROM desempenho_veiculos"
+        parametros = []
+        if placas:
+            consulta += f" WHERE placa IN ({', '.join('?' * len(placas))})"
+            parametros = list(placas)
+        with self._transacao() as conn:
+            return pd.read_sql_query(consulta + " ORDER BY placa", conn, params=parametros)
+    
+    @property
+    def telemetria_dir(self):
+        return f"{self.data_dir}/telemetria"
+    
+    def carregar_resumo_precos(self, agrupar_por=('produto',), filtros=None,
+                               periodo='semana', inicio=None, fim=None):
+        """Agrega o resumo materializado (n, soma, mínimo, máximo) pelas colunas pedidas.
+        
+        periodo escolhe o resumo semanal ('semana') ou mensal ('mes'); inicio/fim
+        limitam esse período. O custo depende do tamanho do resumo
+        (produto x local x período), não do histórico.
+        """
+        tabela = next(t for t, p in RESUMOS_PRECOS.items() if p == periodo)
+        colunas_validas = COLUNAS_RESUMO_PRECOS[:3] + [periodo]
+        colunas = [c for c in agrupar_por if c in colunas_validas]
+        condicoes, parametros = [], []
+        for coluna, valor in (filtros or {}).items():
+            if coluna not in colunas_validas:
+                continue
+            valores = list(valor) if isinstance(valor, (list, tuple, set)) else [valor]
+            condicoes.append(f"{coluna} IN ({', '.join('?' * len(valores))})")
+            parametros.extend(valores)
+        if inicio is not None:
+            condicoes.append(f"{periodo} >= ?")
+            parametros.append(self._inicio_periodo([inicio], periodo).iloc[0])
+        if fim is not None:
+            condicoes.append(f"{periodo} <= ?")
+            parametros.append(pd.Timestamp(fim).strftime("%Y-%m-%d"))
+        
+        selecao = ", ".join(colunas + ["SUM(n)", "SUM(soma)", "MIN(minimo)", "MAX(maximo)"])
+        sql = f"SELECT {selecao} FROM {tabela}"
+        if condicoes:
+            sql += " WHERE " + " AND ".join(condicoes)
+        if colunas:
+            sql += f" GROUP BY {', '.join(colunas)} ORDER BY {', '.join(colunas)}"
+        
+        with self._transacao() as conn:
+            self._garantir_resumo_precos(conn)
+            linhas = conn.execute(sql, parametros).fetchall()
+        
+        resumo = pd.DataFrame(linhas, columns=colunas + ['n', 'soma', 'minimo', 'maximo'])
+        resumo = resumo[resumo['n'].notna() & (resumo['n'] > 0)]
+        resumo['preco_medio'] = resumo['soma'] / resumo['n']
+        return resumo.reset_index(drop=True)
+    
+    def serie_precos(self, produtos, estados=None, por_estado=False,
+                     data_inicio=None, data_fim=None, max_pontos=120):
+        """Série de preço médio por período, pronta para gráfico.
+        
+        Usa o resumo semanal enquanto couber em max_pontos por série; acima
+        disso, o mensal, reagrupando meses consecutivos se ainda for preciso.
+        Retorna (DataFrame com a coluna 'periodo', descrição da granularidade).
+        """
+        filtros = {'produto': produtos}
+        if estados:
+            filtros['estado'] = estados
+        grupos = ['produto'] + (['estado'] if por_estado else [])
+        
+        for periodo in ('semana', 'mes'):
+            serie = self.carregar_resumo_precos(grupos + [periodo], filtros, periodo, data_inicio, data_fim)
+            total_periodos = serie[periodo].nunique()
+            if total_periodos <= max_pontos:
+                break
+        serie = serie.rename(columns={periodo: 'periodo'})
+        descricao = "semanal" if periodo == 'semana' else "mensal"
+        
+        if total_periodos > max_pontos:
+            passo = -(-total_periodos // max_pontos)
+            periodos = sorted(serie['periodo'].unique())
+            bloco = {p: periodos[i - i % passo] for i, p in enumerate(periodos)}
+            serie['periodo'] = serie['periodo'].map(bloco)
+            serie = serie.groupby(grupos + ['periodo'], as_index=False).agg(
+                n=('n', 'sum'), soma=('soma', 'sum'), minimo=('minimo', 'min'), maximo=('maximo', 'max')
+            )
+            serie['preco_medio'] = serie['soma'] / serie['n']
+            descricao = f"a cada {passo} meses"
+        
+        serie['periodo'] = pd.to_datetime(serie['periodo'])
+        return serie.sort_values(grupos + ['periodo']).reset_index(drop=True), descricao
+    
+    def consultar_preco(self, produtos, estado=None, municipio=None):
+        """Preços de referência (último, mediana e mínimo da semana mais recente).
+        
+        produtos é uma lista em ordem de preferência (ex.: PRODUTOS_POR_COMBUSTIVEL).
+        Procura no município, depois no estado e por fim no país; cada tentativa
+        é uma busca pela chave primária do índice. Retorna None se não houver dados.
+        """
+        estado = (estado or '').upper().strip()
+        municipio = (municipio or '').strip()
+        niveis = [('', '', 'Brasil')]
+        
+        with self._transacao() as conn:
+            if estado:
+                niveis.insert(0, (estado, '', 'estado'))
+                if municipio:
+                    # Qualquer grafia do município leva ao nome canônico do índice
+                    canonico = conn.execute(
+                        "SELECT nome FROM municipios WHERE estado = ? AND chave = ?",
+                        (estado, chave_municipio([municipio])[0]),
+                    ).fetchone()
+                    niveis.insert(0, (estado, canonico[0] if canonico else municipio.title(), 'município'))
+            self._garantir_indice_precos(conn)
+            for estado_busca, municipio_busca, nivel in niveis:
+                for produto in produtos:
+                    registro = conn.execute(
+                        "SELECT ultimo, data_ultimo, mediana, minimo, amostras, semana FROM indice_precos "
+                        "WHERE produto = ? AND estado = ? AND municipio = ?",
+                        (produto, estado_busca, municipio_busca),
+                    ).fetchone()
+                    if registro is not None:
+                        return {
+                            'produto': produto, 'nivel': nivel, 'ultimo': registro[0],
+                            'data_ultimo': registro[1], 'mediana': registro[2], 'minimo': registro[3],
+                            'amostras': registro[4], 'semana': registro[5],
+                        }
+        return None
+    
+    def carregar_indice_precos(self):
+        """Índice de consulta inteiro (uma linha por produto/estado/município) para
+        cruzamentos vetorizados; estado/municipio vazios são os níveis estado e Brasil"""
+        with self._transacao() as conn:
+            self._garantir_indice_precos(conn)
+            return pd.DataFrame(
+                conn.execute(
+                    "SELECT produto, estado, municipio, semana, ultimo, data_ultimo, mediana, minimo, amostras "
+                    "FROM indice_precos"
+                ).fetchall(),
+                columns=['produto', 'estado', 'municipio', 'semana', 'ultimo', 'data_ultimo',
+                         'mediana', 'minimo', 'amostras'],
+            )
+    
+    def assinatura_precos(self):
+        """Muda a cada importação da ANP com registros novos (e só nela)"""
+        with self._transacao() as conn:
+            self._garantir_resumo_precos(conn)
+            ultima = conn.execute("SELECT valor FROM meta WHERE chave = 'ultima_importacao_precos'").fetchone()
+            registros = conn.execute("SELECT COALESCE(SUM(n), 0) FROM resumo_precos").fetchone()[0]
+        return f"{ultima[0] if ultima else ''}|{registros}"
+    
+    def salvar_previsoes(self, nivel, assinatura, df_previsoes):
+        """Substitui as previsões de preço do nível, marcadas com a assinatura dos preços"""
+        df = df_previsoes.reindex(columns=COLUNAS_PREVISOES).copy()
+        df[['estado', 'municipio']] = df[['estado', 'municipio']].fillna('')
+        df = df.astype(object).where(df.notna(), None)
+        with self._transacao(imediata=True) as conn:
+            conn.execute("DELETE FROM previsoes_precos WHERE nivel = ?", (nivel,))
+            conn.executemany(
+                f"INSERT INTO previsoes_precos (nivel, {', '.join(COLUNAS_PREVISOES)}) "
+                f"VALUES (?, {', '.join('?' * len(COLUNAS_PREVISOES))})",
+                ((nivel, *linha) for linha in df.itertuples(index=False, name=None)),
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (chave, valor) VALUES (?, ?)", (f"previsoes:{nivel}", assinatura)
+            )
+    
+    def carregar_previsoes(self, nivel, assinatura, produtos=None):
+        """Previsões gravadas do nível; None se foram feitas antes da última importação"""
+        with self._transacao() as conn:
+            registro = conn.execute("SELECT valor FROM meta WHERE chave = ?", (f"previsoes:{nivel}",)).fetchone()
+            if registro is None or registro[0] != assinatura:
+                return None
+            consulta = f"SELECT {', '.join(COLUNAS_PREVISOES)} FROM previsoes_precos WHERE nivel = ?"
+            parametros = [nivel]
+            if produtos:
+                consulta += f" AND produto IN ({', '.join('?' * len(produtos))})"
+                parametros.extend(produtos)
+            return pd.read_sql_query(consulta, conn, params=parametros)
+    
+    def ultima_importacao_precos(self):
+        with self._transacao() as conn:
+            registro = conn.execute("SELECT valor FROM meta WHERE chave = 'ultima_importacao_precos'").fetchone()
+        return registro[0] if registro else None
+    
+    def buscar_importacao(self, hash_arquivo):
+        """Retorna a importação anterior de um arquivo com o mesmo conteúdo, se houver"""
+        with self._transacao() as conn:
+            registro = conn.execute(
+                "SELECT arquivo, registros, data_importacao FROM importacoes_anp WHERE hash = ?",
+                (hash_arquivo,),
+            ).fetchone()
+        if registro is None:
+            return None
+        return {'arquivo': registro[0], 'registros': registro[1], 'data_importacao': registro[2]}
+    
+    def registrar_importacao(self, hash_arquivo, nome_arquivo, registros, data_importacao):
+        with self._transacao() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO importacoes_anp (hash, arquivo, registros, data_importacao) "
+                "VALUES (?, ?, ?, ?)",
+                (hash_arquivo, nome_arquivo, int(registros), data_importacao),
+            )
+            self._incrementar_versao(conn)
+    
+    def versao_dados(self):
+        """Contador incrementado a cada gravação; usado como chave de invalidação de cache"""
+        with self._transacao() as conn:
+            registro = conn.execute("SELECT valor FROM meta WHERE chave = 'versao'").fetchone()
+        return int(registro[0]) if registro else 0
+    
+    def distancias_em_cache(self, origens, destinos):
+        """km gravados para cada par de municípios (em qualquer sentido); NaN se ausente"""
+        pares = self._pares_distancia(origens, destinos)
+        with self._transacao() as conn:
+            # Poucos municípios distintos mesmo com muitos pares: filtra pela origem
+            # (prefixo da chave primária) e cruza os pares no pandas
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS origens_consulta (origem INTEGER PRIMARY KEY)")
+            conn.execute("DELETE FROM origens_consulta")
+            conn.executemany(
+                "INSERT INTO origens_consulta VALUES (?)",
+                ((int(origem),) for origem in pares['origem'].unique()),
+            )
+            gravados = pd.DataFrame(
+                conn.execute(
+                    "SELECT d.origem, d.destino, d.km FROM origens_consulta o "
+                    "JOIN distancias d ON d.origem = o.origem"
+                ).fetchall(),
+                columns=['origem', 'destino', 'km'],
+            )
+        return pares.merge(gravados, on=['origem', 'destino'], how='left')['km'].to_numpy(dtype=float)
+    
+    def salvar_distancias(self, origens, destinos, km, fonte='estimada'):
+        """Grava distâncias por par de municípios; fonte='informada' para km medidos,
+        que não são sobrescritos por estimativas posteriores"""
+        pares = self._pares_distancia(origens, destinos)
+        pares['km'] = np.asarray(km, dtype=float)
+        pares = pares.dropna(subset=['km']).drop_duplicates(['origem', 'destino'], keep='last')
+        with self._transacao(imediata=True) as conn:
+            conn.executemany(
+                "INSERT INTO distancias (origem, destino, km, fonte) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (origem, destino) DO UPDATE SET km = excluded.km, fonte = excluded.fonte "
+                "WHERE excluded.fonte = 'informada' OR distancias.fonte <> 'informada'",
+                ((int(o), int(d), float(k), fonte) for o, d, k in pares.itertuples(index=False, name=None)),
+            )
+    
+    @staticmethod
+    def _pares_distancia(origens, destinos):
+        origens = np.asarray(origens, dtype=np.int64)
+        destinos = np.asarray(destinos, dtype=np.int64)
+        return pd.DataFrame({'origem': np.minimum(origens, destinos), 'destino': np.maximum(origens, destinos)})
+    
+    @staticmethod
+    def assinatura_arquivo(arquivo):
+        """(mtime, tamanho) do arquivo; muda também com edições feitas fora do sistema"""
+        if not os.path.exists(arquivo):
+            return None
+        estado = os.stat(arquivo)
+        return estado.st_mtime_ns, estado.st_size
+    
+    def carregar_precos_anp(self, colunas=None, filtros=None):
+        """Lê o histórico de preços lendo apenas as colunas e partições pedidas.
+        
+        filtros: dicionário {coluna: valor ou lista de valores}. Filtros em
+        'semana' e 'produto' descartam partições inteiras sem abri-las; em
+        'municipio' valem para todas as grafias do município.
+        """
+        dataset = self._dataset_precos()
+        if dataset is None:
+            return pd.DataFrame()
+        
+        tabela = dataset.to_table(
+            columns=self._colunas_armazenadas(colunas),
+            filter=self._expressao_filtros(self._filtros_armazenados(filtros)),
+        )
+        return self._decodificar_municipios(tabela, colunas)
+    
+    def consultar_precos(self, filtros=None, data_inicio=None, data_fim=None,
+                         ordenar_por=None, decrescente=False, pagina=1, tamanho_pagina=50):
+        """Retorna (página do histórico filtrado, total de linhas do filtro).
+        
+        Os filtros são aplicados no próprio Parquet (partições descartadas e
+        predicados por coluna); só as linhas da página são convertidas para pandas.
+        As datas filtram pela data de coleta, ou pela de importação quando ela falta.
+        """
+        dataset = self._dataset_precos()
+        if dataset is None:
+            return pd.DataFrame(), 0
+        
+        expressao = self._expressao_filtros(self._filtros_armazenados(filtros))
+        for condicao in self._expressao_periodo(data_inicio, data_fim):
+            expressao = condicao if expressao is None else expressao & condicao
+        
+        total = dataset.count_rows(filter=expressao)
+        inicio = max(pagina - 1, 0) * tamanho_pagina
+        fim = min(inicio + tamanho_pagina, total)
+        if inicio >= fim:
+            return pd.DataFrame(columns=COLUNAS_PRECOS_ANP), total
+        
+        if ordenar_por is None:
+            tabela = dataset.take(list(range(inicio, fim)), filter=expressao)
+        else:
+            # Só a chave de ordenação é lida; a posição no resultado do filtro
+            # desempata, para que as páginas não repitam nem pulem linhas
+            chave = 'id_municipio' if ordenar_por == 'municipio' else ordenar_por
+            chaves = dataset.to_table(columns=[chave], filter=expressao)
+            chaves = chaves.append_column('__pos', pa.array(np.arange(chaves.num_rows, dtype=np.int64)))
+            if ordenar_por == 'municipio':
+                # Ordem alfabética dos nomes canônicos, não dos ids
+                posicoes = pd.Series(self._nomes_municipios()).fillna('').rank(method='dense').to_numpy()
+                chaves = chaves.set_column(0, 'id_municipio', pc.take(pa.array(posicoes), chaves['id_municipio']))
+            ordem = "descending" if decrescente else "ascending"
+            # Seleção parcial (top-k) em vez de ordenar todo o resultado do filtro
+            indices = pc.select_k_unstable(chaves, fim, [(chave, ordem), ('__pos', 'ascending')])
+            pagina_pos = pc.take(chaves['__pos'], indices[inicio:fim])
+            tabela = dataset.take(pagina_pos, filter=expressao)
+        return self._decodificar_municipios(tabela), total
+    
+    def estatisticas_precos_periodo(self, agrupar_por=('produto',), data_inicio=None, data_fim=None,
+                                    filtros=None, tamanho_bloco=TAMANHO_BLOCO_LEITURA):
+        """Número de preços, média, desvio padrão, mínimo e máximo por grupo, da coleta no período.
+        
+        O histórico é lido em blocos e só as somas parciais por grupo (n, soma e
+        soma dos quadrados) ficam em memória: o custo de memória depende do número
+        de grupos, não do período. 'municipio' volta com o nome canônico.
+        """
+        agrupar_por = list(agrupar_por)
+        saida = agrupar_por + ['n', 'preco_medio', 'desvio_padrao', 'minimo', 'maximo']
+        dataset = self._dataset_precos()
+        if dataset is None:
+            return pd.DataFrame(columns=saida)
+        
+        chaves = self._colunas_armazenadas(agrupar_por)
+        expressao = ds.field('preco') > 0
+        filtros_armazenados = self._expressao_filtros(self._filtros_armazenados(filtros))
+        for condicao in [filtros_armazenados] + self._expressao_periodo(data_inicio, data_fim):
+            if condicao is not None:
+                expressao = expressao & condicao
+        
+        def consolidar(parciais):
+            return pa.concat_tables(parciais).group_by(chaves).aggregate([
+                ('n', 'sum'), ('soma', 'sum'), ('quadrados', 'sum'), ('minimo', 'min'), ('maximo', 'max'),
+            ]).rename_columns(chaves + ['n', 'soma', 'quadrados', 'minimo', 'maximo'])
+        
+        parciais = []
+        lotes = dataset.to_batches(
+            columns=chaves + ['preco'], filter=expressao, batch_size=tamanho_bloco,
+            batch_readahead=LOTES_ANTECIPADOS, fragment_readahead=1,
+        )
+        for lote in lotes:
+            if lote.num_rows == 0:
+                continue
+            preco = lote.column('preco')
+            parciais.append(
+                pa.Table.from_batches([lote]).append_column('quadrado', pc.multiply(preco, preco))
+                .group_by(chaves).aggregate([
+                    ('preco', 'count'), ('preco', 'sum'), ('quadrado', 'sum'), ('preco', 'min'), ('preco', 'max'),
+                ]).rename_columns(chaves + ['n', 'soma', 'quadrados', 'minimo', 'maximo'])
+            )
+            if len(parciais) >= PARCIAIS_POR_CONSOLIDACAO:
+                parciais = [consolidar(parciais)]
+        if not parciais:
+            return pd.DataFrame(columns=saida)
+        
+        estatisticas = consolidar(parciais).to_pandas()
+        estatisticas['preco_medio'] = estatisticas['soma'] / estatisticas['n']
+        # Variância amostral pelas somas; arredondamentos não podem deixá-la negativa
+        variancia = (estatisticas['quadrados'] - estatisticas['soma'] ** 2 / estatisticas['n']).clip(lower=0)
+        estatisticas['desvio_padrao'] = np.sqrt(variancia / (estatisticas['n'] - 1).where(estatisticas['n'] > 1))
+        if 'id_municipio' in chaves:
+            estatisticas = self._decodificar_municipios(
+                pa.Table.from_pandas(estatisticas, preserve_index=False), saida
+            )
+        return estatisticas[saida].sort_values(agrupar_por, kind='stable').reset_index(drop=True)
+    
+    def ids_municipios(self, estados, municipios):
+        """(id, nome canônico) de cada (UF, município), cadastrando os novos.
+        
+        Acentos, caixa, espaços, hífens e apóstrofos não distinguem municípios:
+        'SAO PAULO' e 'São Paulo' recebem o mesmo id. A normalização e a consulta
+        ao banco rodam uma vez por par distinto; município vazio fica sem id.
+        """
+        with self._transacao(imediata=True) as conn:
+            return self._ids_municipios(conn, estados, municipios)
+    
+    def tabela_municipios(self):
+        """Municípios canônicos: id, estado, chave, nome e código IBGE (quando conhecido)"""
+        with self._transacao() as conn:
+            return pd.read_sql_query(
+                "SELECT id, estado, chave, nome, codigo_ibge FROM municipios ORDER BY id", conn
+            )
+    
+    def _ids_municipios(self, conn, estados, municipios):
+        indice = municipios.index if isinstance(municipios, pd.Series) else None
+        # Códigos de UF e nome combinados num inteiro: um par distinto por código
+        codigos_uf, ufs = pd.factorize(pd.Series(estados), use_na_sentinel=False)
+        codigos_nome, nomes = pd.factorize(pd.Series(municipios), use_na_sentinel=False)
+        codigos, pares = pd.factorize(codigos_uf.astype(np.int64) * max(len(nomes), 1) + codigos_nome)
+        ufs = pd.Series(ufs, dtype=object).fillna('').astype(str).str.upper().str.strip().to_numpy()
+        nomes = pd.Series(nomes, dtype=object).fillna('').astype(str)
+        unicos = pd.DataFrame({
+            'estado': ufs[pares // max(len(nomes), 1)],
+            'chave': chave_municipio(nomes)[pares % max(len(nomes), 1)],
+            'nome': nomes.str.split().str.join(' ').str.title().to_numpy()[pares % max(len(nomes), 1)],
+        })
+        validos = unicos[unicos['chave'] != '']
+        
+        conn.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS municipios_lote (estado TEXT, chave TEXT, nome TEXT, "
+            "PRIMARY KEY (estado, chave))"
+        )
+        conn.execute("DELETE FROM municipios_lote")
+        conn.executemany(
+            "INSERT OR IGNORE INTO municipios_lote (estado, chave, nome) VALUES (?, ?, ?)",
+            validos.itertuples(index=False, name=None),
+        )
+        novos = pd.DataFrame(
+            conn.execute(
+                "SELECT estado, chave, nome FROM municipios_lote l WHERE NOT EXISTS "
+                "(SELECT 1 FROM municipios m WHERE m.estado = l.estado AND m.chave = l.chave)"
+            ).fetchall(),
+            columns=['estado', 'chave', 'nome'],
+        )
+        if not novos.empty:
+            # Nome oficial (com acentos) quando o município está na tabela do IBGE
+            novos = novos.merge(self._municipios_oficiais(), on=['estado', 'chave'], how='left')
+            novos['nome'] = novos['nome_oficial'].fillna(novos['nome'])
+            novos['codigo_ibge'] = novos['codigo_ibge'].astype(object).where(novos['codigo_ibge'].notna(), None)
+            conn.executemany(
+                "INSERT INTO municipios (estado, chave, nome, codigo_ibge) VALUES (?, ?, ?, ?)",
+                novos[['estado', 'chave', 'nome', 'codigo_ibge']].itertuples(index=False, name=None),
+            )
+        cadastrados = pd.DataFrame(
+            conn.execute(
+                "SELECT l.estado, l.chave, m.id, m.nome FROM municipios_lote l "
+                "JOIN municipios m ON m.estado = l.estado AND m.chave = l.chave"
+            ).fetchall(),
+            columns=['estado', 'chave', 'id', 'nome_canonico'],
+        )
+        unicos = unicos.merge(cadastrados, on=['estado', 'chave'], how='left')
+        ids = pd.Series(pd.array(unicos['id'].to_numpy()[codigos], dtype='Int32'), index=indice)
+        nomes_canonicos = pd.Series(unicos['nome_canonico'].to_numpy(dtype=object)[codigos], index=indice)
+        return ids, nomes_canonicos.where(ids.notna(), None)
+    
+    def _municipios_oficiais(self):
+        """(estado, chave, nome_oficial, codigo_ibge) da tabela de municípios do IBGE"""
+        arquivo = caminho_municipios(self.data_dir)
+        if not os.path.exists(arquivo):
+            return pd.DataFrame(columns=['estado', 'chave', 'nome_oficial', 'codigo_ibge'])
+        oficiais = carregar_municipios(arquivo)
+        return pd.DataFrame({
+            'estado': oficiais['uf'], 'chave': chave_municipio(oficiais['nome']),
+            'nome_oficial': oficiais['nome'], 'codigo_ibge': oficiais['codigo_ibge'],
+        }).drop_duplicates(['estado', 'chave'])
+    
+    def _nomes_municipios(self):
+        """Nome canônico indexado pelo id (posições sem município ficam None)"""
+        with self._transacao() as conn:
+            linhas = conn.execute("SELECT id, nome FROM municipios").fetchall()
+        nomes = np.full(max((linha[0] for linha in linhas), default=0) + 1, None, dtype=object)
+        for id_municipio, nome in linhas:
+            nomes[id_municipio] = nome
+        return nomes
+    
+    @staticmethod
+    def _colunas_armazenadas(colunas):
+        """Colunas pedidas -> colunas do Parquet (municipio é lido como id_municipio)"""
+        if colunas is None:
+            return None
+        return list(dict.fromkeys('id_municipio' if coluna == 'municipio' else coluna for coluna in colunas))
+    
+    def _filtros_armazenados(self, filtros):
+        """Troca o filtro por nome de município pelos ids de todas as suas grafias"""
+        if not filtros or 'municipio' not in filtros:
+            return filtros
+        filtros = dict(filtros)
+        valor = filtros.pop('municipio')
+        valores = list(valor) if isinstance(valor, (list, tuple, set)) else [valor]
+        chaves = chave_municipio(valores).tolist()
+        with self._transacao() as conn:
+            filtros['id_municipio'] = [linha[0] for linha in conn.execute(
+                f"SELECT id FROM municipios WHERE chave IN ({', '.join('?' * len(chaves))})", chaves
+            )]
+        return filtros
+    
+    def _decodificar_municipios(self, tabela, colunas=None):
+        """Tabela Arrow do histórico -> DataFrame com o nome canônico em 'municipio'"""
+        df = tabela.to_pandas()
+        if 'id_municipio' not in df.columns or (colunas is not None and 'municipio' not in colunas):
+            return df
+        ids = df['id_municipio'].to_numpy(dtype=float, na_value=np.nan)
+        validos = ~np.isnan(ids)
+        nomes = self._nomes_municipios()
+        validos &= ids < len(nomes)
+        municipios = np.full(len(df), None, dtype=object)
+        municipios[validos] = nomes[ids[validos].astype(np.int64)]
+        df.insert(df.columns.get_loc('id_municipio'), 'municipio', municipios)
+        if colunas is None:
+            return df.drop(columns=['id_municipio'])
+        return df[list(colunas)]
+    
+    def _dataset_precos(self):
+        if not os.path.exists(self.precos_dir):
+            return None
+        return ds.dataset(
+            self.precos_dir,
+            schema=SCHEMA_PRECOS_ANP,
+            format="parquet",
+            partitioning=PARTICIONAMENTO_PRECOS_ANP,
+        )
+    
+    @classmethod
+    def _expressao_periodo(cls, data_inicio, data_fim):
+        coleta = ds.field('data_coleta')
+        importacao = ds.field('data_importacao')
+        condicoes = []
+        if data_inicio is not None:
+            inicio = pd.Timestamp(data_inicio).strftime("%Y-%m-%d")
+            condicoes.append((coleta >= inicio) | (coleta.is_null() & (importacao >= inicio)))
+            # A importação nunca antecede a coleta: semanas anteriores são descartadas sem leitura
+            condicoes.append(ds.field('semana') >= cls._inicio_periodo([inicio]).iloc[0])
+        if data_fim is not None:
+            limite = (pd.Timestamp(data_fim) + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+            condicoes.append((coleta < limite) | (coleta.is_null() & (importacao < limite)))
+        return condicoes
+    
+    @property
+    def db_path(self):
+        return f"{self.data_dir}/tmanager.db"
+    
+    def _conectar(self):
+        conn = sqlite3.connect(self.db_path, timeout=60)
+        # WAL: leituras da interface não esperam importações em andamento
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (chave TEXT PRIMARY KEY, valor TEXT)")
+        conn.execute("CREATE TABLE IF NOT EXISTS indice_placas (placa TEXT PRIMARY KEY)")
+        self._criar_indice_motoristas(conn)
+        conn.execute("CREATE TABLE IF NOT EXISTS chaves_precos (chave INTEGER PRIMARY KEY)")
+        # Municípios canônicos: uma linha por (UF, nome sem acentos); o histórico ANP guarda o id
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS municipios ("
+            "id INTEGER PRIMARY KEY, estado TEXT, chave TEXT, nome TEXT, codigo_ibge INTEGER, "
+            "UNIQUE (estado, chave))"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS chaves_telemetria (chave INTEGER PRIMARY KEY)")
+        # Previsões de preço por nível ('brasil', 'estado', 'municipio'); meta guarda de qual importação são
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS previsoes_precos ("
+            "nivel TEXT, produto TEXT, estado TEXT, municipio TEXT, semana TEXT, horizonte INTEGER, "
+            "previsao REAL, inferior REAL, superior REAL, modelo TEXT, erro_medio REAL, ultimo_preco REAL, "
+            "PRIMARY KEY (nivel, produto, estado, municipio, semana))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS desempenho_veiculos ("
+            "placa TEXT PRIMARY KEY, km_l REAL, km_l_recente REAL, km_l_mediana REAL, km_monitorado REAL, "
+            "litros REAL, valor REAL, abastecimentos INTEGER, ultimo_odometro REAL, "
+            "primeiro_evento TEXT, ultimo_evento TEXT, atualizado_em TEXT, "
+            "km_medido REAL, litros_medidos REAL, inicio_janela TEXT)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS custos_mensais ("
+            "mes TEXT, placa TEXT, categoria TEXT, total REAL, lancamentos INTEGER, "
+            "PRIMARY KEY (mes, placa, categoria))"
+        )
+        # Postos: identidade, histórico de preços (só anexação) e preço atual por combustível
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS postos ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, chave TEXT UNIQUE, nome TEXT, endereco TEXT, bairro TEXT, "
+            "municipio TEXT, estado TEXT, chave_municipio TEXT, origem TEXT, data_cadastro TEXT)"
+        )
+        # Sem chave única: toda atualização é anexada (a ANP já chega deduplicada)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS historico_precos_postos ("
+            "id_posto INTEGER, produto TEXT, preco REAL, data TEXT, origem TEXT)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_historico_postos ON historico_precos_postos (id_posto, produto, data)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS precos_atuais_postos ("
+            "id_posto INTEGER, produto TEXT, preco REAL, data TEXT, estado TEXT, chave_municipio TEXT, "
+            "PRIMARY KEY (id_posto, produto))"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_precos_atuais_local "
+            "ON precos_atuais_postos (estado, chave_municipio, produto, preco)"
+        )
+        # Distâncias entre municípios (códigos IBGE), com origem < destino
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS distancias ("
+            "origem INTEGER, destino INTEGER, km REAL, fonte TEXT, PRIMARY KEY (origem, destino))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS importacoes_anp ("
+            "hash TEXT PRIMARY KEY, arquivo TEXT, registros INTEGER, data_importacao TEXT)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS resumo_precos ("
+            "produto TEXT, estado TEXT, municipio TEXT, semana TEXT, "
+            "n INTEGER, soma REAL, minimo REAL, maximo REAL, "
+            "PRIMARY KEY (produto, estado, municipio, semana))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS resumo_precos_mensal ("
+            "produto TEXT, estado TEXT, municipio TEXT, mes TEXT, "
+            "n INTEGER, soma REAL, minimo REAL, maximo REAL, "
+            "PRIMARY KEY (produto, estado, municipio, mes))"
+        )
+        # Índice de consulta: estado/municipio vazios representam o estado e o país inteiros
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS indice_precos ("
+            "produto TEXT, estado TEXT, municipio TEXT, semana TEXT, "
+            "mediana REAL, minimo REAL, amostras INTEGER, ultimo REAL, data_ultimo TEXT, "
+            "PRIMARY KEY (produto, estado, municipio))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS histograma_precos ("
+            "produto TEXT, estado TEXT, municipio TEXT, preco REAL, n INTEGER, "
+            "PRIMARY KEY (produto, estado, municipio, preco))"
+        )
+        return conn
+    
+    @contextmanager
+    def _transacao(self, imediata=False):
+        """Conexão com commit/rollback automático.
+        
+        imediata=True reserva a escrita já no início, serializando gravações
+        concorrentes (ex.: importador em vários processos) sem deadlock.
+        """
+        conn = self._conectar()
+        try:
+            if imediata:
+                conn.execute("BEGIN IMMEDIATE")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def _incrementar_versao(conn):
+        conn.execute(
+            "INSERT INTO meta (chave, valor) VALUES ('versao', '1') "
+            "ON CONFLICT (chave) DO UPDATE SET valor = CAST(valor AS INTEGER) + 1"
+        )
+    
+    def _sincronizar_indice_placas(self, conn, arquivo):
+        """Reconstrói o índice de placas se o CSV foi alterado fora do sistema"""
+        if not self._arquivo_alterado(conn, arquivo):
+            return
+        
+        conn.execute("DELETE FROM indice_placas")
+        if os.path.exists(arquivo):
+            placas = pd.read_csv(arquivo, usecols=['placa'], dtype=str)['placa'].dropna()
+            conn.executemany(
+                "INSERT OR IGNORE INTO indice_placas (placa) VALUES (?)",
+                ((placa,) for placa in placas),
+            )
+        self._registrar_assinatura(conn, arquivo)
+    
+    @staticmethod
+    def _criar_indice_motoristas(conn):
+        # motivo preenchido: registro antigo do CSV com documento inválido (fora das consultas)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS indice_motoristas ("
+            "cpf TEXT PRIMARY KEY, cnh TEXT UNIQUE, nome TEXT, categoria_cnh TEXT, motivo TEXT)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_motoristas_categoria ON indice_motoristas (categoria_cnh)")
+    
+    def _sincronizar_indice_motoristas(self, conn, arquivo):
+        """Reconstrói o índice de motoristas se o CSV foi alterado fora do sistema"""
+        if not self._arquivo_alterado(conn, arquivo):
+            return
+        
+        conn.execute("DELETE FROM indice_motoristas")
+        if os.path.exists(arquivo):
+            motoristas = pd.read_csv(arquivo, usecols=['cpf', 'cnh', 'nome', 'categoria_cnh'], dtype=str)
+            # Mesmo formato dos cadastros novos: "529.982.247-25" e "52998224725" são o mesmo CPF
+            motoristas['cpf'] = somente_digitos(motoristas['cpf'], 11).to_numpy()
+            motoristas['cnh'] = somente_digitos(motoristas['cnh'], 11).to_numpy()
+            motoristas = motoristas[motoristas['cpf'] != '']
+            motoristas['motivo'] = motivo_documentos(motoristas['cpf'], motoristas['cnh'])
+            # Registros antigos com CNH ausente ou repetida ficam só pelo CPF
+            motoristas['cnh'] = motoristas['cnh'].mask((motoristas['cnh'] == '') | motoristas['cnh'].duplicated())
+            conn.executemany(
+                "INSERT OR IGNORE INTO indice_motoristas (cpf, cnh, nome, categoria_cnh, motivo) "
+                "VALUES (?, ?, ?, ?, ?)",
+                motoristas[['cpf', 'cnh', 'nome', 'categoria_cnh', 'motivo']].astype(object)
+                .where(motoristas.notna(), None).itertuples(index=False, name=None),
+            )
+        self._registrar_assinatura(conn, arquivo)
+    
+    def _sincronizar_custos_mensais(self, conn, arquivo):
+        """Refaz os totais mensais se o livro de custos foi alterado fora do sistema"""
+        if not self._arquivo_alterado(conn, arquivo):
+            return
+        
+        conn.execute("DELETE FROM custos_mensais")
+        if os.path.exists(arquivo):
+            self._atualizar_custos_mensais(
+                conn, pd.read_csv(arquivo, usecols=['data', 'placa', 'categoria', 'valor'], dtype={'placa': str})
+            )
+        self._registrar_assinatura(conn, arquivo)
+    
+    def _atualizar_custos_mensais(self, conn, custos):
+        """Soma os lançamentos aos totais por (mês, placa, categoria)"""
+        lote = pd.DataFrame({
+            'mes': self._inicio_periodo(custos['data'], periodo='mes').to_numpy(),
+            'placa': custos['placa'].fillna('').astype(str).to_numpy(),
+            'categoria': custos['categoria'].astype(str).to_numpy(),
+            'valor': pd.to_numeric(custos['valor'], errors='coerce').to_numpy(),
+        }).dropna(subset=['valor'])
+        totais = lote.groupby(['mes', 'placa', 'categoria'])['valor'].agg(['sum', 'count'])
+        conn.executemany(
+            "INSERT INTO custos_mensais (mes, placa, categoria, total, lancamentos) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (mes, placa, categoria) DO UPDATE SET "
+            "total = total + excluded.total, lancamentos = lancamentos + excluded.lancamentos",
+            ((*chave, float(linha['sum']), int(linha['count'])) for chave, linha in totais.iterrows()),
+        )
+    
+    def _arquivo_alterado(self, conn, arquivo):
+        """O arquivo mudou desde o último _registrar_assinatura? Compara tamanho e
+        mtime: uma edição externa que mantém o número de bytes ainda é detectada"""
+        registro = conn.execute(
+            "SELECT valor FROM meta WHERE chave = ?", (f"assinatura:{arquivo}",)
+        ).fetchone()
+        return registro is None or registro[0] != str(self.assinatura_arquivo(arquivo))
+    
+    def _registrar_assinatura(self, conn, arquivo):
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (chave, valor) VALUES (?, ?)",
+            (f"assinatura:{arquivo}", str(self.assinatura_arquivo(arquivo))),
+        )
+    
+    @staticmethod
+    def _anexar_csv(arquivo, df_novo):
+        """Acrescenta linhas ao final do CSV sem reescrever as existentes"""
+        if not os.path.exists(arquivo):
+            df_novo.to_csv(arquivo, index=False)
+            return
+        
+        colunas = list(pd.read_csv(arquivo, nrows=0).columns)
+        colunas_novas = [c for c in df_novo.columns if c not in colunas]
+        if colunas_novas:
+            # Mudança de esquema: única situação em que o arquivo é reescrito
+            df_final = pd.concat([pd.read_csv(arquivo), df_novo], ignore_index=True)
+            df_final.to_csv(arquivo, index=False)
+            return
+        
+        df_novo.reindex(columns=colunas).to_csv(arquivo, mode='a', header=False, index=False)
+    
+    @property
+    def precos_dir(self):
+        return f"{self.data_dir}/precos_anp"
+    
+    def _gravar_particoes_precos(self, df_precos, destino=None):
+        """Grava as linhas como novos arquivos Parquet; retorna os caminhos gravados"""
+        df = df_precos.copy()
+        if 'semana' not in df.columns:
+            df['semana'] = self._inicio_periodo(df['data_importacao'])
+        for coluna in SCHEMA_PRECOS_ANP.names:
+            if coluna not in df.columns:
+                df[coluna] = None
+        df = df[SCHEMA_PRECOS_ANP.names]
+        for coluna in SCHEMA_PRECOS_ANP.names:
+            if coluna != 'preco' and df[coluna].dtype == object:
+                df[coluna] = df[coluna].where(df[coluna].isna(), df[coluna].astype(str))
+        
+        # Colunas categóricas chegam como dictionary<string> e são decodificadas no cast
+        tabela = pa.Table.from_pandas(df, preserve_index=False).cast(SCHEMA_PRECOS_ANP)
+        arquivos = []
+        # Nome único por gravação: um append nunca sobrescreve partições existentes
+        ds.write_dataset(
+            tabela,
+            destino or self.precos_dir,
+            format="parquet",
+            partitioning=PARTICIONAMENTO_PRECOS_ANP,
+            basename_template=f"parte-{uuid.uuid4().hex}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+            file_visitor=lambda arquivo: arquivos.append(arquivo.path),
+        )
+        return arquivos
+    
+    @staticmethod
+    def _remover_arquivos(arquivos):
+        """Apaga arquivos gravados por uma operação que não foi confirmada"""
+        for arquivo in arquivos:
+            if os.path.exists(arquivo):
+                os.remove(arquivo)
+    
+    def _gravar_particoes_telemetria(self, df_eventos):
+        df = df_eventos.copy()
+        df['data'] = pd.to_datetime(df['data']).dt.floor('s')
+        # Formata só os meses distintos, não cada evento
+        codigos, meses = pd.factorize(df['data'].dt.year * 100 + df['data'].dt.month)
+        df['mes'] = np.array([f"{mes // 100:04d}-{mes % 100:02d}" for mes in meses], dtype=object)[codigos]
+        df = df.reindex(columns=SCHEMA_TELEMETRIA.names)
+        for coluna in ('odometro', 'litros', 'valor'):
+            df[coluna] = pd.to_numeric(df[coluna], errors='coerce')
+        for coluna in ('produto', 'municipio', 'estado', 'origem', 'data_importacao', 'placa'):
+            df[coluna] = df[coluna].astype(object).where(df[coluna].notna(), None)
+        
+        tabela = pa.Table.from_pandas(df, preserve_index=False).cast(SCHEMA_TELEMETRIA)
+        arquivos = []
+        ds.write_dataset(
+            tabela,
+            self.telemetria_dir,
+            format="parquet",
+            partitioning=PARTICIONAMENTO_TELEMETRIA,
+            # Uma carga histórica cobre facilmente milhares de (placa, mês)
+            max_partitions=1_000_000,
+            basename_template=f"parte-{uuid.uuid4().hex}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+            file_visitor=lambda arquivo: arquivos.append(arquivo.path),
+        )
+        return arquivos
+    
+    @staticmethod
+    def _chaves_naturais(df_precos):
+        """Hash de 64 bits da chave natural de cada linha.
+        
+        Sem data de coleta, o dia da importação faz esse papel.
+        """
+        chave = pd.DataFrame(index=df_precos.index)
+        for coluna in CHAVE_NATURAL_PRECOS:
+            if coluna in df_precos.columns:
+                valores = df_precos[coluna]
+                # Lido do Parquet com nulos o id vem float: '12.0' e '12' seriam chaves diferentes
+                valores = (valores.astype('Int64') if coluna == 'id_municipio' else valores).astype(object)
+                chave[coluna] = valores.where(valores.notna(), None).astype(str)
+            else:
+                chave[coluna] = 'None'
+        
+        sem_coleta = chave['data_coleta'] == 'None'
+        chave.loc[sem_coleta, 'data_coleta'] = df_precos.loc[sem_coleta, 'data_importacao'].astype(str).str[:10]
+        return pd.util.hash_pandas_object(chave, index=False).astype('int64')
+    
+    @staticmethod
+    def _lote_por_local(df_precos):
+        """(produto, estado, municipio, preco) do lote, com '' no lugar de ausentes,
+        e a data de referência de cada linha (coleta, ou importação quando falta)"""
+        data_referencia = (
+            df_precos['data_coleta'].astype(object).fillna(df_precos['data_importacao'])
+            if 'data_coleta' in df_precos.columns else df_precos['data_importacao']
+        )
+        lote = pd.DataFrame({
+            coluna: df_precos[coluna].astype(object).fillna('') if coluna in df_precos.columns else ''
+            for coluna in COLUNAS_RESUMO_PRECOS[:3]
+        }, index=df_precos.index)
+        lote['preco'] = df_precos['preco'].to_numpy()
+        return lote, data_referencia
+    
+    def _atualizar_resumo_precos(self, conn, df_precos, tabelas=tuple(RESUMOS_PRECOS)):
+        """Soma o lote aos resumos por (produto, estado, municipio, semana/mês da coleta)"""
+        lote, data_referencia = self._lote_por_local(df_precos)
+        
+        for tabela in tabelas:
+            periodo = RESUMOS_PRECOS[tabela]
+            lote[periodo] = self._inicio_periodo(data_referencia, periodo, df_precos['data_importacao']).to_numpy()
+            agregado = lote.groupby(COLUNAS_RESUMO_PRECOS[:3] + [periodo], sort=False)['preco'].agg(
+                ['size', 'sum', 'min', 'max']
+            )
+            conn.executemany(
+                f"INSERT INTO {tabela} (produto, estado, municipio, {periodo}, n, soma, minimo, maximo) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                f"ON CONFLICT (produto, estado, municipio, {periodo}) DO UPDATE SET "
+                "n = n + excluded.n, soma = soma + excluded.soma, "
+                "minimo = MIN(minimo, excluded.minimo), maximo = MAX(maximo, excluded.maximo)",
+                (
+                    (*chave, int(n), float(soma), float(minimo), float(maximo))
+                    for chave, n, soma, minimo, maximo in zip(
+                        agregado.index, agregado['size'], agregado['sum'], agregado['min'], agregado['max']
+                    )
+                ),
+            )
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (chave, valor) VALUES ('ultima_importacao_precos', ?)",
+            (str(df_precos['data_importacao'].max()),),
+        )
+    
+    def _garantir_resumo_precos(self, conn):
+        """Monta os resumos ainda vazios a partir do histórico já gravado (uma única vez)"""
+        pendentes = [
+            tabela for tabela in RESUMOS_PRECOS
+            if not conn.execute("SELECT 1 FROM meta WHERE chave = ?", (tabela,)).fetchone()
+        ]
+        if not pendentes:
+            return
+        conn.executemany("INSERT OR REPLACE INTO meta (chave, valor) VALUES (?, '1')", ((t,) for t in pendentes))
+        if os.path.exists(self.precos_dir):
+            historico = self.carregar_precos_anp(
+                colunas=COLUNAS_RESUMO_PRECOS[:3] + ['preco', 'data_coleta', 'data_importacao']
+            )
+            if not historico.empty:
+                self._atualizar_resumo_precos(conn, historico, pendentes)
+    
+    def _atualizar_indice_precos(self, conn, df_precos):
+        """Atualiza o índice de consulta de preços nas chaves tocadas pelo lote.
+        
+        Para cada (produto, estado, municipio), e também para o estado e o país
+        (municipio/estado vazios), guarda o histograma de preços da semana de
+        coleta mais recente. Mediana e mínimo saem do histograma; o último preço
+        é o da data de coleta mais recente.
+        """
+        chave = COLUNAS_RESUMO_PRECOS[:3]
+        lote, data_referencia = self._lote_por_local(df_precos)
+        lote['data'] = pd.Series(data_referencia).astype(str).str[:10].to_numpy()
+        lote['semana'] = self._inicio_periodo(lote['data'], reserva=df_precos['data_importacao']).to_numpy()
+        lote = pd.concat(
+            [lote, lote.assign(municipio=''), lote.assign(estado='', municipio='')], ignore_index=True
+        )
+        lote = lote[lote['semana'] == lote.groupby(chave)['semana'].transform('max')]
+        
+        conn.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS chaves_indice (produto TEXT, estado TEXT, municipio TEXT, "
+            "PRIMARY KEY (produto, estado, municipio))"
+        )
+        conn.execute("DELETE FROM chaves_indice")
+        conn.executemany(
+            "INSERT INTO chaves_indice VALUES (?, ?, ?)",
+            lote[chave].drop_duplicates().itertuples(index=False, name=None),
+        )
+        atuais = pd.DataFrame(
+            conn.execute(
+                "SELECT i.produto, i.estado, i.municipio, i.semana, i.data_ultimo FROM indice_precos i "
+                "JOIN chaves_indice USING (produto, estado, municipio)"
+            ).fetchall(),
+            columns=chave + ['semana_atual', 'data_atual'],
+        )
+        lote = lote.merge(atuais, on=chave, how='left')
+        lote = lote[lote['semana_atual'].isna() | (lote['semana'] >= lote['semana_atual'])]
+        if lote.empty:
+            return
+        
+        # Semana mais nova que a indexada: o histograma da chave recomeça
+        substituidas = lote.loc[lote['semana_atual'].isna() | (lote['semana'] > lote['semana_atual']), chave]
+        conn.execute("DELETE FROM chaves_indice")
+        conn.executemany(
+            "INSERT INTO chaves_indice VALUES (?, ?, ?)",
+            substituidas.drop_duplicates().itertuples(index=False, name=None),
+        )
+        conn.execute(
+            "DELETE FROM histograma_precos WHERE (produto, estado, municipio) IN "
+            "(SELECT produto, estado, municipio FROM chaves_indice)"
+        )
+        
+        histograma = lote.groupby(chave + ['preco']).size()
+        conn.executemany(
+            "INSERT INTO histograma_precos (produto, estado, municipio, preco, n) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (produto, estado, municipio, preco) DO UPDATE SET n = n + excluded.n",
+            ((*indice, int(n)) for indice, n in histograma.items()),
+        )
+        
+        conn.execute("DELETE FROM chaves_indice")
+        conn.executemany(
+            "INSERT INTO chaves_indice VALUES (?, ?, ?)",
+            lote[chave].drop_duplicates().itertuples(index=False, name=None),
+        )
+        histograma = pd.DataFrame(
+            conn.execute(
+                "SELECT h.produto, h.estado, h.municipio, h.preco, h.n FROM histograma_precos h "
+                "JOIN chaves_indice USING (produto, estado, municipio) "
+                "ORDER BY h.produto, h.estado, h.municipio, h.preco"
+            ).fetchall(),
+            columns=chave + ['preco', 'n'],
+        )
+        # Mediana ponderada: média dos dois valores centrais da distribuição acumulada
+        acumulado = histograma.groupby(chave)['n'].cumsum()
+        total = histograma.groupby(chave)['n'].transform('sum')
+        histograma['inferior'] = acumulado >= (total + 1) // 2
+        histograma['superior'] = acumulado >= total // 2 + 1
+        estatisticas = pd.DataFrame({
+            'mediana': (
+                histograma[histograma['inferior']].groupby(chave)['preco'].first()
+                + histograma[histograma['superior']].groupby(chave)['preco'].first()
+            ) / 2,
+            'minimo': histograma.groupby(chave)['preco'].min(),
+            'amostras': histograma.groupby(chave)['n'].sum(),
+        })
+        
+        ultimos = lote.sort_values('data', kind='stable').groupby(chave).tail(1).set_index(chave)
+        ultimos = ultimos[ultimos['data_atual'].isna() | (ultimos['data'] >= ultimos['data_atual'])]
+        semanas = lote.groupby(chave)['semana'].max()
+        
+        conn.executemany(
+            "INSERT INTO indice_precos "
+            "(produto, estado, municipio, semana, mediana, minimo, amostras, ultimo, data_ultimo) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (produto, estado, municipio) DO UPDATE SET "
+            "semana = excluded.semana, mediana = excluded.mediana, minimo = excluded.minimo, "
+            "amostras = excluded.amostras, "
+            "ultimo = COALESCE(excluded.ultimo, ultimo), data_ultimo = COALESCE(excluded.data_ultimo, data_ultimo)",
+            (
+                (
+                    *indice, semanas[indice], float(linha.mediana), float(linha.minimo), int(linha.amostras),
+                    float(ultimos.at[indice, 'preco']) if indice in ultimos.index else None,
+                    ultimos.at[indice, 'data'] if indice in ultimos.index else None,
+                )
+                for indice, linha in estatisticas.iterrows()
+            ),
+        )
+    
+    def _garantir_indice_precos(self, conn):
+        """Monta o índice de consulta a partir do histórico já gravado (uma única vez)"""
+        if conn.execute("SELECT 1 FROM meta WHERE chave = 'indice_precos'").fetchone():
+            return
+        conn.execute("INSERT OR REPLACE INTO meta (chave, valor) VALUES ('indice_precos', '1')")
+        if os.path.exists(self.precos_dir):
+            historico = self.carregar_precos_anp(
+                colunas=COLUNAS_RESUMO_PRECOS[:3] + ['preco', 'data_coleta', 'data_importacao']
+            )
+            if not historico.empty:
+                self._atualizar_indice_precos(conn, historico)
+    
+    def _atualizar_postos(self, conn, df_precos, origem):
+        """Cadastra os postos do lote (revenda + endereço no município) e anexa
+        seus preços ao histórico; o preço atual de cada (posto, produto) só é
+        substituído por uma coleta igual ou mais recente."""
+        if 'revenda' not in df_precos.columns:
+            return
+        texto = lambda coluna: (
+            df_precos[coluna].astype(object).fillna('').astype(str).str.strip()
+            if coluna in df_precos.columns else pd.Series('', index=df_precos.index)
+        )
+        lote = pd.DataFrame({
+            'nome': texto('revenda'), 'endereco': texto('endereco'), 'bairro': texto('bairro'),
+            'municipio': texto('municipio'), 'estado': texto('estado').str.upper(),
+            'produto': df_precos['produto'].astype(object) if 'produto' in df_precos.columns else None,
+            'preco': pd.to_numeric(df_precos['preco'], errors='coerce') if 'preco' in df_precos.columns else np.nan,
+            'data': (
+                df_precos['data_coleta'].astype(object).fillna(df_precos['data_importacao'])
+                if 'data_coleta' in df_precos.columns and 'data_importacao' in df_precos.columns
+                else texto('data_coleta')
+            ),
+        })
+        lote = lote[lote['nome'] != '']
+        if lote.empty:
+            return
+        lote['data'] = lote['data'].astype(str)
+        lote['chave_municipio'] = chave_municipio(lote['municipio'])
+        lote['chave'] = self._chaves_postos(lote)
+        
+        postos = lote.drop_duplicates('chave')
+        conn.executemany(
+            "INSERT OR IGNORE INTO postos "
+            "(chave, nome, endereco, bairro, municipio, estado, chave_municipio, origem, data_cadastro) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (linha.chave, linha.nome, linha.endereco, linha.bairro, linha.municipio, linha.estado,
+                 linha.chave_municipio, origem, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+                for linha in postos.itertuples()
+            ),
+        )
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS chaves_postos (chave TEXT PRIMARY KEY)")
+        conn.execute("DELETE FROM chaves_postos")
+        conn.executemany("INSERT INTO chaves_postos VALUES (?)", ((chave,) for chave in postos['chave']))
+        ids = dict(conn.execute(
+            "SELECT p.chave, p.id FROM postos p JOIN chaves_postos USING (chave)"
+        ).fetchall())
+        
+        precos = lote.dropna(subset=['produto', 'preco']).assign(id_posto=lambda df: df['chave'].map(ids))
+        if precos.empty:
+            return
+        conn.executemany(
+            "INSERT INTO historico_precos_postos (id_posto, produto, preco, data, origem) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                (int(linha.id_posto), linha.produto, float(linha.preco), linha.data, origem)
+                for linha in precos.itertuples()
+            ),
+        )
+        atuais = precos.sort_values('data', kind='stable').drop_duplicates(['id_posto', 'produto'], keep='last')
+        conn.executemany(
+            "INSERT INTO precos_atuais_postos (id_posto, produto, preco, data, estado, chave_municipio) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (id_posto, produto) DO UPDATE SET preco = excluded.preco, data = excluded.data "
+            "WHERE excluded.data >= precos_atuais_postos.data",
+            (
+                (int(linha.id_posto), linha.produto, float(linha.preco), linha.data, linha.estado,
+                 linha.chave_municipio)
+                for linha in atuais.itertuples()
+            ),
+        )
+    
+    @staticmethod
+    def _chaves_postos(postos):
+        """Identidade do posto: estado|município|nome|endereço, comparados por chave_municipio"""
+        return (
+            postos['estado'] + '|' + postos['chave_municipio'] + '|'
+            + chave_municipio(postos['nome']) + '|' + chave_municipio(postos['endereco'])
+        )
+    
+    def _garantir_postos(self, conn):
+        """Cadastra os postos do histórico ANP já gravado (uma única vez)"""
+        if conn.execute("SELECT 1 FROM meta WHERE chave = 'postos_anp'").fetchone():
+            return
+        conn.execute("INSERT OR REPLACE INTO meta (chave, valor) VALUES ('postos_anp', '1')")
+        if os.path.exists(self.precos_dir):
+            historico = self.carregar_precos_anp(colunas=[
+                'estado', 'municipio', 'revenda', 'endereco', 'bairro', 'produto', 'preco',
+                'data_coleta', 'data_importacao',
+            ])
+            if not historico.empty:
+                self._atualizar_postos(conn, historico, origem='anp')
+    
+    def _garantir_chaves_precos(self, conn):
+        """Popula o índice de chaves a partir do histórico já gravado (uma única vez)"""
+        if conn.execute("SELECT 1 FROM meta WHERE chave = 'chaves_precos'").fetchone():
+            return
+        if os.path.exists(self.precos_dir):
+            historico = self.carregar_precos_anp(colunas=CHAVE_NATURAL_PRECOS + ['data_importacao'])
+            conn.executemany(
+                "INSERT OR IGNORE INTO chaves_precos (chave) VALUES (?)",
+                ((chave,) for chave in self._chaves_naturais(historico).unique().tolist()),
+            )
+        conn.execute("INSERT OR REPLACE INTO meta (chave, valor) VALUES ('chaves_precos', '1')")
+    
+    def _migrar_csv_precos(self):
+        """Converte o antigo precos_anp.csv para o armazenamento particionado (uma única vez)"""
+        arquivo = f"{self.data_dir}/precos_anp.csv"
+        if not os.path.exists(arquivo) or os.path.exists(self.precos_dir):
+            return
+        
+        df_antigo = pd.read_csv(arquivo)
+        if 'data_importacao' not in df_antigo.columns:
+            df_antigo['data_importacao'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        if not df_antigo.empty:
+            locais = df_antigo.reindex(columns=['estado', 'municipio'])
+            df_antigo['id_municipio'], _ = self.ids_municipios(locais['estado'], locais['municipio'])
+            self._gravar_particoes_precos(df_antigo)
+        os.replace(arquivo, f"{arquivo}.migrado")
+    
+    def _migrar_municipios_precos(self):
+        """Converte o histórico com o município em texto para id_municipio e
+        descarta índices e resumos feitos com os nomes antigos (uma única vez);
+        os _garantir_* os refazem com os nomes canônicos"""
+        with self._transacao() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE chave = 'municipios_precos'").fetchone():
+                return
+        with self._transacao(imediata=True) as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE chave = 'municipios_precos'").fetchone():
+                return
+            if os.path.exists(self.precos_dir):
+                antigo = ds.dataset(
+                    self.precos_dir, schema=SCHEMA_PRECOS_ANP.append(pa.field('municipio', pa.string())),
+                    format="parquet", partitioning=PARTICIONAMENTO_PRECOS_ANP,
+                )
+                convertido = f"{self.precos_dir}.convertido"
+                shutil.rmtree(convertido, ignore_errors=True)
+                for lote in antigo.to_batches(batch_size=TAMANHO_LOTE_MIGRACAO):
+                    df = lote.to_pandas()
+                    if df.empty:
+                        continue
+                    ids, _ = self._ids_municipios(conn, df['estado'], df['municipio'])
+                    df['id_municipio'] = df['id_municipio'].astype('Int32').fillna(ids)
+                    self._gravar_particoes_precos(df.drop(columns=['municipio']), destino=convertido)
+                os.replace(self.precos_dir, f"{self.precos_dir}.antigo")
+                if os.path.exists(convertido):
+                    os.replace(convertido, self.precos_dir)
+                shutil.rmtree(f"{self.precos_dir}.antigo")
+            
+            for tabela in ['chaves_precos', 'indice_precos', 'histograma_precos', *RESUMOS_PRECOS]:
+                conn.execute(f"DELETE FROM {tabela}")
+            conn.execute(
+                "DELETE FROM meta WHERE chave IN ('chaves_precos', 'indice_precos', "
+                f"{', '.join('?' * len(RESUMOS_PRECOS))}) OR chave LIKE 'previsoes:%'",
+                list(RESUMOS_PRECOS),
+            )
+            conn.execute("INSERT OR REPLACE INTO meta (chave, valor) VALUES ('municipios_precos', '1')")
+            self._incrementar_versao(conn)
+    
+    def _migrar_desempenho_incremental(self):
+        """Acrescenta a desempenho_veiculos os totais das medições e o início da
+        janela (uma única vez); placas sem eles são recalculadas por inteiro na
+        próxima ingestão"""
+        with self._transacao() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE chave = 'desempenho_incremental'").fetchone():
+                return
+        with self._transacao(imediata=True) as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE chave = 'desempenho_incremental'").fetchone():
+                return
+            existentes = {linha[1] for linha in conn.execute("PRAGMA table_info(desempenho_veiculos)")}
+            for coluna, tipo in (('km_medido', 'REAL'), ('litros_medidos', 'REAL'), ('inicio_janela', 'TEXT')):
+                if coluna not in existentes:
+                    conn.execute(f"ALTER TABLE desempenho_veiculos ADD COLUMN {coluna} {tipo}")
+            conn.execute("INSERT OR REPLACE INTO meta (chave, valor) VALUES ('desempenho_incremental', '1')")
+    
+    def _migrar_indice_motoristas(self):
+        """Recria o índice de motoristas com documentos normalizados e a coluna
+        motivo (uma única vez); a próxima consulta o reconstrói a partir do CSV"""
+        with self._transacao() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE chave = 'indice_motoristas'").fetchone():
+                return
+        with self._transacao(imediata=True) as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE chave = 'indice_motoristas'").fetchone():
+                return
+            conn.execute("DROP TABLE indice_motoristas")
+            self._criar_indice_motoristas(conn)
+            conn.execute("DELETE FROM meta WHERE chave = ?", (f"assinatura:{self.arquivo_motoristas}",))
+            conn.execute("INSERT OR REPLACE INTO meta (chave, valor) VALUES ('indice_motoristas', '1')")
+    
+    def _migrar_chaves_postos(self):
+        """Refaz as chaves dos postos gravadas antes de chave_municipio ignorar
+        hífens, apóstrofos e pontos (uma única vez); postos que passam a ter a
+        mesma chave são unidos no de menor id"""
+        with self._transacao() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE chave = 'chaves_postos'").fetchone():
+                return
+        with self._transacao(imediata=True) as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE chave = 'chaves_postos'").fetchone():
+                return
+            postos = pd.read_sql_query(
+                "SELECT id, chave, nome, endereco, municipio, estado, chave_municipio FROM postos", conn
+            )
+            postos[['nome', 'endereco', 'municipio', 'estado']] = (
+                postos[['nome', 'endereco', 'municipio', 'estado']].fillna('')
+            )
+            chaves_antigas = postos[['chave', 'chave_municipio']].copy()
+            postos['chave_municipio'] = chave_municipio(postos['municipio'])
+            postos['chave_nova'] = self._chaves_postos(postos)
+            postos['id_mantido'] = postos.groupby('chave_nova')['id'].transform('min')
+            
+            unidos = postos[postos['id'] != postos['id_mantido']]
+            if not unidos.empty:
+                pares = list(zip(unidos['id_mantido'].tolist(), unidos['id'].tolist()))
+                conn.executemany("UPDATE historico_precos_postos SET id_posto = ? WHERE id_posto = ?", pares)
+                # Preço atual do posto mantido: o mais recente entre os unidos
+                conn.executemany(
+                    "INSERT INTO precos_atuais_postos (id_posto, produto, preco, data, estado, chave_municipio) "
+                    "SELECT ?, produto, preco, data, estado, chave_municipio FROM precos_atuais_postos "
+                    "WHERE id_posto = ? "
+                    "ON CONFLICT (id_posto, produto) DO UPDATE SET preco = excluded.preco, data = excluded.data "
+                    "WHERE excluded.data >= precos_atuais_postos.data",
+                    pares,
+                )
+                conn.executemany(
+                    "DELETE FROM precos_atuais_postos WHERE id_posto = ?", ((id_posto,) for _, id_posto in pares)
+                )
+                conn.executemany("DELETE FROM postos WHERE id = ?", ((id_posto,) for _, id_posto in pares))
+            
+            alterados = (
+                (chaves_antigas['chave'] != postos['chave_nova'])
+                | (chaves_antigas['chave_municipio'] != postos['chave_municipio'])
+            )
+            mantidos = postos[(postos['id'] == postos['id_mantido']) & alterados]
+            conn.executemany(
+                "UPDATE postos SET chave = ?, chave_municipio = ? WHERE id = ?",
+                mantidos[['chave_nova', 'chave_municipio', 'id']].itertuples(index=False, name=None),
+            )
+            conn.execute(
+                "UPDATE precos_atuais_postos SET chave_municipio = "
+                "(SELECT p.chave_municipio FROM postos p WHERE p.id = precos_atuais_postos.id_posto)"
+            )
+            conn.execute("INSERT OR REPLACE INTO meta (chave, valor) VALUES ('chaves_postos', '1')")
+            if not unidos.empty or not mantidos.empty:
+                self._incrementar_versao(conn)
+    
+    @classmethod
+    def _inicio_periodo(cls, datas, periodo='semana', reserva=None):
+        """Início da semana (segunda-feira) ou do mês de cada data, como 'YYYY-MM-DD'.
+        
+        Calculado uma vez por data distinta e expandido pelos códigos. Datas
+        ausentes ou inválidas usam a data de mesma posição em reserva (ex.: a de
+        importação da linha); sem ela, ficam sem período (None) em vez de serem
+        datadas pelo relógio.
+        """
+        datas = pd.Series(datas)
+        codigos, unicas = pd.factorize(datas.astype(object), use_na_sentinel=False)
+        # 'mixed': datas de coleta e carimbos de importação chegam juntos e com formatos diferentes
+        unicas = pd.to_datetime(pd.Series(unicas), errors='coerce', format='mixed').dt.normalize()
+        if periodo == 'mes':
+            inicio = unicas - pd.to_timedelta(unicas.dt.day - 1, unit='D')
+        else:
+            inicio = unicas - pd.to_timedelta(unicas.dt.weekday, unit='D')
+        inicio = pd.Series(inicio.dt.strftime("%Y-%m-%d").to_numpy(dtype=object)[codigos], index=datas.index)
+        sem_periodo = inicio.isna()
+        if reserva is not None and sem_periodo.any():
+            reserva = pd.Series(np.asarray(reserva, dtype=object), index=datas.index)[sem_periodo]
+            inicio[sem_periodo] = cls._inicio_periodo(reserva, periodo)
+        return inicio.where(inicio.notna(), None)
+    
+    @staticmethod
+    def _expressao_filtros(filtros):
+        expressao = None
+        for coluna, valor in (filtros or {}).items():
+            if isinstance(valor, (list, tuple, set)):
+                condicao = ds.field(coluna).isin(list(valor))
+            else:
+                condicao = ds.field(coluna) == valor
+            expressao = condicao if expressao is None else expressao & condicao
+        return expressao
@@ -0,0 +1,154 @@
+# distancias.py - distâncias rodoviárias estimadas entre municípios, 100% offline
+#
+# Coordenadas vêm da tabela de municípios (código IBGE, nome, UF, latitude,
+# longitude) em data/municipios_ibge.csv. A versão distribuída cobre capitais e
+# principais polos; a tabela completa do IBGE, inclusive no formato com
+# codigo_uf, pode substituí-la sem mudanças no código.
+#
+# Distância rodoviária ≈ distância em linha reta (haversine) × FATOR_RODOVIARIO.
+# Cada par calculado fica gravado no banco (tabela distancias) e as consultas
+# seguintes só leem o cache; km informados pelo usuário têm precedência.
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from .anp_import import normalizar_nome_coluna
+
+ARQUIVO_MUNICIPIOS = "municipios_ibge.csv"
+MUNICIPIOS_PADRAO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", ARQUIVO_MUNICIPIOS)
+RAIO_TERRA_KM = 6371.0088
+# Pontuação que não distingue municípios ("Embu-Guaçu", "Embu Guaçu"; "Pau D'Arco")
+SEPARADORES_NOME = re.compile(r"[-'`´’.]")
+# Razão média entre a distância por estrada e a linha reta em rotas brasileiras
+FATOR_RODOVIARIO = 1.25
+UF_POR_CODIGO = {
+    11: 'RO', 12: 'AC', 13: 'AM', 14: 'RR', 15: 'PA', 16: 'AP', 17: 'TO',
+    21: 'MA', 22: 'PI', 23: 'CE', 24: 'RN', 25: 'PB', 26: 'PE', 27: 'AL', 28: 'SE', 29: 'BA',
+    31: 'MG', 32: 'ES', 33: 'RJ', 35: 'SP', 41: 'PR', 42: 'SC', 43: 'RS',
+    50: 'MS', 51: 'MT', 52: 'GO', 53: 'DF',
+}
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Distância em linha reta (km); aceita escalares ou arrays com broadcasting"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(valor, dtype=float)) for valor in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RAIO_TERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def chave_municipio(nomes):
+    """Nome comparável: maiúsculas, sem acentos, hífens, apóstrofos e pontos
+    ('São Paulo' -> 'SAO PAULO', 'Embu-Guaçu' -> 'EMBU GUACU')"""
+    nomes = pd.Series(nomes, dtype=object).fillna('')
+    codigos, unicos = pd.factorize(nomes)
+    chaves = [" ".join(SEPARADORES_NOME.sub(' ', normalizar_nome_coluna(nome)).split()) for nome in unicos]
+    return pd.Series(chaves, dtype=object).to_numpy()[codigos]
+
+
+def caminho_municipios(data_dir):
+    """Tabela de municípios da pasta de dados, ou a distribuída com o sistema"""
+    arquivo = os.path.join(data_dir, ARQUIVO_MUNICIPIOS)
+    return arquivo if os.path.exists(arquivo) else MUNICIPIOS_PADRAO
+
+
+def carregar_municipios(caminho):
+    """Lê a tabela de municípios: codigo_ibge, nome, uf, latitude, longitude"""
+    municipios = pd.read_csv(caminho, dtype={'codigo_ibge': np.int64})
+    if 'uf' not in municipios.columns and 'codigo_uf' in municipios.columns:
+        municipios['uf'] = municipios['codigo_uf'].map(UF_POR_CODIGO)
+    municipios = municipios[['codigo_ibge', 'nome', 'uf', 'latitude', 'longitude']].copy()
+    municipios['uf'] = municipios['uf'].astype(str).str.upper().str.strip()
+    municipios['chave'] = chave_municipio(municipios['nome'])
+    return municipios.drop_duplicates('codigo_ibge').reset_index(drop=True)
+
+
+class CalculadoraDistancias:
+    def __init__(self, db_manager, fator_rodoviario=FATOR_RODOVIARIO):
+        self.db_manager = db_manager
+        self.fator_rodoviario = fator_rodoviario
+        self._municipios = None
+        self._assinatura = None
+
+    @property
+    def arquivo_municipios(self):
+        return caminho_municipios(self.db_manager.data_dir)
+
+    @property
+    def municipios(self):
+        """Tabela de municípios, relida só quando o arquivo muda"""
+        arquivo = self.arquivo_municipios
+        assinatura = (arquivo, self.db_manager.assinatura_arquivo(arquivo))
+        if assinatura != self._assinatura:
+            self._municipios = (
+                carregar_municipios(arquivo) if assinatura[1] is not None
+                else pd.DataFrame(columns=['codigo_ibge', 'nome', 'uf', 'latitude', 'longitude', 'chave'])
+            )
+            self._posicoes = pd.Series(np.arange(len(self._municipios)), index=self._municipios['codigo_ibge'])
+            self._assinatura = assinatura
+        return self._municipios
+
+    def localizar(self, nomes, ufs):
+        """Código IBGE de cada (município, UF); -1 quando não encontrado"""
+        municipios = self.municipios
+        consulta = pd.DataFrame({
+            'chave': chave_municipio(nomes),
+            'uf': pd.Series(ufs, dtype=object).fillna('').astype(str).str.upper().str.strip().to_numpy(),
+        })
+        codigos = consulta.merge(
+            municipios.drop_duplicates(['uf', 'chave'])[['uf', 'chave', 'codigo_ibge']], on=['uf', 'chave'], how='left'
+        )['codigo_ibge']
+        return codigos.fillna(-1).to_numpy(dtype=np.int64)
+
+    def coordenadas(self, codigos):
+        """(latitudes, longitudes) dos códigos; NaN para códigos desconhecidos"""
+        municipios = self.municipios
+        posicoes = self._posicoes.reindex(np.asarray(codigos, dtype=np.int64)).to_numpy()
+        validas = ~np.isnan(posicoes)
+        latitudes = np.full(len(posicoes), np.nan)
+        longitudes = np.full(len(posicoes), np.nan)
+        latitudes[validas] = municipios['latitude'].to_numpy()[posicoes[validas].astype(int)]
+        longitudes[validas] = municipios['longitude'].to_numpy()[posicoes[validas].astype(int)]
+        return latitudes, longitudes
+
+    def distancias(self, origens, destinos):
+        """km rodoviários estimados por par de códigos IBGE (NaN se desconhecido).
+
+        Os pares únicos ausentes do cache são calculados de uma vez e gravados.
+        """
+        origens = np.asarray(origens, dtype=np.int64)
+        destinos = np.asarray(destinos, dtype=np.int64)
+        pares = pd.DataFrame({
+            'origem': np.minimum(origens, destinos), 'destino': np.maximum(origens, destinos),
+        })
+        unicos = pares.drop_duplicates().reset_index(drop=True)
+        unicos['km'] = self.db_manager.distancias_em_cache(unicos['origem'], unicos['destino'])
+
+        faltantes = unicos['km'].isna().to_numpy()
+        if faltantes.any():
+            lat1, lon1 = self.coordenadas(unicos.loc[faltantes, 'origem'])
+            lat2, lon2 = self.coordenadas(unicos.loc[faltantes, 'destino'])
+            km = np.round(haversine_km(lat1, lon1, lat2, lon2) * self.fator_rodoviario, 1)
+            unicos.loc[faltantes, 'km'] = km
+            self.db_manager.salvar_distancias(
+                unicos.loc[faltantes, 'origem'], unicos.loc[faltantes, 'destino'], km
+            )
+        return pares.merge(unicos, on=['origem', 'destino'], how='left')['km'].to_numpy(dtype=float)
+
+    def distancias_por_nome(self, origens, ufs_origem, destinos, ufs_destino):
+        """Como distancias(), recebendo nomes de municípios e UFs"""
+        return self.distancias(self.localizar(origens, ufs_origem), self.localizar(destinos, ufs_destino))
+
+    def matriz(self, codigos):
+        """Matriz simétrica de km rodoviários entre os códigos (diagonal zero)"""
+        codigos = np.asarray(codigos, dtype=np.int64)
+        linhas, colunas = np.triu_indices(len(codigos), k=1)
+        matriz = np.zeros((len(codigos), len(codigos)))
+        matriz[linhas, colunas] = self.distancias(codigos[linhas], codigos[colunas])
+        matriz[colunas, linhas] = matriz[linhas, colunas]
+        return matriz
+
+    def informar_distancia(self, origem, destino, km):
+        """Registra km medidos entre dois municípios (substitui a estimativa)"""
+        self.db_manager.salvar_distancias([origem], [destino], [km], fonte='informada')
@@ -0,0 +1,41 @@
+# documentos.py - CPF e CNH: normalização e validação vetorizadas (sem Streamlit)
+#
+# Usado no cadastro de motoristas (modules/driver_manager.py) e no índice
+# SQLite do DatabaseManager, para que registros novos e os já gravados no
+# CSV sejam comparados pelo mesmo formato (11 dígitos, sem pontuação).
+import numpy as np
+import pandas as pd
+
+
+def somente_digitos(valores, tamanho=None):
+    """Documento só com dígitos; tamanho completa com zeros à esquerda (perdidos em planilhas)"""
+    digitos = pd.Series(valores, dtype=object).fillna('').astype(str).str.replace(r'\.0$', '', regex=True)
+    digitos = digitos.str.replace(r'\D', '', regex=True)
+    if tamanho:
+        digitos = digitos.where(digitos == '', digitos.str.zfill(tamanho))
+    return digitos
+
+
+def cpf_valido(cpfs):
+    """Confere os dois dígitos verificadores de todos os CPFs de uma vez"""
+    cpfs = pd.Series(cpfs, dtype=object).fillna('').astype(str)
+    validos = np.zeros(len(cpfs), dtype=bool)
+    completos = cpfs.str.fullmatch(r'\d{11}').to_numpy()
+    if not completos.any():
+        return validos
+    digitos = np.frombuffer(''.join(cpfs[completos]).encode(), dtype=np.uint8).reshape(-1, 11) - ord('0')
+    digitos = digitos.astype(np.int64)
+    dv1 = (digitos[:, :9] @ np.arange(10, 1, -1)) * 10 % 11 % 10
+    dv2 = (digitos[:, :10] @ np.arange(11, 1, -1)) * 10 % 11 % 10
+    repetidos = (digitos == digitos[:, :1]).all(axis=1)  # 000.000.000-00 etc.
+    validos[completos] = (dv1 == digitos[:, 9]) & (dv2 == digitos[:, 10]) & ~repetidos
+    return validos
+
+
+def motivo_documentos(cpfs, cnhs):
+    """Motivo de rejeição dos documentos já normalizados (None quando válidos)"""
+    cnhs = pd.Series(cnhs, dtype=object).fillna('').astype(str)
+    motivo = pd.Series(None, index=cnhs.index, dtype=object)
+    motivo[cnhs.str.len().to_numpy() != 11] = "CNH deve ter 11 dígitos"
+    motivo[~cpf_valido(cpfs)] = "CPF inválido"
+    return motivo
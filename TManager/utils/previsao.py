@@ -0,0 +1,222 @@
+# previsao.py - previsão semanal dos preços ANP, todas as séries de uma vez, sem Streamlit
+#
+# Cada série (produto), (produto, estado) ou (produto, estado, município) é uma
+# linha da matriz séries x semanas montada a partir do resumo semanal. Os modelos
+# percorrem as semanas uma única vez atualizando todas as séries (e todas as
+# combinações de parâmetros) juntas com NumPy:
+#   - ingênuo: repete o último preço;
+#   - suavização exponencial simples, com alfa escolhido por série numa grade;
+#   - Holt com tendência amortecida (alfa e beta na grade, phi fixo);
+#   - ingênuo sazonal (52 semanas), com pelo menos dois anos de histórico.
+# Em cada série vence o modelo de menor erro médio absoluto nas previsões um
+# passo à frente das últimas SEMANAS_VALIDACAO semanas. Com muitas séries, blocos
+# de linhas são ajustados em processos paralelos.
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .database import COLUNAS_PREVISOES
+
+HORIZONTE_PADRAO = 4
+ALFAS = (0.1, 0.2, 0.3, 0.5, 0.7, 0.9)
+BETAS = (0.05, 0.1, 0.2)
+PHI = 0.9
+SAZONALIDADE = 52
+SEMANAS_VALIDACAO = 12
+# A partir de quantas séries o ajuste é dividido entre processos
+LIMIAR_PARALELO = 2000
+MODELOS = np.array(['ingênuo', 'suavização exponencial', 'Holt amortecido', 'ingênuo sazonal'])
+CHAVES_NIVEL = {'brasil': ['produto'], 'estado': ['produto', 'estado'], 'municipio': ['produto', 'estado', 'municipio']}
+
+
+def matriz_series(resumo, chaves):
+    """(rótulos das séries, semanas, matriz séries x semanas) a partir do resumo
+    semanal; semanas sem coleta ficam NaN"""
+    rotulos_codigo, rotulos = pd.MultiIndex.from_frame(resumo[chaves]).factorize()
+    rotulos = pd.DataFrame(rotulos.tolist(), columns=chaves)
+    datas = pd.to_datetime(resumo['semana'])
+    semanas = pd.date_range(datas.min(), datas.max(), freq='7D')
+    coluna = ((datas - semanas[0]).dt.days // 7).to_numpy()
+    matriz = np.full((len(rotulos), len(semanas)), np.nan)
+    matriz[rotulos_codigo, coluna] = (resumo['soma'] / resumo['n']).to_numpy()
+    return rotulos, semanas, matriz
+
+
+def _suavizar(y, alfas, betas, inicio, phi=PHI):
+    """Holt amortecido para todas as séries e combinações (alfa, beta) de uma vez
+    (beta 0 = suavização simples). Retorna o erro médio absoluto um passo à
+    frente desde a semana `inicio`, o nível e a tendência finais (combinações x séries)."""
+    alfa = np.asarray(alfas, dtype=float)[:, None]
+    beta = np.asarray(betas, dtype=float)[:, None]
+    combinacoes, (series, semanas) = len(alfa), y.shape
+    nivel = np.full((combinacoes, series), np.nan)
+    tendencia = np.zeros((combinacoes, series))
+    soma_erros = np.zeros((combinacoes, series))
+    contagem = np.zeros((combinacoes, series))
+    for t in range(semanas):
+        previsao = nivel + phi * tendencia
+        observado = y[:, t]
+        if t >= inicio:
+            erro = np.abs(observado - previsao)
+            medido = ~np.isnan(erro)
+            soma_erros += np.where(medido, erro, 0.0)
+            contagem += medido
+        tem = ~np.isnan(observado)
+        novo = tem & np.isnan(nivel)
+        nivel_atualizado = alfa * observado + (1 - alfa) * previsao
+        tendencia_atualizada = beta * (nivel_atualizado - nivel) + (1 - beta) * phi * tendencia
+        atualiza = tem & ~np.isnan(nivel)
+        # Sem coleta na semana, o estado segue a própria previsão
+        tendencia = np.where(atualiza, tendencia_atualizada, np.where(novo, 0.0, phi * tendencia))
+        nivel = np.where(atualiza, nivel_atualizado, np.where(novo, observado, previsao))
+    with np.errstate(invalid='ignore'):
+        return np.where(contagem > 0, soma_erros / np.maximum(contagem, 1), np.nan), nivel, tendencia
+
+
+def _erro_medio(y, previsto, inicio):
+    """MAE das previsões um passo à frente a partir da semana `inicio` (NaN sem pontos)"""
+    erros = np.abs(y[..., inicio:] - previsto[..., inicio:])
+    contagem = (~np.isnan(erros)).sum(axis=-1)
+    with np.errstate(invalid='ignore'):
+        return np.where(contagem > 0, np.nansum(erros, axis=-1) / np.maximum(contagem, 1), np.nan)
+
+
+def prever_matriz(y, horizonte=HORIZONTE_PADRAO):
+    """Ajusta os modelos a todas as linhas de y (séries x semanas).
+
+    Retorna dict com previsao e desvio (séries x horizonte), modelo (índice em
+    MODELOS), erro_medio e ultimo (último preço observado).
+    """
+    series, semanas = y.shape
+    inicio = max(semanas - SEMANAS_VALIDACAO, 1)
+    preenchido = pd.DataFrame(y).ffill(axis=1).to_numpy()
+    passos = np.arange(1, horizonte + 1)
+
+    # Ingênuo: a previsão de cada semana é o último preço anterior
+    ingenuo = np.concatenate([np.full((series, 1), np.nan), preenchido[:, :-1]], axis=1)
+    candidatos_erro = [_erro_medio(y, ingenuo, inicio)]
+    candidatos_previsao = [np.repeat(preenchido[:, -1:], horizonte, axis=1)]
+
+    # Suavização simples e Holt: uma passada para todas as combinações
+    grade = [(alfa, 0.0) for alfa in ALFAS] + [(alfa, beta) for alfa in ALFAS for beta in BETAS]
+    alfas, betas = zip(*grade)
+    erros, nivel, tendencia = _suavizar(y, alfas, betas, inicio)
+    acumulado_phi = np.cumsum(PHI ** passos)
+    for combinacoes in (np.arange(len(ALFAS)), np.arange(len(ALFAS), len(grade))):
+        erros_modelo = erros[combinacoes]
+        melhor = combinacoes[np.argmin(np.where(np.isnan(erros_modelo), np.inf, erros_modelo), axis=0)]
+        colunas = np.arange(series)
+        candidatos_erro.append(erros[melhor, colunas])
+        candidatos_previsao.append(
+            nivel[melhor, colunas][:, None] + tendencia[melhor, colunas][:, None] * acumulado_phi[None, :]
+        )
+
+    # Ingênuo sazonal: só com dois ciclos completos
+    if semanas >= 2 * SAZONALIDADE:
+        sazonal = np.concatenate([np.full((series, SAZONALIDADE), np.nan), preenchido[:, :-SAZONALIDADE]], axis=1)
+        candidatos_erro.append(_erro_medio(y, sazonal, inicio))
+        candidatos_previsao.append(preenchido[:, semanas - SAZONALIDADE + passos - 1])
+
+    erros_modelos = np.vstack(candidatos_erro)
+    modelo = np.argmin(np.where(np.isnan(erros_modelos), np.inf, erros_modelos), axis=0)
+    # Sem semanas de validação (série curta) fica o ingênuo
+    modelo = np.where(np.isnan(erros_modelos).all(axis=0), 0, modelo)
+    colunas = np.arange(series)
+    previsao = np.stack(candidatos_previsao)[modelo, colunas]
+    erro_medio = erros_modelos[modelo, colunas]
+    # Faixa aproximada: erro típico de um passo crescendo com a raiz do horizonte
+    desvio = 1.25 * np.nan_to_num(erro_medio)[:, None] * np.sqrt(passos)[None, :]
+    return {'previsao': previsao, 'desvio': desvio, 'modelo': modelo, 'erro_medio': erro_medio,
+            'ultimo': preenchido[:, -1]}
+
+
+def prever_series(y, horizonte=HORIZONTE_PADRAO, workers=None):
+    """Como prever_matriz, dividindo as linhas entre processos quando são muitas"""
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(y) < LIMIAR_PARALELO:
+        return prever_matriz(y, horizonte)
+    blocos = np.array_split(y, workers)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        partes = list(pool.map(prever_matriz, blocos, [horizonte] * len(blocos)))
+    return {chave: np.concatenate([parte[chave] for parte in partes]) for chave in partes[0]}
+
+
+def tabela_previsoes(rotulos, semanas, resultado, horizonte=HORIZONTE_PADRAO):
+    """Formato longo: uma linha por série e semana futura, com faixa de 95%"""
+    series = len(rotulos)
+    futuras = semanas[-1] + pd.to_timedelta(7 * np.arange(1, horizonte + 1), unit='D')
+    tabela = rotulos.loc[np.repeat(np.arange(series), horizonte)].reset_index(drop=True)
+    tabela['semana'] = np.tile(futuras.strftime("%Y-%m-%d").to_numpy(), series)
+    tabela['horizonte'] = np.tile(np.arange(1, horizonte + 1), series)
+    previsao = resultado['previsao'].ravel()
+    desvio = 1.96 * resultado['desvio'].ravel()
+    tabela['previsao'] = previsao.round(3)
+    tabela['inferior'] = (previsao - desvio).round(3)
+    tabela['superior'] = (previsao + desvio).round(3)
+    tabela['modelo'] = np.repeat(MODELOS[resultado['modelo']], horizonte)
+    tabela['erro_medio'] = np.repeat(resultado['erro_medio'], horizonte).round(4)
+    tabela['ultimo_preco'] = np.repeat(resultado['ultimo'], horizonte).round(3)
+    return tabela
+
+
+class PrevisorPrecos:
+    def __init__(self, db_manager, horizonte=HORIZONTE_PADRAO, workers=None):
+        self.db_manager = db_manager
+        self.horizonte = horizonte
+        self.workers = workers
+
+    def previsoes(self, nivel='estado', produtos=None):
+        """Previsões das próximas semanas no nível pedido ('brasil', 'estado' ou 'municipio').
+
+        Calculadas para todas as séries do nível e gravadas no banco; valem até
+        a próxima importação da ANP com registros novos.
+        """
+        assinatura = f"{self.db_manager.assinatura_precos()}|{self.horizonte}"
+        gravadas = self.db_manager.carregar_previsoes(nivel, assinatura, produtos)
+        if gravadas is not None:
+            return gravadas
+
+        chaves = CHAVES_NIVEL[nivel]
+        resumo = self.db_manager.carregar_resumo_precos(agrupar_por=chaves + ['semana'])
+        if resumo.empty:
+            return pd.DataFrame(columns=chaves + ['semana', 'previsao'])
+        rotulos, semanas, matriz = matriz_series(resumo, chaves)
+        tabela = tabela_previsoes(
+            rotulos, semanas, prever_series(matriz, self.horizonte, self.workers), self.horizonte
+        ).reindex(columns=COLUNAS_PREVISOES, fill_value='')
+        self.db_manager.salvar_previsoes(nivel, assinatura, tabela)
+        return tabela[tabela['produto'].isin(produtos)] if produtos else tabela
+
+
+def custo_previsto(litros_estado, previsoes_estado, previsoes_brasil, produtos):
+    """Custo semanal esperado para o volume por UF (colunas estado, litros).
+
+    Em cada UF vale o primeiro produto de `produtos` com previsão; UF sem
+    previsão (ou não informada) usa a do Brasil. Retorna uma linha por UF e
+    semana com litros, preço previsto, faixa e custo (estimado, mínimo, máximo).
+    """
+    ordem = {produto: posicao for posicao, produto in enumerate(produtos)}
+    colunas = ['semana', 'produto', 'previsao', 'inferior', 'superior']
+
+    def preferidas(previsoes, chaves):
+        previsoes = previsoes[previsoes['produto'].isin(ordem)]
+        previsoes = previsoes.assign(ordem=previsoes['produto'].map(ordem)).sort_values('ordem', kind='stable')
+        return previsoes.drop_duplicates(chaves)
+
+    brasil = preferidas(previsoes_brasil, ['semana'])[colunas]
+    if brasil.empty or litros_estado.empty:
+        return pd.DataFrame(columns=['estado', 'litros', 'referencia', 'custo', 'custo_minimo', 'custo_maximo'] + colunas)
+    estadual = preferidas(previsoes_estado[previsoes_estado['estado'] != ''], ['estado', 'semana'])[['estado'] + colunas]
+
+    custos = litros_estado.merge(brasil, how='cross')
+    locais = custos[['estado', 'semana']].merge(estadual, on=['estado', 'semana'], how='left')
+    tem_estado = locais['previsao'].notna().to_numpy()
+    for coluna in colunas[1:]:
+        custos[coluna] = np.where(tem_estado, locais[coluna], custos[coluna])
+    custos['referencia'] = np.where(tem_estado, 'estado', 'Brasil')
+    custos['custo'] = (custos['litros'] * custos['previsao']).round(2)
+    custos['custo_minimo'] = (custos['litros'] * custos['inferior']).round(2)
+    custos['custo_maximo'] = (custos['litros'] * custos['superior']).round(2)
+    return custos.sort_values(['semana', 'estado']).reset_index(drop=True)
@@ -0,0 +1,238 @@
+# roteirizacao.py - roteirização de múltiplas paradas com frota heterogênea
+#
+# Heurísticas clássicas de VRP com capacidade, 100% offline:
+#   1. construção por vizinho mais próximo, respeitando a carga de cada veículo;
+#   2. busca local (2-opt e or-opt dentro da rota, realocação entre rotas)
+#      até não haver melhoria ou o tempo limite acabar.
+# A matriz de distâncias é simétrica e o nó 0 é o depósito (saída e retorno).
+import time
+
+import numpy as np
+import pandas as pd
+
+from .distancias import haversine_km
+
+# Melhorias menores que isso (km) são descartadas para não ciclar por erro de arredondamento
+TOLERANCIA_KM = 1e-9
+
+
+def matriz_distancias(latitudes, longitudes):
+    """Matriz de distâncias em linha reta (haversine, km) entre todos os pontos"""
+    lat = np.asarray(latitudes, dtype=float)
+    lon = np.asarray(longitudes, dtype=float)
+    return haversine_km(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+
+
+def distancia_rota(matriz, rota):
+    """Distância de uma rota [0, ..., 0]"""
+    rota = np.asarray(rota)
+    return float(matriz[rota[:-1], rota[1:]].sum())
+
+
+# ========== CONSTRUÇÃO ==========
+def _construir_rotas(matriz, demandas, capacidades):
+    """Vizinho mais próximo: cada viagem parte do depósito e segue para a parada
+    mais próxima que ainda cabe no veículo. Os veículos são usados do maior para o
+    menor; com a frota toda em uso, o veículo com menos km acumulados faz nova viagem.
+    """
+    n = len(matriz)
+    pendentes = np.ones(n, dtype=bool)
+    pendentes[0] = False
+    atendiveis = demandas <= capacidades.max()
+    nao_atendidas = np.flatnonzero(pendentes & ~atendiveis).tolist()
+    pendentes &= atendiveis
+
+    ordem_frota = list(np.argsort(-capacidades, kind='stable'))
+    km_por_veiculo = np.zeros(len(capacidades))
+    rotas, veiculos = [], []
+    while pendentes.any():
+        if ordem_frota:
+            veiculo = int(ordem_frota.pop(0))
+        else:
+            veiculo = int(np.argmin(km_por_veiculo))
+        livre = capacidades[veiculo]
+        rota, atual = [0], 0
+        while True:
+            candidatas = pendentes & (demandas <= livre)
+            if not candidatas.any():
+                break
+            proxima = int(np.argmin(np.where(candidatas, matriz[atual], np.inf)))
+            rota.append(proxima)
+            pendentes[proxima] = False
+            livre -= demandas[proxima]
+            atual = proxima
+        if len(rota) == 1:
+            # Veículo pequeno demais para o que restou: sai da escala
+            km_por_veiculo[veiculo] = np.inf
+            continue
+        rota.append(0)
+        rotas.append(np.array(rota))
+        veiculos.append(veiculo)
+        km_por_veiculo[veiculo] += distancia_rota(matriz, rota)
+    return rotas, veiculos, nao_atendidas
+
+
+# ========== BUSCA LOCAL ==========
+def _dois_opt(matriz, rota, prazo):
+    """2-opt com melhor melhoria por posição: os ganhos de todas as inversões
+    rota[i..j] com o mesmo i são calculados de uma vez com NumPy"""
+    melhorou = True
+    while melhorou and time.perf_counter() < prazo:
+        melhorou = False
+        for i in range(1, len(rota) - 2):
+            j = np.arange(i + 1, len(rota) - 1)
+            ganho = (
+                matriz[rota[i - 1], rota[j]] + matriz[rota[i], rota[j + 1]]
+                - matriz[rota[i - 1], rota[i]] - matriz[rota[j], rota[j + 1]]
+            )
+            melhor = int(np.argmin(ganho))
+            if ganho[melhor] < -TOLERANCIA_KM:
+                rota[i:j[melhor] + 1] = rota[i:j[melhor] + 1][::-1].copy()
+                melhorou = True
+            if time.perf_counter() >= prazo:
+                break
+    return rota
+
+
+def _or_opt(matriz, rota, prazo, max_segmento=3):
+    """Move segmentos de 1 a 3 paradas consecutivas para a melhor posição da
+    própria rota, mantendo ou invertendo o sentido do segmento"""
+    melhorou = True
+    while melhorou and time.perf_counter() < prazo:
+        melhorou = False
+        for tamanho in range(1, max_segmento + 1):
+            i = 1
+            while i + tamanho < len(rota) and time.perf_counter() < prazo:
+                anterior, primeiro, ultimo, seguinte = rota[i - 1], rota[i], rota[i + tamanho - 1], rota[i + tamanho]
+                remocao = matriz[anterior, primeiro] + matriz[ultimo, seguinte] - matriz[anterior, seguinte]
+                restante = np.concatenate([rota[:i], rota[i + tamanho:]])
+                de, para = restante[:-1], restante[1:]
+                direto = matriz[de, primeiro] + matriz[ultimo, para] - matriz[de, para]
+                invertido = matriz[de, ultimo] + matriz[primeiro, para] - matriz[de, para]
+                custo = np.minimum(direto, invertido)
+                custo[i - 1] = np.inf  # posição original
+                k = int(np.argmin(custo))
+                if custo[k] - remocao < -TOLERANCIA_KM:
+                    segmento = rota[i:i + tamanho]
+                    if invertido[k] < direto[k]:
+                        segmento = segmento[::-1]
+                    rota = np.concatenate([restante[:k + 1], segmento, restante[k + 1:]])
+                    melhorou = True
+                else:
+                    i += 1
+    return rota
+
+
+def _realocar_entre_rotas(matriz, rotas, cargas, capacidades_rotas, demandas, prazo):
+    """Move paradas isoladas para a melhor aresta de outra rota com capacidade livre.
+    Todas as arestas de todas as rotas são avaliadas de uma vez por parada."""
+    melhorou = False
+    for origem in range(len(rotas)):
+        posicao = 1
+        while posicao < len(rotas[origem]) - 1:
+            if time.perf_counter() >= prazo:
+                return melhorou
+            rota = rotas[origem]
+            parada = rota[posicao]
+            remocao = (
+                matriz[rota[posicao - 1], parada] + matriz[parada, rota[posicao + 1]]
+                - matriz[rota[posicao - 1], rota[posicao + 1]]
+            )
+            de = np.concatenate([r[:-1] for r in rotas])
+            para = np.concatenate([r[1:] for r in rotas])
+            dona = np.concatenate([np.full(len(r) - 1, indice) for indice, r in enumerate(rotas)])
+            aresta = np.concatenate([np.arange(len(r) - 1) for r in rotas])
+            custo = matriz[de, parada] + matriz[parada, para] - matriz[de, para]
+            custo[dona == origem] = np.inf
+            custo[cargas[dona] + demandas[parada] > capacidades_rotas[dona]] = np.inf
+            melhor = int(np.argmin(custo))
+            if custo[melhor] - remocao < -TOLERANCIA_KM:
+                destino = int(dona[melhor])
+                rotas[destino] = np.insert(rotas[destino], aresta[melhor] + 1, parada)
+                rotas[origem] = np.delete(rota, posicao)
+                cargas[destino] += demandas[parada]
+                cargas[origem] -= demandas[parada]
+                melhorou = True
+            else:
+                posicao += 1
+    return melhorou
+
+
+# ========== API ==========
+def resolver_rotas(matriz, demandas=None, capacidades=None, tempo_limite=5.0):
+    """Resolve o VRP com capacidade para a matriz dada (nó 0 = depósito).
+
+    demandas: carga de cada nó (a do depósito é ignorada); None = sem carga.
+    capacidades: carga máxima de cada veículo; 0/NaN = sem limite.
+    tempo_limite: segundos para a busca local (a construção sempre termina).
+
+    Retorna dict com rotas (índices dos nós, com o depósito nas pontas),
+    veiculos (índice do veículo de cada rota), distancias, carga, distancia_total,
+    distancia_inicial (só a construção), nao_atendidas e segundos.
+    """
+    inicio = time.perf_counter()
+    prazo = inicio + tempo_limite
+    matriz = np.asarray(matriz, dtype=float)
+    n = len(matriz)
+    demandas = np.zeros(n) if demandas is None else np.nan_to_num(np.asarray(demandas, dtype=float))
+    demandas[0] = 0.0
+    capacidades = np.asarray([np.inf] if capacidades is None or len(capacidades) == 0 else capacidades, dtype=float)
+    capacidades = np.where(np.isnan(capacidades) | (capacidades <= 0), np.inf, capacidades)
+
+    rotas, veiculos, nao_atendidas = _construir_rotas(matriz, demandas, capacidades)
+    distancia_inicial = sum(distancia_rota(matriz, rota) for rota in rotas)
+
+    cargas = np.array([demandas[rota].sum() for rota in rotas])
+    capacidades_rotas = capacidades[veiculos] if veiculos else np.zeros(0)
+    melhorou = True
+    while melhorou and time.perf_counter() < prazo:
+        rotas = [_or_opt(matriz, _dois_opt(matriz, rota, prazo), prazo) for rota in rotas]
+        melhorou = len(rotas) > 1 and _realocar_entre_rotas(
+            matriz, rotas, cargas, capacidades_rotas, demandas, prazo
+        )
+
+    utilizadas = [indice for indice, rota in enumerate(rotas) if len(rota) > 2]
+    rotas = [rotas[indice] for indice in utilizadas]
+    distancias = [distancia_rota(matriz, rota) for rota in rotas]
+    return {
+        'rotas': [rota.tolist() for rota in rotas],
+        'veiculos': [veiculos[indice] for indice in utilizadas],
+        'distancias': distancias,
+        'carga': [float(cargas[indice]) for indice in utilizadas],
+        'distancia_total': float(sum(distancias)),
+        'distancia_inicial': float(distancia_inicial),
+        'nao_atendidas': nao_atendidas,
+        'segundos': time.perf_counter() - inicio,
+    }
+
+
+def roteirizar(paradas, veiculos, tempo_limite=5.0, matriz=None):
+    """Roteiriza um DataFrame de paradas (nome, latitude, longitude, carga; a
+    primeira linha é o depósito) com a frota de veiculos.csv (placa, nome, carga).
+    matriz: km entre as paradas; padrão é a linha reta entre as coordenadas.
+
+    Retorna (plano, resultado): plano tem uma linha por parada visitada, com
+    placa, viagem, ordem, km acumulados e coordenadas; resultado é o dict de resolver_rotas.
+    """
+    if matriz is None:
+        matriz = matriz_distancias(paradas['latitude'], paradas['longitude'])
+    demandas = paradas['carga'].to_numpy() if 'carga' in paradas.columns else None
+    capacidades = (
+        pd.to_numeric(veiculos['carga'], errors='coerce').to_numpy()
+        if 'carga' in veiculos.columns else np.full(max(len(veiculos), 1), np.nan)
+    )
+    resultado = resolver_rotas(matriz, demandas, capacidades, tempo_limite)
+    cargas = paradas['carga'].fillna(0).to_numpy(dtype=float) if demandas is not None else np.zeros(len(paradas))
+
+    placas = veiculos['placa'].astype(str).tolist() if 'placa' in veiculos.columns and len(veiculos) else ['-']
+    linhas = []
+    for viagem, (rota, veiculo) in enumerate(zip(resultado['rotas'], resultado['veiculos']), start=1):
+        acumulado = np.concatenate([[0.0], np.cumsum(matriz[rota[:-1], rota[1:]])])
+        for ordem, (no, km) in enumerate(zip(rota, acumulado)):
+            linhas.append({
+                'placa': placas[veiculo], 'viagem': viagem, 'ordem': ordem,
+                'parada': paradas['nome'].iloc[no], 'carga': float(cargas[no]) if no else 0.0,
+                'km_acumulado': round(float(km), 1),
+                'latitude': paradas['latitude'].iloc[no], 'longitude': paradas['longitude'].iloc[no],
+            })
+    return pd.DataFrame(linhas), resultado